@@ -0,0 +1,64 @@
+# Конфигурация gunicorn (Procfile, nixpacks)
+#
+# SSE-поток /tasks/stream/ держит соединение до нескольких минут. С sync-воркером
+# каждое такое соединение заняло бы процесс целиком, поэтому используем потоки:
+# открытый стрим занимает один поток, остальные продолжают обслуживать запросы.
+# Стримов на воркер не больше STREAMS_PER_WORKER, чтобы потоки не кончились.
+# При WEB_CONCURRENCY > 1 настройки по умолчанию берут PostgresBroker: события
+# одного процесса доходят до подписчиков другого.
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+
+# GUNICORN_ASGI=1 — воркеры uvicorn и taskmanager/asgi.py: дашборд, календарь и
+# Kanban загружают виджеты одновременно (tasks/concurrency.py). Остальные виды
+# синхронные: Django выполняет их в потоках asgiref (ASGI_THREADS). SSE-стрим и
+# выгрузка отдаются async-итераторами (tasks/concurrency.py, stream_body).
+if os.environ.get('GUNICORN_ASGI', '').lower() in ('1', 'true', 'yes'):
+    wsgi_app = 'taskmanager.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    os.environ.setdefault('ASGI_THREADS', str(threads))
+else:
+    wsgi_app = 'taskmanager.wsgi:application'
+    worker_class = 'gthread'
+
+# Стрим сам закрывается через 5 минут (STREAM_MAX_LIFETIME), пульс каждые 15 секунд
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Метрики Prometheus (tasks/metrics.py): каждый воркер пишет значения в свои
+# файлы в PROMETHEUS_MULTIPROC_DIR, /metrics в любом воркере суммирует все.
+# Переменная задаётся до импорта prometheus_client, то есть до загрузки приложения.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/taskflow-metrics')
+
+
+def on_starting(server):
+    # Файлы прошлого запуска исказили бы счётчики
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def post_worker_init(worker):
+    from tasks.metrics import worker_started
+    from tasks.templating import warm_templates
+    worker_started(threads)
+    # Первые запросы воркера не ждут компиляции шаблонов
+    warm_templates()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Пул подключений (DB_POOL) закрывается явно, а не обрывом соединений
+    from django.conf import settings
+    if settings.configured and settings.DB_POOL:
+        from taskmanager.pooled_postgresql.base import close_pools
+        close_pools()
@@ -0,0 +1,61 @@
+// ============================================
+// INFINITE SCROLL - подгрузка следующих страниц списков
+// Ссылка «Показать ещё» (data-infinite-scroll) ведёт на ?cursor=…;
+// сервер отвечает JSON {fragments: {селектор: html}, next_url}.
+// Без JavaScript ссылка просто открывает следующую страницу.
+// ============================================
+
+(function() {
+    'use strict';
+
+    function loadNext(link, observer) {
+        if (link.dataset.loading) return;
+        link.dataset.loading = '1';
+
+        fetch(link.href, {
+            headers: { 'X-Requested-With': 'XMLHttpRequest', 'Accept': 'application/json' },
+            credentials: 'same-origin',
+        })
+            .then(response => {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(data => {
+                Object.entries(data.fragments).forEach(([selector, html]) => {
+                    const container = document.querySelector(selector);
+                    if (!container) return;
+                    container.insertAdjacentHTML('beforeend', html);
+                    document.dispatchEvent(new CustomEvent('infinite-scroll:appended', { detail: container }));
+                });
+                if (data.next_url) {
+                    link.href = data.next_url;
+                    delete link.dataset.loading;
+                } else {
+                    observer.unobserve(link);
+                    link.parentElement.remove();
+                }
+            })
+            .catch(() => {
+                delete link.dataset.loading;
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const links = document.querySelectorAll('a[data-infinite-scroll]');
+        if (!links.length) return;
+
+        const observer = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) loadNext(entry.target, observer);
+            });
+        }, { rootMargin: '400px' });
+
+        links.forEach(link => {
+            observer.observe(link);
+            link.addEventListener('click', e => {
+                e.preventDefault();
+                loadNext(link, observer);
+            });
+        });
+    });
+})();
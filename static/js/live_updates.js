@@ -1,27 +1,197 @@
-setInterval(()=>{
+// ============================================
+// LIVE UPDATES - дельты для Kanban доски
+// Опрашивает /tasks/live/?since=<курсор> и применяет только изменения.
+// В push-режиме (/tasks/stream/, SSE) опрос запускается по событию,
+// а редкий таймер остаётся страховкой.
+// ============================================
 
-fetch("/tasks/live/")
+(function() {
+    'use strict';
 
-.then(r=>r.json())
+    const POLL_INTERVAL = 10000;
+    const PUSH_SAFETY_INTERVAL = 60000;
+    const PUSH_DEBOUNCE = 300;
 
-.then(data=>{
+    const board = document.getElementById('kanbanBoard');
+    if (!board) return;
 
-data.tasks.forEach(task=>{
+    const liveUrl = board.dataset.liveUrl;
+    const streamUrl = board.dataset.streamUrl;
+    let cursor = board.dataset.liveCursor;
+    let etag = null;
+    // Сервер перечитывает окно перед курсором — уже применённые версии пропускаем
+    const applied = new Map();
 
-const el = document.querySelector(`[data-task='${task.id}']`)
+    // Фильтры открытой доски — сервер отметит, какие задачи под них подходят
+    const filters = new URLSearchParams(window.location.search);
 
-if(!el) return
+    function buildUrl() {
+        const params = new URLSearchParams();
+        ['project', 'assignee', 'priority', 'search', 'tag'].forEach(name => {
+            if (filters.get(name)) params.set(name, filters.get(name));
+        });
+        params.set('since', cursor);
+        return `${liveUrl}?${params.toString()}`;
+    }
 
-if(el.parentElement.parentElement.dataset.status !== task.status){
+    function findCard(taskId) {
+        return board.querySelector(`.kanban-card[data-task-id='${taskId}']`);
+    }
 
-const column = document.querySelector(`[data-status='${task.status}'] .dropzone`)
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
 
-column.appendChild(el)
+    function truncateWords(text, count) {
+        const words = text.split(/\s+/);
+        return words.length > count ? words.slice(0, count).join(' ') + ' …' : text;
+    }
 
-}
+    function renderCard(task) {
+        const card = document.createElement('div');
+        card.className = 'kanban-card';
+        card.draggable = true;
+        card.dataset.taskId = task.id;
+        card.dataset.rank = task.rank;
 
-})
+        const avatar = task.assignee_id
+            ? `<div class="member-avatar-sm" style="background: ${escapeHtml(task.assignee_color)}">${escapeHtml(task.assignee_initials)}</div>`
+            : '';
 
-})
+        card.innerHTML = `
+            <a href="/tasks/${task.id}/" class="kanban-card-link">
+                <div style="display: flex; align-items: center; gap: 8px; margin-bottom: 8px;">
+                    <div class="task-dot" style="background: ${escapeHtml(task.project_color)}"></div>
+                    <strong>${escapeHtml(truncateWords(task.title, 8))}</strong>
+                </div>
+                <div style="font-size: 12px; color: var(--clr-text-muted); margin-bottom: 8px;">
+                    ${escapeHtml(task.project_name)}
+                </div>
+                <div style="display: flex; justify-content: space-between; align-items: center;">
+                    <span class="task-priority priority-${escapeHtml(task.priority)}">${escapeHtml(task.priority_label)}</span>
+                    ${avatar}
+                </div>
+            </a>`;
+        return card;
+    }
 
-},10000)
\ No newline at end of file
+    // Карточка, перед которой встаёт задача: в «Выполнено» — первая (свежие сверху),
+    // в остальных колонках — первая с большим ключом ручного порядка
+    function nextCard(column, task) {
+        const cards = column.querySelectorAll('.kanban-card');
+        if (task.status === 'done') return cards[0] || null;
+        for (const card of cards) {
+            if (card.dataset.rank > task.rank) return card;
+        }
+        return null;
+    }
+
+    function applyTask(task) {
+        const version = Date.parse(task.updated_at);
+        if (applied.get(task.id) >= version) return;
+        applied.set(task.id, version);
+
+        let card = findCard(task.id);
+
+        // Задача больше не подходит под фильтры доски
+        if (!task.matches) {
+            if (card) card.remove();
+            return;
+        }
+
+        const column = board.querySelector(`.kanban-column[data-status='${task.status}'] .kanban-cards`);
+        if (!column) return;
+
+        const fresh = renderCard(task);
+        if (card) {
+            card.remove();
+        }
+        column.querySelector('.empty-state')?.remove();
+        column.insertBefore(fresh, nextCard(column, task));
+        document.dispatchEvent(new CustomEvent('kanban:card-added', { detail: fresh }));
+    }
+
+    function updateCounters() {
+        board.querySelectorAll('.kanban-column').forEach(column => {
+            const counter = column.querySelector('[data-column-count]');
+            if (counter) {
+                counter.textContent = `(${column.querySelectorAll('.kanban-card').length})`;
+            }
+        });
+    }
+
+    let polling = false;
+    let pollTimer = null;
+    let pushConnected = false;
+
+    function schedulePoll(delay) {
+        clearTimeout(pollTimer);
+        pollTimer = setTimeout(poll, delay);
+    }
+
+    function poll() {
+        if (polling) return;
+        polling = true;
+
+        const headers = { 'Accept': 'application/json' };
+        if (etag) headers['If-None-Match'] = etag;
+
+        fetch(buildUrl(), { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+            .then(response => {
+                // Ничего не изменилось — тело не передаётся
+                if (response.status === 304) return null;
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                etag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(data => {
+                if (!data) return;
+                if (data.reset) {
+                    location.reload();
+                    return;
+                }
+
+                data.tasks.forEach(applyTask);
+                data.deleted.forEach(taskId => {
+                    const card = findCard(taskId);
+                    if (card) card.remove();
+                });
+                if (data.tasks.length || data.deleted.length) updateCounters();
+
+                cursor = data.cursor;
+            })
+            .catch(error => console.error('❌ Live updates:', error))
+            .finally(() => {
+                polling = false;
+                schedulePoll(pushConnected ? PUSH_SAFETY_INTERVAL : POLL_INTERVAL);
+            });
+    }
+
+    function connectStream() {
+        const params = new URLSearchParams();
+        if (filters.get('project')) params.set('project', filters.get('project'));
+        const source = new EventSource(`${streamUrl}?${params.toString()}`);
+
+        source.addEventListener('open', () => {
+            pushConnected = true;
+            // Забираем то, что могло измениться, пока соединения не было
+            schedulePoll(0);
+        });
+        ['task', 'comment', 'bulk'].forEach(type => {
+            source.addEventListener(type, () => schedulePoll(PUSH_DEBOUNCE));
+        });
+        source.addEventListener('error', () => {
+            // EventSource переподключится сам, до тех пор — обычный опрос
+            pushConnected = false;
+            schedulePoll(POLL_INTERVAL);
+        });
+    }
+
+    if (streamUrl && window.EventSource) {
+        connectStream();
+    } else {
+        schedulePoll(POLL_INTERVAL);
+    }
+})();
@@ -0,0 +1,7 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+# Под ASGI — async-версии дашборда, календаря и Kanban (tasks/urls.py)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+application = get_asgi_application()
@@ -0,0 +1,89 @@
+"""PostgreSQL через пул подключений psycopg_pool (psycopg 3).
+
+Стандартный бэкенд Django 4.2/5.0 держит на каждый поток своё подключение
+(CONN_MAX_AGE): их столько, сколько потоков во всех воркерах, и каждое
+новое — TLS-рукопожатие. Здесь подключение берётся из пула процесса на
+время запроса и возвращается в него при закрытии (CONN_MAX_AGE = 0): на
+воркер не больше OPTIONS['pool']['max_size'] подключений при любом числе
+потоков. Перед выдачей подключение проверяется (check_connection),
+простаивающие сверх min_size закрываются через max_idle, а старые
+пересоздаются через max_lifetime.
+
+В Django 5.1+ то же даёт OPTIONS['pool'] стандартного бэкенда.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from django.utils.asyncio import async_unsafe
+
+if not is_psycopg3:
+    raise ImproperlyConfigured('taskmanager.pooled_postgresql requires psycopg 3: pip install "psycopg[pool]"')
+
+from psycopg_pool import ConnectionPool  # noqa: E402
+
+POOL_DEFAULTS = {'min_size': 2, 'max_size': 10, 'timeout': 10}
+
+# Пулы процесса по (алиас, имя БД): тестовая БД получает свой пул
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        key = (self.alias, self.settings_dict['NAME'])
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                if self.settings_dict['CONN_MAX_AGE']:
+                    raise ImproperlyConfigured(
+                        f'Database "{self.alias}": pooled connections require CONN_MAX_AGE = 0'
+                    )
+                pool = _pools[key] = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    check=ConnectionPool.check_connection,
+                    name=f'taskflow-{self.alias}',
+                    open=True,
+                    **{**POOL_DEFAULTS, **self.settings_dict['OPTIONS'].get('pool', {})},
+                )
+            return pool
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        # Уровень изоляции — как в стандартном бэкенде
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {options["isolation_level"]} specified. '
+                f'Use one of the psycopg.IsolationLevel values.'
+            )
+        connection = self.pool.getconn()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # Незавершённую транзакцию пул откатит сам
+            self.pool.putconn(self.connection)
+        self.connection = None
+
+
+def close_pools():
+    """Закрывает пулы процесса (выход воркера)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
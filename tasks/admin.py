@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Task, TaskComment, Department, UserProfile
+from .models import Project, Tag, Task, TaskComment, Department, UserProfile
 
 
 @admin.register(Department)
@@ -21,15 +21,25 @@ class ProjectAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['name', 'description']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_progress()
+
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ['title', 'project', 'status', 'priority', 'assignee', 'due_date', 'created_at']
     list_filter = ['status', 'priority', 'project', 'due_date']
-    search_fields = ['title', 'description', 'tags']
+    search_fields = ['title', 'description', 'tags__name']
+    filter_horizontal = ['tags']
     ordering = ['-created_at']
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+
+
 @admin.register(TaskComment)
 class TaskCommentAdmin(admin.ModelAdmin):
     list_display = ['task', 'author', 'created_at']
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend, который загружает пользователя сразу с профилем и отделом.
+
+    request.user.profile.role проверяется почти в каждом view (is_admin,
+    is_board_admin, дашборд) — так это не отдельный запрос на каждый запрос.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = (
+                UserModel._default_manager
+                .select_related('profile', 'profile__department')
+                .get(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,397 @@
+"""Прогон страниц через тестовый клиент Django с замером времени и SQL.
+
+Каждая точка из tasks/urls.py вызывается от имени пользователей с разными
+ролями. Первый запрос идёт с пустым кэшем (холодный), остальные — с
+прогретым. Для каждой пары (точка, роль) собираются перцентили времени,
+число и время SQL-запросов и размер ответа. Изменяющие запросы выполняются
+в транзакции, которая откатывается, поэтому данные не меняются между
+прогонами. Сравнение с сохранённым эталоном — compare_with_baseline.
+
+compare_async сравнивает синхронные и async-версии страниц с виджетами
+(tasks/concurrency.py) на одних и тех же запросах.
+"""
+import asyncio
+import json
+import math
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .models import Project, Task
+from .profiling import QueryTimer, wrap_connections
+from .urls import urlpatterns
+
+ROLES = ('employee', 'team_lead', 'admin')
+ANONYMOUS = 'anonymous'
+
+
+class Endpoint:
+    """Один замеряемый запрос.
+
+    request(fixtures) возвращает (args для reverse, данные запроса).
+    mutates — выполнять в откатываемой транзакции; relogin — запрос
+    сбрасывает сессию (выход), после него нужно войти заново.
+    """
+
+    def __init__(self, label, url_name, request=None, method='get', roles=ROLES,
+                 json_body=False, mutates=False, relogin=False):
+        self.label = label
+        self.url_name = url_name
+        self.request = request or (lambda fixtures: ((), None))
+        self.method = method
+        self.roles = roles
+        self.json_body = json_body
+        self.mutates = mutates
+        self.relogin = relogin
+
+
+ENDPOINTS = [
+    Endpoint('login', 'login', roles=(ANONYMOUS,)),
+    Endpoint('logout', 'logout', relogin=True),
+    Endpoint('home', 'home'),
+    Endpoint('dashboard', 'dashboard'),
+    Endpoint('calendar', 'calendar'),
+    Endpoint('analytics', 'analytics', roles=('admin',)),
+    Endpoint('analytics:project_year', 'analytics',
+             lambda f: ((), {'project': f['project'].pk, 'days': 365}), roles=('admin',)),
+    Endpoint('kanban', 'kanban'),
+    Endpoint('kanban:filtered', 'kanban', lambda f: ((), {'project': f['project'].pk, 'priority': 'high'})),
+    Endpoint('kanban_update_status', 'kanban_update_status',
+             lambda f: ((), {'task_id': f['task'].pk, 'status': 'review'}),
+             method='post', json_body=True, mutates=True),
+    Endpoint('live_updates', 'live_updates',
+             lambda f: ((), {'since': (timezone.now() - timedelta(minutes=5)).isoformat()})),
+    Endpoint('project_list', 'project_list'),
+    Endpoint('project_create', 'project_create'),
+    Endpoint('project_detail', 'project_detail', lambda f: ((f['project'].pk,), None)),
+    Endpoint('project_detail:search', 'project_detail',
+             lambda f: ((f['project'].pk,), {'search': f['search']})),
+    Endpoint('project_edit', 'project_edit', lambda f: ((f['project'].pk,), None)),
+    Endpoint('project_delete', 'project_delete', lambda f: ((f['project'].pk,), None)),
+    Endpoint('task_create', 'task_create'),
+    Endpoint('task_create:post', 'task_create', lambda f: ((), {
+        'title': 'Benchmark task', 'project': f['project'].pk, 'status': 'todo',
+        'priority': 'medium', 'assignee': f['user'].pk,
+    }), method='post', mutates=True),
+    Endpoint('task_create_in_project', 'task_create_in_project', lambda f: ((f['project'].pk,), None)),
+    Endpoint('task_detail', 'task_detail', lambda f: ((f['task'].pk,), None)),
+    Endpoint('task_edit', 'task_edit', lambda f: ((f['task'].pk,), None)),
+    Endpoint('task_delete', 'task_delete', lambda f: ((f['task'].pk,), None)),
+    Endpoint('task_delete:post', 'task_delete', lambda f: ((f['task'].pk,), None),
+             method='post', mutates=True),
+    Endpoint('task_update_status', 'task_update_status',
+             lambda f: ((f['task'].pk,), {'status': 'in_progress'}), method='post', mutates=True),
+    Endpoint('task_export', 'task_export'),
+    Endpoint('task_export:ndjson_gzip', 'task_export',
+             lambda f: ((), {'format': 'ndjson', 'gzip': 1, 'priority': 'high'})),
+    Endpoint('task_bulk_update', 'task_bulk_update', lambda f: ((), {
+        'task_ids': f['bulk_task_ids'], 'patch': {'priority': 'high', 'tags': ['benchmark']},
+    }), method='post', json_body=True, mutates=True),
+    Endpoint('add_comment', 'add_comment', lambda f: ((f['task'].pk,), {'text': 'Benchmark comment'}),
+             method='post', mutates=True),
+    Endpoint('my_tasks', 'my_tasks'),
+    Endpoint('my_tasks:due', 'my_tasks', lambda f: ((), {'sort': 'due', 'status': 'todo'})),
+    Endpoint('task_search', 'task_search', lambda f: ((), {'q': f['search']})),
+    Endpoint('user_list', 'user_list', roles=('admin',)),
+    Endpoint('user_create', 'user_create', roles=('admin',)),
+    Endpoint('user_edit', 'user_edit', lambda f: ((f['other_user'].pk,), None), roles=('admin',)),
+    Endpoint('user_delete', 'user_delete', lambda f: ((f['other_user'].pk,), None), roles=('admin',)),
+    Endpoint('user_delete:post', 'user_delete', lambda f: ((f['other_user'].pk,), None),
+             method='post', roles=('admin',), mutates=True),
+    Endpoint('department_list', 'department_list', roles=('admin',)),
+    Endpoint('profiling_report', 'profiling_report', roles=('admin',)),
+    Endpoint('metrics', 'metrics', roles=('admin',)),
+]
+
+# Точки, которые нельзя замерить запрос-ответом
+SKIPPED = {
+    'task_stream': 'SSE-поток не завершается, см. live_updates',
+}
+
+
+def uncovered_url_names():
+    """Имена из tasks/urls.py, для которых нет ни замера, ни причины пропуска"""
+    covered = {endpoint.url_name for endpoint in ENDPOINTS} | set(SKIPPED)
+    return sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def role_user(role):
+    """Самый загруженный активный пользователь с ролью — худший случай для страниц"""
+    condition = Q(profile__role=role)
+    if role == 'admin':
+        condition |= Q(is_superuser=True)
+    return (
+        User.objects.filter(condition, is_active=True)
+        .annotate(num_tasks=Count('assigned_tasks'))
+        .order_by('-num_tasks', 'pk')
+        .first()
+    )
+
+
+def build_fixtures(user):
+    """Объекты, на которые ссылаются запросы от имени user"""
+    project = (
+        Project.objects.filter(Q(members=user) | Q(created_by=user))
+        .annotate(num_tasks=Count('tasks', distinct=True))
+        .order_by('-num_tasks', 'pk')
+        .first()
+    ) or Project.objects.order_by('pk').first()
+    tasks = Task.objects.filter(project=project) if project else Task.objects.all()
+    task = (
+        tasks.filter(assignee=user).annotate(num_comments=Count('comments'))
+        .order_by('-num_comments', 'pk').first()
+    ) or tasks.order_by('pk').first()
+    other_user = (
+        User.objects.filter(is_active=True, profile__role='employee')
+        .exclude(pk=user.pk).order_by('pk').first()
+    )
+    if project is None or task is None or other_user is None:
+        return None
+    return {
+        'user': user,
+        'project': project,
+        'task': task,
+        'other_user': other_user,
+        'bulk_task_ids': list(tasks.order_by('-created_at', '-pk').values_list('pk', flat=True)[:100]),
+        'search': task.title.split()[0],
+    }
+
+
+def _clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def _send(client, endpoint, fixtures):
+    args, data = endpoint.request(fixtures)
+    url = reverse(endpoint.url_name, args=args)
+    if endpoint.method == 'get':
+        return client.get(url, data)
+    if endpoint.json_body:
+        return client.post(url, json.dumps(data), content_type='application/json')
+    return client.post(url, data or {})
+
+
+def measure(client, endpoint, fixtures):
+    """(статус, секунды, число SQL, секунды SQL, байт) одного запроса"""
+    timer = QueryTimer()
+    with wrap_connections(timer):
+        started = time.perf_counter()
+        if endpoint.mutates:
+            with transaction.atomic():
+                response = _send(client, endpoint, fixtures)
+                transaction.set_rollback(True)
+        else:
+            response = _send(client, endpoint, fixtures)
+        # Потоковый ответ (выгрузка) читается целиком: запросы идут по мере чтения.
+        # Бесконечные потоки — в SKIPPED
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+
+    return response.status_code, elapsed, timer.queries, timer.sql_seconds, size
+
+
+def run_endpoint(endpoint, role, user, fixtures, iterations):
+    """Холодный запрос и iterations прогретых; результат — словарь метрик"""
+    # Ошибка вида — статус 500 в отчёте, а не прерванный прогон
+    client = Client(raise_request_exception=False)
+    _clear_caches()
+    if user is not None:
+        client.force_login(user)
+
+    samples = []
+    for _iteration in range(iterations + 1):
+        samples.append(measure(client, endpoint, fixtures))
+        if endpoint.relogin:
+            client.force_login(user)
+
+    cold, warm = samples[0], samples[1:] or samples[:1]
+    times = [sample[1] * 1000 for sample in warm]
+    return {
+        'status': warm[-1][0],
+        'p50_ms': round(percentile(times, 0.5), 2),
+        'p95_ms': round(percentile(times, 0.95), 2),
+        'max_ms': round(max(times), 2),
+        'cold_ms': round(cold[1] * 1000, 2),
+        'queries': max(sample[2] for sample in warm),
+        'queries_cold': cold[2],
+        'sql_ms': round(sum(sample[3] for sample in warm) * 1000 / len(warm), 2),
+        'bytes': warm[-1][4],
+    }
+
+
+def run_benchmark(iterations=10, only=None, roles=ROLES, progress=None):
+    """{метка: {роль: метрики}} для всех точек ENDPOINTS (или перечисленных в only)"""
+    users = {ANONYMOUS: None}
+    fixtures = {ANONYMOUS: {}}
+    for role in roles:
+        user = role_user(role)
+        role_fixtures = build_fixtures(user) if user is not None else None
+        if role_fixtures is not None:
+            users[role] = user
+            fixtures[role] = role_fixtures
+
+    results = {}
+    # Тестовый клиент ходит на хост testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for endpoint in ENDPOINTS:
+            if only and endpoint.label not in only and endpoint.url_name not in only:
+                continue
+            for role in endpoint.roles:
+                if role not in users:
+                    continue
+                metrics = run_endpoint(endpoint, role, users[role], fixtures[role], iterations)
+                results.setdefault(endpoint.label, {})[role] = metrics
+                if progress:
+                    progress(endpoint.label, role, metrics)
+    return results
+
+
+def server_errors(results):
+    """[(метка, роль, статус)] ответов 5xx — их нельзя записывать в эталон"""
+    return [
+        (label, role, metrics['status'])
+        for label, by_role in results.items()
+        for role, metrics in by_role.items()
+        if metrics['status'] >= 500
+    ]
+
+
+def compare_with_baseline(results, baseline, query_slack=0, latency_tolerance=None):
+    """Сверка с эталоном: [(метка, роль, вердикт, пояснение)].
+
+    Вердикт 'fail' — ответ 5xx (даже если такой же в эталоне), превышен
+    бюджет запросов (эталон + query_slack, для холодного и прогретого
+    запроса) или, если задан latency_tolerance, p50 вырос больше чем в
+    1 + latency_tolerance раз; 'new' — эталона нет.
+    """
+    report = []
+    for label, by_role in results.items():
+        for role, metrics in by_role.items():
+            if metrics['status'] >= 500:
+                report.append((label, role, 'fail', f'server error {metrics["status"]}'))
+                continue
+            expected = baseline.get(label, {}).get(role)
+            if expected is None:
+                report.append((label, role, 'new', ''))
+                continue
+
+            problems = []
+            for key in ('queries', 'queries_cold'):
+                budget = expected[key] + query_slack
+                if metrics[key] > budget:
+                    problems.append(f'{key} {metrics[key]} > {budget}')
+            if latency_tolerance is not None and expected['p50_ms'] > 0:
+                ratio = metrics['p50_ms'] / expected['p50_ms']
+                if ratio > 1 + latency_tolerance:
+                    problems.append(f'p50 x{ratio:.2f}')
+            if metrics['status'] != expected['status']:
+                problems.append(f'status {metrics["status"]} != {expected["status"]}')
+            report.append((label, role, 'fail' if problems else 'ok', ', '.join(problems)))
+    return report
+
+
+# Страницы с виджетами: (метка, синхронный вид, async-вид, параметры GET)
+ASYNC_PAGES = [
+    ('dashboard', views.dashboard, views.dashboard_async, lambda f: {}),
+    ('calendar', views.calendar_view, views.calendar_async, lambda f: {}),
+    ('kanban', views.kanban_view, views.kanban_async, lambda f: {}),
+    ('kanban:filtered', views.kanban_view, views.kanban_async,
+     lambda f: {'project': f['project'].pk, 'priority': 'high'}),
+]
+
+
+def _network_delay(seconds):
+    """execute_wrapper: задержка на каждый запрос, как сетевой round trip до PostgreSQL"""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+def _call_view(view, user, params, db_latency=0.0):
+    """(секунды, число SQL, {виджет: секунды}, статус) одного вызова вида с пустым кэшем"""
+    request = RequestFactory().get('/', params)
+    request.user = user
+    _clear_caches()
+    timer = QueryTimer()
+    with ExitStack() as stack:
+        stack.enter_context(wrap_connections(timer))
+        if db_latency:
+            stack.enter_context(wrap_connections(_network_delay(db_latency)))
+        started = time.perf_counter()
+        # async-вид — как под ASGI с синхронными middleware: цикл событий в
+        # отдельном потоке, sync_to_async возвращается в текущий поток
+        response = async_to_sync(view)(request) if asyncio.iscoroutinefunction(view) else view(request)
+        elapsed = time.perf_counter() - started
+    return elapsed, timer.queries, request.widget_timings, response.status_code
+
+
+def _view_metrics(samples):
+    times = [sample[0] * 1000 for sample in samples]
+    slowest = [max(sample[2].values()) * 1000 for sample in samples]
+    widgets_total = [sum(sample[2].values()) * 1000 for sample in samples]
+    return {
+        'status': samples[-1][3],
+        'p50_ms': round(percentile(times, 0.5), 2),
+        'p95_ms': round(percentile(times, 0.95), 2),
+        'queries': max(sample[1] for sample in samples),
+        'slowest_widget_p95_ms': round(percentile(slowest, 0.95), 2),
+        'widgets_total_p95_ms': round(percentile(widgets_total, 0.95), 2),
+    }
+
+
+def compare_async(iterations=10, roles=ROLES, progress=None, db_latency=0.0):
+    """{метка: {роль: {'sync': метрики, 'async': метрики}}} для ASYNC_PAGES.
+
+    Виды вызываются напрямую, без middleware; кэш очищается перед каждым
+    вызовом, иначе виджеты дашборда — попадания в кэш. Вызовы sync и async
+    чередуются, чтобы оба видели одинаковое состояние БД и её кэшей. В
+    async-прогоне p95 страницы должен быть близок к p95 самого медленного
+    виджета, в синхронном — к сумме виджетов.
+
+    db_latency (секунды) добавляется к каждому SQL-запросу: у локальной SQLite
+    нет сетевых задержек, на которых и выигрывает параллельная загрузка.
+    """
+    results = {}
+    for role in roles:
+        user = role_user(role)
+        fixtures = build_fixtures(user) if user is not None else None
+        if fixtures is None:
+            continue
+        for label, sync_view, async_view, params in ASYNC_PAGES:
+            params = params(fixtures)
+            # Прогрев: подключения потоков пула, шаблоны
+            _call_view(sync_view, user, params, db_latency)
+            _call_view(async_view, user, params, db_latency)
+            samples = {'sync': [], 'async': []}
+            for _iteration in range(iterations):
+                samples['sync'].append(_call_view(sync_view, user, params, db_latency))
+                samples['async'].append(_call_view(async_view, user, params, db_latency))
+            metrics = {mode: _view_metrics(mode_samples) for mode, mode_samples in samples.items()}
+            results.setdefault(label, {})[role] = metrics
+            if progress:
+                progress(label, role, metrics)
+    return results
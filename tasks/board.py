@@ -0,0 +1,166 @@
+from django.contrib.auth.models import User
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Q, Value
+
+from .models import Project, Task, TaskTombstone
+from .search import search_tasks
+
+DONE_COLUMN_LIMIT = 20
+
+
+def is_board_admin(user):
+    return user.is_superuser or user.profile.role == 'admin'
+
+
+def visible_tasks(user):
+    """Задачи, которые пользователь видит на Kanban"""
+    if is_board_admin(user):
+        return Task.objects.all()
+    # Подзапрос по участию в проектах вместо JOIN + distinct()
+    return Task.objects.filter(
+        Q(assignee=user) | Q(project__in=user.projects.values('pk'))
+    )
+
+
+def project_access(user, project):
+    """Видит ли пользователь проект: админ, создатель, участник или исполнитель его задач.
+
+    Те же правила, что у visible_tasks и task_access, — одним EXISTS.
+    """
+    if is_board_admin(user) or project.created_by_id == user.pk:
+        return True
+    return Project.objects.filter(pk=project.pk).filter(
+        Q(pk__in=user.projects.values('pk'))
+        | Q(pk__in=Task.objects.filter(assignee=user).values('project_id'))
+    ).exists()
+
+
+def task_access(user, task_ids):
+    """Одним запросом: {id: (project_id, assignee_id, можно_ли_менять)} для существующих задач"""
+    if is_board_admin(user):
+        allowed = Value(True, output_field=BooleanField())
+    else:
+        allowed = ExpressionWrapper(
+            Q(assignee=user) | Q(project__in=user.projects.values('pk')),
+            output_field=BooleanField(),
+        )
+    rows = (
+        Task.objects.filter(pk__in=task_ids)
+        .annotate(allowed=allowed)
+        .order_by()
+        .values_list('pk', 'project_id', 'assignee_id', 'allowed')
+    )
+    return {
+        pk: (project_id, assignee_id, bool(is_allowed))
+        for pk, project_id, assignee_id, is_allowed in rows
+    }
+
+
+def visible_tombstones(user):
+    if is_board_admin(user):
+        return TaskTombstone.objects.all()
+    return TaskTombstone.objects.filter(
+        Q(assignee_id=user.pk) | Q(project_id__in=user.projects.values('pk'))
+    )
+
+
+BOARD_FILTERS = ('project', 'assignee', 'priority', 'search', 'tag')
+
+
+def board_filters(params):
+    """Фильтры Kanban из GET-параметров: {имя: значение или ''}"""
+    filters = {name: params.get(name, '') for name in BOARD_FILTERS}
+    filters['tag'] = filters['tag'].strip()
+    return filters
+
+
+def filter_board(tasks, project='', assignee='', priority='', search='', tag=''):
+    """Фильтры Kanban (проект, исполнитель, приоритет, полнотекстовый поиск, тег)"""
+    if project:
+        tasks = tasks.filter(project_id=project)
+    if assignee:
+        tasks = tasks.filter(assignee_id=assignee)
+    if priority:
+        tasks = tasks.filter(priority=priority)
+    if tag:
+        tasks = tasks.tagged(tag)
+    if search:
+        tasks = search_tasks(tasks, search)
+    return tasks
+
+
+def filter_options(user):
+    """Списки для фильтров Kanban: {'projects': [...], 'assignees': [...]}"""
+    if is_board_admin(user):
+        projects = Project.objects.all()
+        assignees = User.objects.filter(is_active=True)
+    else:
+        # Проекты, где пользователь участник или исполнитель, и их люди
+        projects = Project.objects.filter(
+            Q(pk__in=user.projects.values('pk'))
+            | Q(pk__in=Task.objects.filter(assignee=user).values('project_id'))
+        )
+        project_ids = projects.values('pk')
+        assignees = User.objects.filter(
+            Q(pk__in=Project.members.through.objects.filter(project_id__in=project_ids).values('user_id'))
+            | Q(pk__in=Task.objects.filter(project_id__in=project_ids).values('assignee_id'))
+        )
+
+    return {
+        'projects': [{'id': pk, 'name': name} for pk, name in projects.values_list('pk', 'name')],
+        'assignees': [
+            {'id': assignee.pk, 'name': assignee.profile.display_name}
+            for assignee in assignees.select_related('profile').order_by('first_name', 'last_name', 'username')
+        ],
+    }
+
+
+def board_version(user, since=None):
+    """Версия видимых задач (включая удаления) — строка или None, если задач нет.
+
+    Момент последнего изменения и, если задан since, число изменений после него:
+    строка, зафиксированная позже со старым updated_at, не сдвигает максимум,
+    но меняет число строк в окне.
+    """
+    changed = {} if since is None else {'filter': Q(updated_at__gt=since)}
+    deleted = {} if since is None else {'filter': Q(deleted_at__gt=since)}
+    tasks = visible_tasks(user).aggregate(last=Max('updated_at'), count=Count('pk', **changed))
+    tombstones = visible_tombstones(user).aggregate(last=Max('deleted_at'), count=Count('pk', **deleted))
+    moments = [moment for moment in (tasks['last'], tombstones['last']) if moment is not None]
+    if not moments:
+        return None
+    return f'{max(moments).isoformat()}/{tasks["count"]}/{tombstones["count"]}'
+
+
+def partition_board(tasks):
+    """Раскладывает уже загруженные открытые задачи (карточки) по колонкам Kanban за один проход.
+
+    Задачи идут в ручном порядке (rank, см. tasks/ranking.py) — он сохраняется
+    в колонках. Колонка «Выполнено» выводится постранично отдельно
+    (DONE_COLUMN_LIMIT карточек на страницу). Возвращает (колонки, количество задач).
+    """
+    columns = {status: [] for status, _label in Task.STATUS_CHOICES}
+    total = 0
+    for task in tasks:
+        columns.setdefault(task.status, []).append(task)
+        total += 1
+    return columns, total
+
+
+def card_payload(card, matches=True):
+    """Данные карточки для live_updates.js (card — tasks.cards.TaskCard)"""
+    return {
+        'id': card.id,
+        'title': card.title,
+        'status': card.status,
+        'priority': card.priority,
+        'priority_label': card.priority_label,
+        'rank': card.rank,
+        'project_id': card.project_id,
+        'project_name': card.project_name,
+        'project_color': card.project_color,
+        'assignee_id': card.assignee_id,
+        'assignee_initials': card.assignee_initials,
+        'assignee_color': card.assignee_color,
+        'updated_at': card.updated_at.isoformat(),
+        'matches': matches,
+    }
@@ -0,0 +1,162 @@
+"""Брокер событий об изменениях задач для SSE-потока живых досок.
+
+Бэкенд задаётся настройкой TASKFLOW_EVENT_BROKER: InMemoryBroker для одного
+воркера, PostgresBroker (LISTEN/NOTIFY) для нескольких.
+"""
+import collections
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def project_channel(project_id):
+    return f'project:{project_id}'
+
+
+class InMemoryBroker:
+    """Рассылка событий подписчикам внутри одного процесса"""
+
+    def __init__(self, history=1000):
+        self._condition = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._seq = 0
+
+    @property
+    def last_seq(self):
+        with self._condition:
+            return self._seq
+
+    def publish(self, channel, payload):
+        self._dispatch(channel, payload)
+
+    def _dispatch(self, channel, payload):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, channel, payload))
+            self._condition.notify_all()
+
+    def wait(self, after, channels=None, timeout=15.0):
+        """Ждёт события новее after в нужных каналах (None — все каналы).
+
+        Возвращает (события, последний номер), где событие — (номер, канал, данные).
+        Пустой список означает, что за timeout секунд ничего не произошло.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events = [
+                    event for event in self._events
+                    if event[0] > after and (channels is None or event[1] in channels)
+                ]
+                if events:
+                    return events, self._seq
+                # Чужие события пропускаем, чтобы не сканировать их повторно
+                after = self._seq
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], after
+                self._condition.wait(remaining)
+
+
+class PostgresBroker(InMemoryBroker):
+    """События через LISTEN/NOTIFY — общие для всех процессов"""
+
+    PG_CHANNEL = 'taskflow_events'
+    RECONNECT_DELAY = 5.0
+
+    def __init__(self, history=1000, using='default'):
+        super().__init__(history=history)
+        self.using = using
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        message = json.dumps({'channel': channel, 'payload': payload})
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.PG_CHANNEL, message])
+
+    def wait(self, after, channels=None, timeout=15.0):
+        self._ensure_listener()
+        return super().wait(after, channels=channels, timeout=timeout)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen_forever, name='taskflow-event-listener', daemon=True
+                )
+                self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Event listener connection lost, reconnecting')
+                time.sleep(self.RECONNECT_DELAY)
+
+    def _listen(self):
+        # Отдельное соединение вне ORM и пула: оно всё время висит на LISTEN
+        wrapper = connections[self.using]
+        raw = wrapper.Database.connect(**wrapper.get_connection_params())
+        try:
+            raw.autocommit = True
+            cursor = raw.cursor()
+            cursor.execute(f'LISTEN {self.PG_CHANNEL}')
+
+            if callable(getattr(raw, 'notifies', None)):
+                # psycopg 3
+                while True:
+                    for notify in raw.notifies(timeout=self.RECONNECT_DELAY):
+                        self._handle(notify.payload)
+            else:
+                # psycopg2
+                while True:
+                    if select.select([raw], [], [], self.RECONNECT_DELAY) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        self._handle(raw.notifies.pop(0).payload)
+        finally:
+            raw.close()
+
+    def _handle(self, raw_message):
+        try:
+            message = json.loads(raw_message)
+        except ValueError:
+            logger.warning('Malformed event payload: %r', raw_message)
+            return
+        self._dispatch(message['channel'], message['payload'])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Брокер процесса (создаётся при первом обращении)"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            broker_class = import_string(
+                getattr(settings, 'TASKFLOW_EVENT_BROKER', 'tasks.broker.InMemoryBroker')
+            )
+            _broker = broker_class()
+        return _broker
+
+
+def publish_on_commit(channel, payload, using=None):
+    """Публикует событие после фиксации транзакции (сразу, если транзакции нет).
+
+    Ошибка публикации только логируется: данные уже зафиксированы, а следующие
+    on_commit-обработчики (сброс кэша) должны выполниться.
+    """
+    transaction.on_commit(lambda: get_broker().publish(channel, payload), using=using, robust=True)
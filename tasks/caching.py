@@ -0,0 +1,160 @@
+"""Кэш фрагментов страниц с версионированными ключами.
+
+Ключ фрагмента включает версии областей, от которых он зависит:
+('user', id), ('project', id) и общие ('team',), ('directory',), ('cards',).
+Сигналы моделей увеличивают версию области после фиксации транзакции
+(bump_versions_on_commit), после чего старые ключи просто перестают
+читаться и истекают по TTL.
+
+Бэкенд — CACHES['default']: локальная память по умолчанию, Redis при
+заданном CACHE_URL (см. settings.py). Счётчики попаданий/промахов
+ведутся по имени фрагмента в пределах процесса (fragment_cache_stats)
+и в Prometheus (taskflow_fragment_cache_requests_total, см. metrics.py).
+
+Фрагмент, собранный с реплики (tasks/routers.py), может не содержать
+изменения, версия которого уже в ключе, — он живёт не дольше
+TASKFLOW_REPLICA_FRAGMENT_TIMEOUT.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .metrics import record_fragment_cache
+from .routers import reading_replica
+
+KEY_PREFIX = 'taskflow'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_MISSING = object()
+
+
+def _cache():
+    return caches[getattr(settings, 'TASKFLOW_FRAGMENT_CACHE', 'default')]
+
+
+def _timeout():
+    timeout = getattr(settings, 'TASKFLOW_FRAGMENT_CACHE_TIMEOUT', 300)
+    if reading_replica():
+        return min(timeout, getattr(settings, 'TASKFLOW_REPLICA_FRAGMENT_TIMEOUT', 30))
+    return timeout
+
+
+def _scope_label(scope):
+    return '-'.join(str(part) for part in scope)
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:ver:{_scope_label(scope)}'
+
+
+def _new_version():
+    # Не с единицы: после вытеснения версии из кэша старые ключи не оживут
+    return time.time_ns() // 1000
+
+
+def bump_versions(*scopes):
+    """Новая версия областей — зависящие от них фрагменты перестают читаться"""
+    cache = _cache()
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def bump_versions_on_commit(*scopes, using=None):
+    """bump_versions после фиксации транзакции (сразу, если транзакции нет).
+
+    Иначе параллельный запрос успеет собрать фрагмент из ещё не
+    зафиксированных данных и сохранить его под новой версией.
+    """
+    transaction.on_commit(lambda: bump_versions(*scopes), using=using, robust=True)
+
+
+def get_versions(scopes):
+    """{область: версия} одним обращением к кэшу"""
+    cache = _cache()
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def fragment_key(name, scopes, versions):
+    parts = [f'{_scope_label(scope)}.{versions[scope]}' for scope in scopes]
+    return ':'.join([KEY_PREFIX, 'frag', name, *parts])
+
+
+def _record(name, hits=0, misses=0):
+    with _stats_lock:
+        _stats[(name, 'hits')] += hits
+        _stats[(name, 'misses')] += misses
+    record_fragment_cache(name, hits, misses)
+
+
+def fragment_cache_stats():
+    """{имя фрагмента: {'hits': …, 'misses': …}} с момента запуска процесса"""
+    with _stats_lock:
+        stats = {}
+        for (name, kind), count in _stats.items():
+            stats.setdefault(name, {'hits': 0, 'misses': 0})[kind] = count
+        return stats
+
+
+def cached_fragment(name, scopes, build, variant=None):
+    """Значение фрагмента из кэша или build() с сохранением.
+
+    variant — дополнительная часть ключа (например, дата), не влияющая на счётчики.
+    """
+    cache = _cache()
+    key = fragment_key(name if variant is None else f'{name}:{variant}', scopes, get_versions(scopes))
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _record(name, hits=1)
+        return value
+
+    _record(name, misses=1)
+    # Срок — до сборки: запись внутри build() переключит чтения на основную БД
+    timeout = _timeout()
+    value = build()
+    cache.set(key, value, timeout=timeout)
+    return value
+
+
+def cached_fragments(name, items, build_missing, variant=None):
+    """Пачка однотипных фрагментов, например карточек проектов.
+
+    items — {идентификатор: области}; build_missing(идентификаторы)
+    возвращает {идентификатор: значение} для промахов. Результат —
+    {идентификатор: значение}; версии и значения читаются get_many.
+    variant — как у cached_fragment.
+    """
+    cache = _cache()
+    versions = get_versions({scope for scopes in items.values() for scope in scopes})
+    prefix = name if variant is None else f'{name}:{variant}'
+    keys = {
+        item: fragment_key(f'{prefix}:{item}', scopes, versions)
+        for item, scopes in items.items()
+    }
+    found = cache.get_many(keys.values())
+    values = {item: found[key] for item, key in keys.items() if key in found}
+
+    missing = [item for item in items if item not in values]
+    _record(name, hits=len(values), misses=len(missing))
+    if missing:
+        timeout = _timeout()
+        built = build_missing(missing)
+        cache.set_many({keys[item]: built[item] for item in missing if item in built}, timeout=timeout)
+        values.update(built)
+    return values
@@ -0,0 +1,110 @@
+"""Лёгкие карточки задач для списков: доска, «Мои задачи», проект, дашборд.
+
+Списки показывают десяток полей задачи, проекта и исполнителя, а экземпляр
+модели тянет все колонки, _state, кэши связей и по объекту на каждую
+связанную строку. Здесь строки читаются через values_list только с нужными
+колонками, и каждая превращается в TaskCard со __slots__: производные поля
+(подписи, ранг приоритета, просрочка, инициалы, теги) считаются один раз
+при сборке, а шаблоны читают готовые атрибуты.
+
+Страницы задачи и формы работают с моделью как раньше.
+"""
+from django.utils import timezone
+
+from .models import Task, UserProfile
+
+_FIELDS = (
+    'id', 'title', 'status', 'priority', 'rank', 'due_date', 'created_at', 'updated_at',
+    'project_id', 'project__name', 'project__color',
+    'assignee_id', 'assignee__first_name', 'assignee__last_name', 'assignee__username',
+    'assignee__profile__avatar_color',
+)
+
+
+class TaskCard:
+    """Задача в списке: только то, что выводят шаблоны и card_payload"""
+    __slots__ = (
+        'id', 'title', 'status', 'priority', 'rank', 'due_date', 'created_at', 'updated_at',
+        'project_id', 'project_name', 'project_color',
+        'assignee_id', 'assignee_name', 'assignee_initials', 'assignee_color',
+        'status_label', 'priority_label', 'priority_rank', 'is_overdue', 'days_until_due',
+        'tags', 'description', 'raw_snippet', 'snippet', 'search_rank',
+    )
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f'<TaskCard {self.id}: {self.title}>'
+
+
+def build_cards(rows, extra=(), today=None):
+    """Карточки из строк values_list(*_FIELDS, *extra) за один проход"""
+    today = today or timezone.now().date()
+    status_labels, priority_labels, ranks = Task.STATUS_LABELS, Task.PRIORITY_LABELS, Task.PRIORITY_RANK
+    cards = []
+    for row in rows:
+        (pk, title, status, priority, rank, due_date, created_at, updated_at,
+         project_id, project_name, project_color,
+         assignee_id, first_name, last_name, username, avatar_color) = row[:len(_FIELDS)]
+        card = TaskCard()
+        card.id = pk
+        card.title = title
+        card.status = status
+        card.priority = priority
+        card.rank = rank
+        card.due_date = due_date
+        card.created_at = created_at
+        card.updated_at = updated_at
+        card.project_id = project_id
+        card.project_name = project_name
+        card.project_color = project_color
+        card.assignee_id = assignee_id
+        if assignee_id:
+            card.assignee_name = UserProfile.name_for(first_name, last_name, username)
+            card.assignee_initials = UserProfile.initials_for(first_name, last_name, username)
+            card.assignee_color = avatar_color
+        else:
+            card.assignee_name = card.assignee_initials = card.assignee_color = None
+        card.status_label = status_labels.get(status, status)
+        card.priority_label = priority_labels.get(priority, priority)
+        card.priority_rank = ranks.get(priority, 0)
+        # Те же правила, что у Task.is_overdue
+        card.is_overdue = bool(due_date and status != 'done' and due_date < today)
+        card.days_until_due = (due_date - today).days if due_date else None
+        card.tags = ()
+        card.description = card.raw_snippet = card.snippet = card.search_rank = None
+        for name, value in zip(extra, row[len(_FIELDS):]):
+            setattr(card, name, value)
+        cards.append(card)
+    return cards
+
+
+def _attach_tags(cards, using):
+    if not cards:
+        return
+    by_id = {card.id: card for card in cards}
+    tags = {pk: [] for pk in by_id}
+    rows = (
+        Task.tags.through.objects.using(using)
+        .filter(task_id__in=list(by_id))
+        .order_by('tag__name')
+        .values_list('task_id', 'tag__name')
+    )
+    for task_id, name in rows:
+        tags[task_id].append(name)
+    for pk, names in tags.items():
+        by_id[pk].tags = names
+
+
+def load_cards(tasks, tags=False, extra=(), today=None):
+    """Карточки задач QuerySet (порядок и срез сохраняются).
+
+    tags — добавить имена тегов одним запросом на все карточки;
+    extra — дополнительные поля или аннотации (например 'description').
+    """
+    cards = build_cards(tasks.values_list(*_FIELDS, *extra), extra, today)
+    if tags:
+        _attach_tags(cards, tasks.db)
+    return cards
@@ -0,0 +1,135 @@
+"""Независимые части страницы (виджеты): по очереди или параллельно.
+
+Виджет — функция без аргументов, возвращающая готовые данные (списки,
+словари), а не ленивый QuerySet: запросы выполняются там, где виджет
+вызван. Синхронные виды считают виджеты по очереди (run_widgets),
+async-виды под ASGI — одновременно (gather_widgets), и страница ждёт самый
+медленный виджет, а не их сумму.
+
+Потоковые ответы под ASGI отдаются async-итератором (stream_body): синхронное
+содержимое StreamingHttpResponse Django 5.0 сначала читает целиком.
+
+Подключения Django к БД привязаны к потоку, а async ORM в Django 4.2/5.0 —
+те же синхронные запросы в одном потоке запроса, параллельности он не даёт.
+Поэтому виджеты выполняются в ограниченном пуле (TASKFLOW_WIDGET_THREADS):
+у каждого потока пула своё постоянное подключение, и на воркер их не
+больше, чем потоков пула. Замеры SQL (metrics, profiling) переносятся в
+потоки пула через inherit_connection_wrappers.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+from .profiling import inherit_connection_wrappers
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def widget_executor():
+    """Пул потоков виджетов, один на процесс"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TASKFLOW_WIDGET_THREADS', 8),
+                thread_name_prefix='taskflow-widget',
+            )
+        return _executor
+
+
+def _timed(builder):
+    started = time.perf_counter()
+    value = builder()
+    return value, time.perf_counter() - started
+
+
+def _run_in_pool(builder):
+    # Как на границах запроса: протухшие и сломанные подключения потока закрываются
+    close_old_connections()
+    try:
+        with inherit_connection_wrappers():
+            return _timed(builder)
+    finally:
+        close_old_connections()
+
+
+def run_widgets(widgets):
+    """({имя: данные}, {имя: секунды}) — виджеты по очереди в текущем потоке"""
+    values, timings = {}, {}
+    for name, builder in widgets.items():
+        values[name], timings[name] = _timed(builder)
+    return values, timings
+
+
+async def gather_widgets(widgets):
+    """({имя: данные}, {имя: секунды}) — виджеты одновременно в пуле потоков"""
+    loop = asyncio.get_running_loop()
+    executor = widget_executor()
+    results = await asyncio.gather(*(
+        # run_in_executor не переносит contextvars — копия контекста на каждый виджет
+        loop.run_in_executor(executor, contextvars.copy_context().run, _run_in_pool, builder)
+        for builder in widgets.values()
+    ))
+    values = {name: value for name, (value, _seconds) in zip(widgets, results)}
+    timings = {name: seconds for name, (_value, seconds) in zip(widgets, results)}
+    return values, timings
+
+
+def _is_authenticated(request):
+    # request.user из AuthenticationMiddleware ленивый: загружается здесь,
+    # дальше атрибуты пользователя читаются без запросов
+    return request.user.is_authenticated
+
+
+def async_login_required(view):
+    """login_required для async-вида: в Django 4.2/5.0 декоратор их не поддерживает"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(_is_authenticated)(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncChunks:
+    """Синхронный генератор тела ответа как async-итератор.
+
+    Каждый кусок берётся отдельным sync_to_async в потоке запроса — там же,
+    где открыт серверный курсор, — и сразу уходит клиенту. close() Django
+    вызывает в том же потоке, закрывая ответ.
+    """
+    _DONE = object()
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        next_chunk = sync_to_async(next)
+        while (chunk := await next_chunk(self._chunks, self._DONE)) is not self._DONE:
+            yield chunk
+
+    def close(self):
+        self._chunks.close()
+
+
+def is_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+
+def stream_body(request, chunks):
+    """Содержимое StreamingHttpResponse: под ASGI — AsyncChunks, под WSGI — как есть"""
+    return AsyncChunks(chunks) if is_asgi(request) else chunks
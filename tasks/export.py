@@ -0,0 +1,150 @@
+"""Потоковая выгрузка задач: CSV или NDJSON, по желанию в gzip.
+
+Строки читаются QuerySet.iterator(chunk_size) — на PostgreSQL это
+серверный курсор, в памяти лежит одна пачка. Теги и число комментариев
+добираются двумя запросами на пачку, а не на задачу; каждая пачка сразу
+превращается в байты и отдаётся (StreamingHttpResponse или файл). Память
+не зависит от размера выгрузки.
+
+За PgBouncer в режиме transaction серверные курсоры не работают — там
+нужен DISABLE_SERVER_SIDE_CURSORS в настройках БД; тогда iterator() читает
+результат целиком на стороне драйвера.
+
+БД выгрузки (реплика или основная, см. tasks/routers.py) выбирается при
+вызове export_chunks: тело ответа читается уже после выхода из вида.
+"""
+import csv
+import io
+import json
+import zlib
+from itertools import islice
+
+from django.db.models import Count
+
+from .models import Task, TaskComment
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+COLUMNS = [
+    'id', 'title', 'status', 'priority', 'project_id', 'project', 'assignee_id', 'assignee',
+    'due_date', 'created_at', 'updated_at', 'comments', 'tags',
+]
+_SOURCE_FIELDS = [
+    'pk', 'title', 'status', 'priority', 'project_id', 'project__name', 'assignee_id',
+    'assignee__first_name', 'assignee__last_name', 'assignee__username',
+    'due_date', 'created_at', 'updated_at',
+]
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _batch_lookup(task_ids):
+    """Условие на task_id для пачки (id по возрастанию): плотная пачка — диапазоном,
+    без тысяч параметров IN; лишние строки из разреженного диапазона отбрасывает вызывающий"""
+    if task_ids[-1] - task_ids[0] < 2 * len(task_ids):
+        return {'task_id__gte': task_ids[0], 'task_id__lte': task_ids[-1]}
+    return {'task_id__in': task_ids}
+
+
+def _tags_by_task(task_ids, using):
+    TaskTag = Task.tags.through
+    tags = {pk: [] for pk in task_ids}
+    rows = (
+        TaskTag.objects.using(using).filter(**_batch_lookup(task_ids))
+        .order_by('task_id', 'tag__name')
+        .values_list('task_id', 'tag__name')
+    )
+    for task_id, name in rows:
+        if task_id in tags:
+            tags[task_id].append(name)
+    return tags
+
+
+def _comment_counts(task_ids, using):
+    return dict(
+        TaskComment.objects.using(using).filter(**_batch_lookup(task_ids))
+        .order_by()
+        .values('task_id')
+        .annotate(count=Count('id'))
+        .values_list('task_id', 'count')
+    )
+
+
+def export_batches(tasks, chunk_size=CHUNK_SIZE):
+    """Пачки строк выгрузки (словари по COLUMNS) в порядке id"""
+    rows = tasks.order_by('pk').values_list(*_SOURCE_FIELDS).iterator(chunk_size=chunk_size)
+    for batch in _batches(rows, chunk_size):
+        task_ids = [row[0] for row in batch]
+        tags = _tags_by_task(task_ids, tasks.db)
+        comments = _comment_counts(task_ids, tasks.db)
+        yield [
+            {
+                'id': pk,
+                'title': title,
+                'status': status,
+                'priority': priority,
+                'project_id': project_id,
+                'project': project,
+                'assignee_id': assignee_id,
+                'assignee': (f'{first_name} {last_name}'.strip() or username) if assignee_id else None,
+                'due_date': due_date.isoformat() if due_date else None,
+                'created_at': created_at.isoformat(),
+                'updated_at': updated_at.isoformat(),
+                'comments': comments.get(pk, 0),
+                'tags': tags[pk],
+            }
+            for (pk, title, status, priority, project_id, project, assignee_id,
+                 first_name, last_name, username, due_date, created_at, updated_at) in batch
+        ]
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([
+                ','.join(row[name]) if name == 'tags' else ('' if row[name] is None else row[name])
+                for name in COLUMNS
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Пустая выгрузка — только заголовок
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch).encode()
+
+
+def gzip_chunks(chunks, level=6):
+    """Потоковое сжатие в формат gzip (одна пачка на входе — кусок на выходе)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(tasks, fmt='csv', compress=False, chunk_size=CHUNK_SIZE):
+    """Байты выгрузки по пачкам: fmt — 'csv' или 'ndjson', compress — gzip"""
+    batches = export_batches(tasks.using(tasks.db), chunk_size)
+    chunks = _csv_chunks(batches) if fmt == 'csv' else _ndjson_chunks(batches)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(fmt, compress, today):
+    extension = FORMATS[fmt][1]
+    return f'tasks-{today:%Y%m%d}.{extension}' + ('.gz' if compress else '')
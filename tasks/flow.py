@@ -0,0 +1,83 @@
+"""Метрики потока по журналу смен статусов (TaskEvent).
+
+За период [since, until) по завершениям — событиям перехода в done:
+- throughput — сколько задач завершено;
+- cycle time — от первого перехода задачи в работу до завершения;
+- lead time — от создания задачи до завершения.
+WIP — задачи в работе и на проверке сейчас.
+
+Каждая метрика — один GROUP BY по проекту или исполнителю (исполнитель —
+на момент завершения). Задача, переоткрытая и снова завершённая, считается
+столько раз, сколько завершалась.
+"""
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, OuterRef, Q, Subquery
+
+from .models import Task, TaskEvent
+
+DONE = TaskEvent.STATUS_CODES['done']
+IN_PROGRESS = TaskEvent.STATUS_CODES['in_progress']
+WIP_STATUSES = ['in_progress', 'review']
+GROUPS = {'project': 'project_id', 'assignee': 'assignee_id'}
+
+
+def _duration(expression):
+    return ExpressionWrapper(expression, output_field=DurationField())
+
+
+def completions(since, until, **filters):
+    """Завершения за период; filters — по project_id / assignee_id события"""
+    return TaskEvent.objects.filter(to_status=DONE, created_at__gte=since, created_at__lt=until, **filters)
+
+
+def completion_metrics(group, since, until, **filters):
+    """{id: {'throughput', 'cycle_avg', 'cycle_max', 'lead_avg', 'lead_max'}} — одним запросом"""
+    column = GROUPS[group]
+    started = (
+        TaskEvent.objects.filter(task_id=OuterRef('task_id'), to_status=IN_PROGRESS)
+        .order_by()
+        .values('task_id')
+        .annotate(first=Min('created_at'))
+        .values('first')
+    )
+    rows = (
+        completions(since, until, **filters)
+        .order_by()
+        .values(column)
+        .annotate(
+            throughput=Count('id'),
+            # Сразу завершённые (без «в работе») в cycle time не входят
+            cycle_avg=Avg(_duration(F('created_at') - Subquery(started))),
+            cycle_max=Max(_duration(F('created_at') - Subquery(started))),
+            lead_avg=Avg(_duration(F('created_at') - F('task__created_at'))),
+            lead_max=Max(_duration(F('created_at') - F('task__created_at'))),
+        )
+    )
+    return {row.pop(column): row for row in rows}
+
+
+def wip(group, **filters):
+    """{id: задач в работе и на проверке} по текущему состоянию задач"""
+    column = GROUPS[group]
+    rows = (
+        Task.objects.filter(**filters)
+        .order_by()
+        .values(column)
+        .annotate(wip=Count('id', filter=Q(status__in=WIP_STATUSES)))
+        .filter(wip__gt=0)
+    )
+    return {row[column]: row['wip'] for row in rows}
+
+
+def flow_metrics(group, since, until, **filters):
+    """[{'id', 'throughput', 'cycle_avg', …, 'wip'}] по проектам или исполнителям,
+    самые производительные первыми; filters — project_id / assignee_id"""
+    completed = completion_metrics(group, since, until, **filters)
+    in_progress = wip(group, **filters)
+    empty = {'throughput': 0, 'cycle_avg': None, 'cycle_max': None, 'lead_avg': None, 'lead_max': None}
+    rows = [
+        {'id': pk, **completed.get(pk, empty), 'wip': in_progress.get(pk, 0)}
+        for pk in completed.keys() | in_progress.keys()
+        if pk is not None
+    ]
+    rows.sort(key=lambda row: (-row['throughput'], -row['wip'], row['id']))
+    return rows
@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import Project, Task, TaskComment, Department, UserProfile
+from .models import Project, Tag, Task, TaskComment, Department, UserProfile
 
 
 class ProjectForm(forms.ModelForm):
@@ -22,9 +22,17 @@ class ProjectForm(forms.ModelForm):
 
 
 class TaskForm(forms.ModelForm):
+    # Теги вводятся строкой через запятую и сохраняются в таблицу Tag
+    tags = forms.CharField(
+        max_length=500,
+        required=False,
+        label='Теги (через запятую)',
+        widget=forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'frontend, urgent, api'}),
+    )
+
     class Meta:
         model = Task
-        fields = ['title', 'description', 'project', 'status', 'priority', 'assignee', 'due_date', 'tags']
+        fields = ['title', 'description', 'project', 'status', 'priority', 'assignee', 'due_date']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'Название задачи'}),
             'description': forms.Textarea(attrs={'class': 'form-input', 'rows': 3, 'placeholder': 'Описание задачи'}),
@@ -33,12 +41,13 @@ class TaskForm(forms.ModelForm):
             'priority': forms.Select(attrs={'class': 'form-input'}),
             'assignee': forms.Select(attrs={'class': 'form-input'}),
             'due_date': forms.DateInput(attrs={'class': 'form-input', 'type': 'date'}),
-            'tags': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'frontend, urgent, api'}),
         }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['tags'] = ', '.join(self.instance.tag_list)
         if user:
             # Показываем только проекты, где пользователь участник или создатель
             from django.db.models import Q
@@ -51,6 +60,13 @@ class TaskForm(forms.ModelForm):
             self.fields['assignee'].label_from_instance = lambda obj: f"{obj.first_name} {obj.last_name} - {obj.profile.position or 'Сотрудник'}"
             self.fields['assignee'].required = False
 
+    def clean_tags(self):
+        return Tag.parse(self.cleaned_data.get('tags'))
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        self.instance.set_tags(self.cleaned_data['tags'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
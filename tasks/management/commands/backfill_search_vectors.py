@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks.search import BACKFILL_BATCH_SIZE, backfill_search_vectors, is_full_text_available
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the full-text search vectors of tasks created before the search migration, '
+        'in short batches by id; run once after migrating, safe to repeat'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE,
+                            help=f'Tasks per UPDATE (default: {BACKFILL_BATCH_SIZE})')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the vectors of all tasks, not only the missing ones')
+
+    def handle(self, *args, **options):
+        if not is_full_text_available():
+            raise CommandError('Full-text search vectors exist only on PostgreSQL')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        started = time.monotonic()
+        written = backfill_search_vectors(
+            options['batch_size'],
+            rebuild=options['rebuild'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'{written:,} search vectors written in {elapsed:,.1f}s'))
+
+    def progress(self, written, last_id):
+        self.stdout.write(f'  up to task {last_id}: {written:,} vectors')
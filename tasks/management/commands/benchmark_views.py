@@ -0,0 +1,162 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tasks.benchmark import (
+    ROLES, SKIPPED, compare_async, compare_with_baseline, run_benchmark, server_errors, uncovered_url_names,
+)
+
+# Набор данных для воспроизводимых замеров: фиксированный seed, масштаб — множитель
+BENCHMARK_SEED = 1000
+DATASET_PER_SCALE = {'users': 200, 'projects': 40, 'tasks': 20000, 'comments': 50000}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every view through the test client against the committed query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Warm requests per endpoint and role')
+        parser.add_argument('--only', nargs='+', help='Endpoint labels or URL names to run')
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=list(ROLES))
+        parser.add_argument('--scale', type=int, default=0,
+                            help=f'Seed a synthetic dataset (seed {BENCHMARK_SEED}) of this scale first')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write the results into the baseline for the current database vendor')
+        parser.add_argument('--query-slack', type=int, default=0,
+                            help='Extra queries allowed over the baseline before failing')
+        parser.add_argument('--latency-tolerance', type=float,
+                            help='Fail when p50 grows by more than this fraction (0.5 = +50%%)')
+        parser.add_argument('--output', help='Also write the raw results as JSON')
+        parser.add_argument('--async-comparison', action='store_true',
+                            help='Compare the sync and async (ASGI) versions of the widget pages instead')
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help='Milliseconds added to every query in --async-comparison (network round trip)')
+
+    def handle(self, *args, **options):
+        uncovered = uncovered_url_names()
+        if uncovered:
+            raise CommandError(f'No benchmark for URLs: {", ".join(uncovered)} (add to tasks/benchmark.py)')
+
+        if options['scale']:
+            self.ensure_dataset(options['scale'])
+        if options['async_comparison']:
+            return self.compare_async(options)
+
+        vendor = connection.vendor
+        self.stdout.write(f'Benchmarking on {vendor}, {options["iterations"]} warm requests per endpoint')
+        for name, reason in SKIPPED.items():
+            self.stdout.write(f'  skipped {name}: {reason}')
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"endpoint":<26} {"role":<10} {"status":>6} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"queries":>9} {"sql ms":>8} {"KB":>8}'
+        )
+        results = run_benchmark(
+            iterations=options['iterations'],
+            only=set(options['only'] or ()),
+            roles=options['roles'],
+            progress=self.print_row,
+        )
+        if not results:
+            raise CommandError('Nothing was benchmarked, run seed_data (or pass --scale) first')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({vendor: results}, output, ensure_ascii=False, indent=2, sort_keys=True)
+
+        baseline = self.load_baseline(options['baseline'])
+        if options['update_baseline']:
+            # Упавшая страница не может стать эталоном — иначе её 500 считался бы нормой
+            errors = server_errors(results)
+            if errors:
+                raise CommandError('Not writing the baseline, server errors: ' + ', '.join(
+                    f'{label} [{role}] {status}' for label, role, status in errors
+                ))
+            # Прогон части точек обновляет только их
+            section = baseline.setdefault(vendor, {})
+            for label, by_role in results.items():
+                section.setdefault(label, {}).update(by_role)
+            Path(options['baseline']).parent.mkdir(parents=True, exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as output:
+                json.dump(baseline, output, ensure_ascii=False, indent=2, sort_keys=True)
+                output.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline for {vendor} written to {options["baseline"]}'))
+            return
+
+        if vendor not in baseline:
+            self.stdout.write(self.style.WARNING(f'No {vendor} baseline, run with --update-baseline'))
+            return
+        report = compare_with_baseline(
+            results, baseline[vendor],
+            query_slack=options['query_slack'],
+            latency_tolerance=options['latency_tolerance'],
+        )
+        self.print_report(report)
+
+    def compare_async(self, options):
+        self.stdout.write(
+            f'Sync vs async widget pages on {connection.vendor}, {options["iterations"]} cold-cache requests each, '
+            f'+{options["db_latency"]:g} ms per query'
+        )
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"page":<18} {"role":<10} {"mode":<6} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"slowest widget":>15} {"all widgets":>12} {"queries":>8}'
+        )
+        results = compare_async(
+            options['iterations'], options['roles'], progress=self.print_comparison,
+            db_latency=options['db_latency'] / 1000,
+        )
+        if not results:
+            raise CommandError('Nothing was benchmarked, run seed_data (or pass --scale) first')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({connection.vendor: results}, output, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def print_comparison(self, label, role, metrics):
+        for mode, row in metrics.items():
+            self.stdout.write(
+                f'{label:<18} {role:<10} {mode:<6} {row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} '
+                f'{row["slowest_widget_p95_ms"]:>15.1f} {row["widgets_total_p95_ms"]:>12.1f} {row["queries"]:>8}'
+            )
+        speedup = metrics['sync']['p95_ms'] / max(metrics['async']['p95_ms'], 0.01)
+        self.stdout.write(f'{"":<29} p95 x{speedup:.2f}')
+
+    def ensure_dataset(self, scale):
+        if User.objects.filter(username__startswith=f'seed{BENCHMARK_SEED}-').exists():
+            self.stdout.write(f'Synthetic dataset (seed {BENCHMARK_SEED}) already present')
+            return
+        counts = {name: count * scale for name, count in DATASET_PER_SCALE.items()}
+        call_command('seed_data', seed=BENCHMARK_SEED, stdout=self.stdout, **counts)
+
+    def load_baseline(self, path):
+        try:
+            with open(path, encoding='utf-8') as baseline:
+                return json.load(baseline)
+        except FileNotFoundError:
+            return {}
+
+    def print_row(self, label, role, metrics):
+        self.stdout.write(
+            f'{label:<26} {role:<10} {metrics["status"]:>6} {metrics["p50_ms"]:>8.1f} {metrics["p95_ms"]:>8.1f} '
+            f'{metrics["queries_cold"]:>4}/{metrics["queries"]:<4} {metrics["sql_ms"]:>8.1f} '
+            f'{metrics["bytes"] / 1024:>8.1f}'
+        )
+
+    def print_report(self, report):
+        self.stdout.write('')
+        failures = [entry for entry in report if entry[2] == 'fail']
+        for label, role, verdict, details in report:
+            if verdict == 'fail':
+                self.stdout.write(self.style.ERROR(f'  FAIL {label} [{role}]: {details}'))
+            elif verdict == 'new':
+                self.stdout.write(self.style.WARNING(f'  new  {label} [{role}]: not in baseline'))
+        if failures:
+            raise CommandError(f'{len(failures)} endpoint(s) over budget')
+        self.stdout.write(self.style.SUCCESS(f'All {len(report)} endpoint/role pairs within budget'))
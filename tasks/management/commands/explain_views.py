@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from tasks.models import Project, ProjectDailyStats, Task, TaskComment, UserDailyStats
+from tasks.flow import completions
+from tasks.stats import OPEN_STATUSES, activity_queryset, dashboard_aggregates
+from datetime import timedelta
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN (ANALYZE on PostgreSQL) for the main query of every view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to build the queries for (default: the busiest assignee)')
+        parser.add_argument('--no-analyze', action='store_true',
+                            help='Plain EXPLAIN without executing the queries')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        today = timezone.now().date()
+
+        explain_options = {}
+        if connection.vendor == 'postgresql' and not options['no_analyze']:
+            explain_options = {'analyze': True, 'buffers': True}
+
+        self.stdout.write(f'EXPLAIN for user "{user.username}" on {connection.vendor}')
+        for name, queryset in self.get_queries(user, today):
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'─── {name} '.ljust(60, '─')))
+            self.stdout.write(queryset.explain(**explain_options))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = (
+            User.objects.annotate(num_tasks=Count('assigned_tasks'))
+            .order_by('-num_tasks')
+            .first()
+        )
+        if user is None:
+            raise CommandError('No users found, run seed_data first')
+        return user
+
+    def get_queries(self, user, today):
+        user_tasks = Task.objects.filter(assignee=user)
+        open_tasks = user_tasks.filter(status__in=OPEN_STATUSES)
+        member_projects = user.projects.values('pk')
+        project = Project.objects.filter(members=user).first() or Project.objects.first()
+        task = user_tasks.first() or Task.objects.first()
+
+        # Группировка по исполнителю даёт ту же одну строку, что и aggregate(),
+        # но остаётся QuerySet, у которого есть explain()
+        yield 'dashboard: counters', (
+            user_tasks.order_by().values('assignee').annotate(**dashboard_aggregates(today))
+        )
+        yield 'dashboard: 7-day activity', activity_queryset(user, today)
+        yield 'dashboard: team workload', (
+            UserDailyStats.objects.filter(day=today).select_related('user__profile').order_by('-open', 'user_id')[:5]
+        )
+        yield 'analytics: team, 365 days', (
+            ProjectDailyStats.objects.filter(day__range=(today - timedelta(days=364), today))
+            .order_by()
+            .values('day')
+            .annotate(open=Sum('open'), created=Sum('created'), completed=Sum('completed'))
+        )
+        if project is not None:
+            yield 'analytics: project throughput, 90 days', (
+                completions(timezone.now() - timedelta(days=90), timezone.now(), project_id=project.pk)
+                .order_by()
+                .values('assignee_id')
+                .annotate(throughput=Count('id'))
+            )
+        yield 'dashboard: upcoming deadlines', (
+            open_tasks.filter(due_date__gte=today).order_by('due_date')[:3]
+        )
+        yield 'dashboard: soon overdue', (
+            open_tasks.filter(due_date__gt=today, due_date__lte=today + timedelta(days=2)).order_by('due_date')
+        )
+        yield 'dashboard: recent tasks', user_tasks.order_by('-created_at')[:5]
+        yield 'calendar', (
+            user_tasks.filter(due_date__range=(today - timedelta(days=6), today + timedelta(days=35)))
+            .select_related('project')
+        )
+        yield 'kanban: open columns', (
+            Task.objects.filter(Q(assignee=user) | Q(project__in=member_projects))
+            .exclude(status='done')
+            .select_related('project', 'assignee__profile')
+            .order_by()
+        )
+        yield 'project_list', (
+            Project.objects.filter(Q(created_by=user) | Q(pk__in=member_projects))
+            .with_progress()
+            .order_by('-created_at')
+        )
+        if project is not None:
+            yield 'project_detail: counters', (
+                project.tasks.order_by().values('status').annotate(count=Count('id'))
+            )
+            yield 'project_detail: first page', project.tasks.order_by('-created_at', '-id')[:60]
+        yield 'my_tasks: first page', user_tasks.order_by('-created_at', '-id')[:50]
+        yield 'kanban: done column page', (
+            Task.objects.filter(Q(assignee=user) | Q(project__in=member_projects), status='done')
+            .order_by('-updated_at', '-id')[:20]
+        )
+        if task is not None:
+            yield 'task_detail: comments', (
+                TaskComment.objects.filter(task=task)
+                .select_related('author', 'author__profile')
+                .order_by('created_at')
+            )
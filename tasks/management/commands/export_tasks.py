@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tasks.board import BOARD_FILTERS, filter_board, visible_tasks
+from tasks.export import CHUNK_SIZE, FORMATS, export_chunks
+from tasks.models import Task
+from tasks.routers import replica_reads
+import sys
+
+
+class Command(BaseCommand):
+    help = 'Stream all tasks (or the Kanban-filtered subset) as CSV or NDJSON, optionally gzip-compressed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--user', help='Export only the tasks this user sees on the Kanban board')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        for name in BOARD_FILTERS:
+            parser.add_argument(f'--{name}', default='', help=f'Kanban "{name}" filter')
+
+    def handle(self, *args, **options):
+        # Выгрузка только читает — с реплики, если она задана
+        with replica_reads():
+            self.export(options)
+
+    def export(self, options):
+        if options['user']:
+            try:
+                tasks = visible_tasks(User.objects.select_related('profile').get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+        else:
+            tasks = Task.objects.all()
+        tasks = filter_board(tasks, **{name: options[name] for name in BOARD_FILTERS})
+
+        chunks = export_chunks(tasks, options['format'], options['gzip'], options['chunk_size'])
+        # Пишем байты напрямую: self.stdout — текстовый и добавляет переводы строк
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                written = self.write(chunks, output)
+            self.stderr.write(f'{written:,} bytes written to {options["output"]}')
+        else:
+            self.write(chunks, sys.stdout.buffer)
+
+    def write(self, chunks, output):
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        output.flush()
+        return written
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks.ranking import RANK_REBALANCE_LENGTH, columns_to_rebalance, rebalance
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Rewrite the manual Kanban order keys of columns whose keys grew longer than MAX_LENGTH '
+        'or that have tasks without a key; schedule every 10 minutes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-length', type=int, default=RANK_REBALANCE_LENGTH,
+                            help=f'Rebalance columns with keys longer than this (default: {RANK_REBALANCE_LENGTH})')
+
+    def handle(self, *args, **options):
+        if options['max_length'] < 1:
+            raise CommandError('--max-length must be positive')
+        columns = columns_to_rebalance(options['max_length'])
+        if not columns:
+            self.stdout.write(self.style.SUCCESS('All Kanban columns are balanced'))
+            return
+
+        started = time.monotonic()
+        written = rebalance(columns, progress=self.progress if options['verbosity'] > 1 else None)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{written:,} tasks in {len(columns):,} columns re-ranked in {elapsed:,.1f}s'
+        ))
+
+    def progress(self, project_id, status, count):
+        self.stdout.write(f'  project {project_id} / {status}: {count:,} tasks')
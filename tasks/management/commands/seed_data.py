@@ -1,14 +1,175 @@
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from tasks.models import Project, Task, TaskComment, Department, UserProfile
+from django.db import connection, transaction
+from tasks.models import Project, Tag, Task, TaskComment, TaskEvent, Department, UserProfile
 from django.utils import timezone
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 import random
+import time
+
+
+# ─── Словари для синтетических данных ────
+MALE_FIRST_NAMES = [
+    'Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артём', 'Илья', 'Кирилл', 'Михаил',
+    'Никита', 'Егор', 'Иван', 'Роман', 'Павел',
+]
+FEMALE_FIRST_NAMES = [
+    'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Екатерина', 'Татьяна', 'Юлия', 'Ирина', 'Светлана',
+    'Дарья', 'Ксения', 'Полина', 'Алина', 'Виктория',
+]
+LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+    'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов',
+    'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв',
+]
+POSITIONS = [
+    'Backend разработчик', 'Frontend разработчик', 'QA инженер', 'DevOps инженер', 'UI/UX дизайнер',
+    'Аналитик', 'Менеджер проектов', 'Маркетолог', 'Технический писатель', 'Data engineer',
+]
+ROLE_WEIGHTS = [('employee', 85), ('team_lead', 8), ('manager', 5), ('admin', 2)]
+COLORS = ['#6366f1', '#ec4899', '#10b981', '#f59e0b', '#ef4444', '#3b82f6', '#8b5cf6', '#14b8a6']
+
+PROJECT_AREAS = [
+    'Платформа', 'Мобильное приложение', 'Личный кабинет', 'Биллинг', 'CRM', 'Аналитика', 'Поиск',
+    'Маркетплейс', 'Поддержка', 'Интеграции', 'Отчётность', 'Лендинг', 'Админка', 'Уведомления',
+]
+PROJECT_CODENAMES = [
+    'Альфа', 'Бета', 'Гамма', 'Дельта', 'Орион', 'Сириус', 'Вега', 'Полярис', 'Атлас', 'Феникс',
+]
+TASK_VERBS = [
+    'Реализовать', 'Исправить', 'Протестировать', 'Спроектировать', 'Оптимизировать', 'Задокументировать',
+    'Согласовать', 'Перенести', 'Обновить', 'Проверить', 'Refactor', 'Fix', 'Implement', 'Review',
+]
+TASK_OBJECTS = [
+    'авторизацию', 'экспорт отчётов', 'страницу профиля', 'API платежей', 'кэширование', 'поиск по задачам',
+    'push-уведомления', 'импорт CSV', 'миграцию БД', 'дашборд', 'форму регистрации', 'rate limiting',
+    'логирование ошибок', 'onboarding flow', 'мобильную вёрстку', 'интеграцию с CRM', 'SSO login',
+    'webhook retries', 'пагинацию списков', 'права доступа',
+]
+SENTENCES = [
+    'Нужно согласовать требования с заказчиком.', 'См. обсуждение в комментариях.',
+    'Блокируется задачей по инфраструктуре.', 'Есть черновик в репозитории.',
+    'Проверить на staging перед релизом.', 'Edge cases: пустой список, таймауты.',
+    'Оценка — два дня.', 'Добавить метрики и алерты.', 'Requires a migration.',
+    'Covered by integration tests.', 'Клиент ждёт к концу спринта.', 'Нужен дизайн от команды UI.',
+]
+COMMENT_TEXTS = [
+    'Взял в работу.', 'Готово, посмотрите, пожалуйста.', 'Нашёл баг, переоткрываю.',
+    'Можно обсудить на стендапе?', 'LGTM', 'Добавил тесты.', 'Нужны доступы к staging.',
+    'Перенёс срок на следующую неделю.', 'Есть вопрос по требованиям.', 'Merged.',
+    'Жду ревью.', 'Не воспроизводится локально.',
+]
+TAG_VOCABULARY = [
+    'backend', 'frontend', 'api', 'bug', 'ui', 'ux', 'mobile', 'ios', 'android', 'testing', 'docs',
+    'security', 'performance', 'db', 'devops', 'ci', 'design', 'analytics', 'seo', 'marketing',
+    'дизайн', 'бренд', 'аналитика', 'инфраструктура', 'релиз', 'срочно', 'техдолг', 'рефакторинг',
+    'платежи', 'поиск', 'уведомления', 'интеграция', 'auth', 'export', 'import', 'cache', 'i18n',
+    'a11y', 'billing', 'crm', 'reports', 'onboarding', 'legal', 'support', 'research',
+]
+STATUS_OPEN = ['todo', 'in_progress', 'review']
+PRIORITY_WEIGHTS = [('low', 25), ('medium', 45), ('high', 22), ('urgent', 8)]
+
+# Интервал истории: задачи создаются на протяжении последних трёх лет
+HISTORY_DAYS = 3 * 365
+# Глубина ежедневных срезов после генерации: самый длинный период страницы аналитики
+ROLLUP_BACKFILL_DAYS = 365
+
+
+# Путь задачи по статусам до текущего; переходы равномерно между созданием и последним изменением
+STATUS_PATHS = {
+    'todo': [],
+    'in_progress': ['in_progress'],
+    'review': ['in_progress', 'review'],
+    'done': ['in_progress', 'review', 'done'],
+}
+
+
+def status_history(task):
+    """События TaskEvent для сгенерированной задачи (без случайности — seed не сдвигается)"""
+    events = [TaskEvent.for_change(task.pk, task.project_id, task.assignee_id, None, 'todo', at=task.created_at)]
+    path = STATUS_PATHS[task.status]
+    span = task.updated_at - task.created_at
+    previous = 'todo'
+    for step, status in enumerate(path, 1):
+        at = task.created_at + span * step / len(path)
+        events.append(TaskEvent.for_change(task.pk, task.project_id, task.assignee_id, previous, status, at=at))
+        previous = status
+    return events
+
+
+def skewed_index(rng, size, exponent):
+    """Индекс 0..size-1: малые индексы встречаются гораздо чаще (степенной закон)"""
+    return min(int(size * rng.random() ** exponent), size - 1)
+
+
+def weighted_picker(rng, weighted):
+    values = [value for value, _weight in weighted]
+    weights = [weight for _value, weight in weighted]
+    return lambda: rng.choices(values, weights)[0]
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """Даём bulk_create записать свои created_at/updated_at (auto_now* их перезаписывают)"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Progress:
+    """Строки прогресса с пропускной способностью, не чаще чем раз в 5%"""
+
+    def __init__(self, stdout, label, total):
+        self.stdout = stdout
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.next_report = 0.05
+
+    def advance(self, count):
+        self.done += count
+        if self.total and (self.done / self.total >= self.next_report or self.done >= self.total):
+            while self.next_report <= self.done / self.total:
+                self.next_report += 0.05
+            self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        percent = 100 * self.done / self.total if self.total else 100
+        self.stdout.write(
+            f'  {self.label}: {self.done:,}/{self.total:,} ({percent:.0f}%), '
+            f'{self.done / elapsed:,.0f} rows/s'
+        )
 
 
 class Command(BaseCommand):
-    help = 'Seed demo data for TaskFlow'
+    help = 'Seed demo data for TaskFlow (plus a large synthetic dataset with --users/--projects/--tasks/--comments)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to create')
+        parser.add_argument('--projects', type=int, default=0, help='Synthetic projects to create')
+        parser.add_argument('--tasks', type=int, default=0, help='Synthetic tasks to create')
+        parser.add_argument('--comments', type=int, default=0, help='Synthetic comments to create')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed — same data)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk INSERT')
+        parser.add_argument('--today', help='Anchor date YYYY-MM-DD for reproducible dates (default: the current time)')
 
     def handle(self, *args, **options):
+        self.seed_demo()
+        if any(options[name] for name in ('users', 'projects', 'tasks', 'comments')):
+            self.seed_synthetic(options)
+
+    def seed_demo(self):
         self.stdout.write('Seeding demo data...')
 
         # ─── Departments ────
@@ -117,10 +278,11 @@ class Command(BaseCommand):
                     'priority': priority,
                     'assignee': assignee,
                     'created_by': admin_user,
-                    'tags': ', '.join(tags),
                     'due_date': timezone.now().date() + timezone.timedelta(days=random.randint(-5, 30)),
                 }
             )
+            if created:
+                task.set_tags(tags)
             if created and status == 'done':
                 task.due_date = timezone.now().date() - timezone.timedelta(days=random.randint(1, 10))
                 task.save()
@@ -147,3 +309,275 @@ class Command(BaseCommand):
         self.stdout.write('  maria  / maria140326  (Frontend разработчик)')
         self.stdout.write('  alex   / alex140326  (Backend Team Lead)')
         self.stdout.write('  julia  / julia140326  (UI/UX дизайнер)')
+
+    # ─── Synthetic data ────
+
+    def seed_synthetic(self, options):
+        seed = options['seed']
+        chunk_size = options['chunk_size']
+        rng = random.Random(seed)
+        prefix = f'seed{seed}-'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Synthetic data for --seed {seed} already exists (users "{prefix}*")')
+
+        # Момент «сейчас» для дат: с --today фиксированный (одинаковый --seed — одинаковые
+        # даты), но не позже настоящего времени — иначе задачи и комментарии были бы из будущего
+        now = timezone.now()
+        if options['today']:
+            today = date.fromisoformat(options['today'])
+            now = min(now, timezone.make_aware(datetime.combine(today, datetime.min.time())) + timedelta(hours=18))
+
+        self.stdout.write(f'Seeding synthetic data (seed={seed}, chunk={chunk_size})...')
+        started = time.monotonic()
+        with self.bulk_load():
+            user_ids = self.create_users(rng, options['users'], prefix, chunk_size, now)
+            if not user_ids:
+                user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+            # «Популярные» пользователи — случайные, а не первые созданные
+            rng.shuffle(user_ids)
+
+            projects = self.create_projects(rng, options['projects'], user_ids, chunk_size, now)
+            if not projects:
+                projects = self.existing_projects()
+            if options['tasks'] and not projects:
+                raise CommandError('No projects to put tasks into, pass --projects')
+            rng.shuffle(projects)
+
+            tasks = self.create_tasks(rng, options['tasks'], projects, user_ids, chunk_size, now)
+            if options['comments']:
+                if not tasks[0]:
+                    raise CommandError('No synthetic tasks to comment on, pass --tasks')
+                self.create_comments(rng, options['comments'], tasks, projects, user_ids, chunk_size, now)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Synthetic data seeded in {elapsed:,.1f}s'))
+
+        # bulk_create не шлёт сигналы — ежедневные срезы строим заново за год
+        call_command('rollup_tasks', backfill=ROLLUP_BACKFILL_DAYS, stdout=self.stdout)
+        # Ключи ручного порядка Kanban — тоже (pre_save при bulk_create не срабатывает)
+        call_command('rebalance_ranks', stdout=self.stdout)
+        if options['users']:
+            self.stdout.write(f'  Synthetic users: {prefix}0000000… / seed12345')
+
+    @contextmanager
+    def bulk_load(self):
+        """На PostgreSQL триггер комментариев пересчитывал бы вектор задачи на каждую строку —
+        отключаем его на время загрузки и пересчитываем векторы одним UPDATE в конце"""
+        if connection.vendor != 'postgresql':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE tasks_taskcomment DISABLE TRIGGER tasks_comment_search_update')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('ALTER TABLE tasks_taskcomment ENABLE TRIGGER tasks_comment_search_update')
+                self.stdout.write('  Rebuilding search vectors for commented tasks...')
+                cursor.execute(
+                    'UPDATE tasks_task SET search_vector = tasks_task_search_vector(id, title, description) '
+                    'WHERE id IN (SELECT DISTINCT task_id FROM tasks_taskcomment)'
+                )
+
+    def inserted(self, objects):
+        if objects and objects[0].pk is None:
+            raise CommandError('The database backend does not return ids from bulk_create')
+        return objects
+
+    def create_users(self, rng, count, prefix, chunk_size, now):
+        if not count:
+            return []
+        # Один хеш на всех: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password('seed12345')
+        departments = list(Department.objects.values_list('pk', flat=True)) or [None]
+        pick_role = weighted_picker(rng, ROLE_WEIGHTS)
+        progress = Progress(self.stdout, 'users', count)
+
+        user_ids = []
+        for start in range(0, count, chunk_size):
+            batch = []
+            for number in range(start, min(start + chunk_size, count)):
+                if rng.random() < 0.5:
+                    first_name, last_name = rng.choice(MALE_FIRST_NAMES), rng.choice(LAST_NAMES)
+                else:
+                    first_name, last_name = rng.choice(FEMALE_FIRST_NAMES), rng.choice(LAST_NAMES) + 'а'
+                username = f'{prefix}{number:07d}'
+                batch.append(User(
+                    username=username,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f'{username}@example.com',
+                    password=password,
+                    date_joined=now - timedelta(days=rng.randint(0, HISTORY_DAYS)),
+                ))
+            with transaction.atomic():
+                users = self.inserted(User.objects.bulk_create(batch))
+                # bulk_create не шлёт post_save, профили создаём той же пачкой
+                UserProfile.objects.bulk_create([
+                    UserProfile(
+                        user_id=user.pk,
+                        department_id=rng.choice(departments),
+                        position=rng.choice(POSITIONS),
+                        role=pick_role(),
+                        avatar_color=rng.choice(COLORS),
+                    )
+                    for user in users
+                ])
+            user_ids.extend(user.pk for user in users)
+            progress.advance(len(batch))
+        return user_ids
+
+    def existing_projects(self):
+        members = {}
+        for project_id, user_id in Project.members.through.objects.values_list('project_id', 'user_id'):
+            members.setdefault(project_id, []).append(user_id)
+        return [
+            (pk, created_by_id, created_at.timestamp(), members.get(pk) or [created_by_id])
+            for pk, created_by_id, created_at in Project.objects.order_by('pk').values_list(
+                'pk', 'created_by_id', 'created_at')
+        ]
+
+    def create_projects(self, rng, count, user_ids, chunk_size, now):
+        """Возвращает [(id, автор, created_at timestamp, участники)]"""
+        if not count:
+            return []
+        Membership = Project.members.through
+        fields = [Project._meta.get_field('created_at'), Project._meta.get_field('updated_at')]
+        progress = Progress(self.stdout, 'projects', count)
+
+        projects = []
+        for start in range(0, count, chunk_size):
+            batch, batch_members = [], []
+            for number in range(start, min(start + chunk_size, count)):
+                created_by = user_ids[skewed_index(rng, len(user_ids), 2)]
+                created_at = now - timedelta(days=rng.randint(30, HISTORY_DAYS), seconds=rng.randint(0, 86399))
+                # Размер команды — с длинным хвостом: обычно 3–6 человек, изредка десятки
+                team_size = min(len(user_ids), 2 + int(rng.paretovariate(1.3)), 60)
+                members = {created_by}
+                while len(members) < team_size:
+                    members.add(user_ids[skewed_index(rng, len(user_ids), 1.5)])
+                batch.append(Project(
+                    name=f'{rng.choice(PROJECT_AREAS)} {rng.choice(PROJECT_CODENAMES)} {number + 1}',
+                    description=rng.choice(SENTENCES),
+                    created_by_id=created_by,
+                    color=rng.choice(COLORS).upper(),
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                batch_members.append(sorted(members))
+            with transaction.atomic(), manual_timestamps(*fields):
+                created = self.inserted(Project.objects.bulk_create(batch))
+                Membership.objects.bulk_create([
+                    Membership(project_id=project.pk, user_id=user_id)
+                    for project, members in zip(created, batch_members)
+                    for user_id in members
+                ])
+            projects.extend(
+                (project.pk, project.created_by_id, project.created_at.timestamp(), members)
+                for project, members in zip(created, batch_members)
+            )
+            progress.advance(len(batch))
+        return projects
+
+    def create_tasks(self, rng, count, projects, user_ids, chunk_size, now):
+        """Возвращает компактные массивы (id, created_at timestamp, индекс проекта)"""
+        task_ids, task_created, task_projects = array('q'), array('d'), array('l')
+        if not count:
+            return task_ids, task_created, task_projects
+
+        TaskTag = Task.tags.through
+        tag_ids = [tag.pk for tag in Tag.get_or_create_many(TAG_VOCABULARY)]
+        pick_priority = weighted_picker(rng, PRIORITY_WEIGHTS)
+        pick_tag_count = weighted_picker(rng, [(0, 30), (1, 35), (2, 20), (3, 10), (4, 5)])
+        fields = [Task._meta.get_field('created_at'), Task._meta.get_field('updated_at')]
+        now_ts = now.timestamp()
+        progress = Progress(self.stdout, 'tasks', count)
+
+        for start in range(0, count, chunk_size):
+            batch, batch_tags, batch_projects = [], [], []
+            for _number in range(start, min(start + chunk_size, count)):
+                # Несколько крупных проектов и длинный хвост мелких
+                project_index = skewed_index(rng, len(projects), 2.5)
+                project_id, created_by, project_created, members = projects[project_index]
+
+                created_ts = project_created + rng.random() * (now_ts - project_created)
+                created_at = datetime.fromtimestamp(created_ts, tz=now.tzinfo)
+                age_days = (now_ts - created_ts) / 86400
+
+                # Чем старше задача, тем вероятнее она уже сделана
+                if rng.random() < min(0.92, age_days / 120):
+                    status = 'done'
+                else:
+                    status = rng.choice(STATUS_OPEN)
+                updated_ts = min(now_ts, created_ts + rng.expovariate(1 / (7 * 86400)))
+
+                roll = rng.random()
+                if roll < 0.05:
+                    assignee = None
+                elif roll < 0.85:
+                    assignee = members[skewed_index(rng, len(members), 1.5)]
+                else:
+                    assignee = user_ids[skewed_index(rng, len(user_ids), 3)]
+
+                due_date = None
+                if rng.random() >= 0.1:
+                    due_date = (created_at + timedelta(days=rng.randint(3, 90))).date()
+
+                batch.append(Task(
+                    project_id=project_id,
+                    title=f'{rng.choice(TASK_VERBS)} {rng.choice(TASK_OBJECTS)}',
+                    description=' '.join(rng.sample(SENTENCES, rng.randint(0, 3))),
+                    status=status,
+                    priority=pick_priority(),
+                    assignee_id=assignee,
+                    created_by_id=rng.choice((created_by, rng.choice(members))),
+                    created_at=created_at,
+                    updated_at=datetime.fromtimestamp(updated_ts, tz=now.tzinfo),
+                    due_date=due_date,
+                ))
+                batch_tags.append({
+                    tag_ids[skewed_index(rng, len(tag_ids), 2)] for _tag in range(pick_tag_count())
+                })
+                batch_projects.append(project_index)
+
+            with transaction.atomic(), manual_timestamps(*fields):
+                created = self.inserted(Task.objects.bulk_create(batch))
+                TaskTag.objects.bulk_create([
+                    TaskTag(task_id=task.pk, tag_id=tag_id)
+                    for task, tags in zip(created, batch_tags)
+                    for tag_id in sorted(tags)
+                ])
+                TaskEvent.objects.bulk_create([event for task in created for event in status_history(task)])
+            for task, project_index in zip(created, batch_projects):
+                task_ids.append(task.pk)
+                task_created.append(task.created_at.timestamp())
+                task_projects.append(project_index)
+            progress.advance(len(batch))
+        return task_ids, task_created, task_projects
+
+    def create_comments(self, rng, count, tasks, projects, user_ids, chunk_size, now):
+        task_ids, task_created, task_projects = tasks
+        fields = [TaskComment._meta.get_field('created_at')]
+        now_ts = now.timestamp()
+        progress = Progress(self.stdout, 'comments', count)
+
+        for start in range(0, count, chunk_size):
+            batch = []
+            for _number in range(start, min(start + chunk_size, count)):
+                # Обсуждения сосредоточены на небольшой доле задач
+                index = skewed_index(rng, len(task_ids), 3)
+                members = projects[task_projects[index]][3]
+                if rng.random() < 0.8:
+                    author = rng.choice(members)
+                else:
+                    author = user_ids[skewed_index(rng, len(user_ids), 2)]
+                created_ts = min(now_ts, task_created[index] + rng.expovariate(1 / (3 * 86400)))
+                batch.append(TaskComment(
+                    task_id=task_ids[index],
+                    author_id=author,
+                    text=rng.choice(COMMENT_TEXTS),
+                    created_at=datetime.fromtimestamp(created_ts, tz=now.tzinfo),
+                ))
+            with manual_timestamps(*fields):
+                TaskComment.objects.bulk_create(batch)
+            progress.advance(len(batch))
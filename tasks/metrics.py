@@ -0,0 +1,177 @@
+"""Метрики Prometheus для веб-слоя: /metrics в текстовом формате.
+
+Счётчики и гистограммы живут в каждом процессе. Под gunicorn (pre-fork)
+задаётся PROMETHEUS_MULTIPROC_DIR (см. gunicorn.conf.py): каждый воркер
+пишет значения в свои mmap-файлы без блокировок между процессами, а
+/metrics суммирует файлы всех воркеров. Без переменной используется
+обычный реестр процесса (runserver, один воркер).
+
+Доменные показатели — открытые и просроченные задачи по проектам, активные
+сессии — считаются при сборе и кэшируются на TASKFLOW_METRICS_CACHE_TIMEOUT.
+"""
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Count, Q
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .profiling import QueryTimer, wrap_connections
+
+DOMAIN_CACHE_KEY = 'taskflow:metrics:domain'
+METHODS = {'GET', 'POST', 'HEAD', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REQUESTS = Counter(
+    'taskflow_http_requests_total', 'HTTP requests by view', ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'taskflow_http_request_duration_seconds', 'Request latency by view', ['view'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'taskflow_db_queries_per_request', 'SQL queries per request by view', ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+)
+DB_SECONDS = Counter(
+    'taskflow_db_query_seconds_total', 'Time spent in SQL by view', ['view'],
+)
+IN_PROGRESS = Gauge(
+    'taskflow_http_requests_in_progress', 'Requests being served', multiprocess_mode='livesum',
+)
+WORKER_THREADS = Gauge(
+    'taskflow_worker_threads', 'Request threads of live workers', multiprocess_mode='livesum',
+)
+WORKERS = Gauge(
+    'taskflow_workers', 'Live gunicorn workers', multiprocess_mode='livesum',
+)
+FRAGMENT_CACHE = Counter(
+    'taskflow_fragment_cache_requests_total', 'Fragment cache lookups', ['fragment', 'result'],
+)
+
+
+def worker_started(threads):
+    """Хук post_worker_init: вместимость воркера для расчёта загрузки"""
+    WORKERS.set(1)
+    WORKER_THREADS.set(threads)
+
+
+def record_fragment_cache(name, hits, misses):
+    if hits:
+        FRAGMENT_CACHE.labels(name, 'hit').inc(hits)
+    if misses:
+        FRAGMENT_CACHE.labels(name, 'miss').inc(misses)
+
+
+def _active_sessions():
+    """(число, источник): строки сессий в БД или, для подписанных cookie, входы
+    за время жизни сессии — сами cookie на сервере не хранятся"""
+    if settings.SESSION_ENGINE.endswith(('.db', '.cached_db')):
+        from django.contrib.sessions.models import Session
+        return Session.objects.filter(expire_date__gt=timezone.now()).count(), 'sessions'
+
+    from django.contrib.auth.models import User
+    since = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    return User.objects.filter(last_login__gte=since).count(), 'logins'
+
+
+def _domain_values():
+    # models → caching → metrics: модели импортируются при сборе
+    from .models import Task
+    from .stats import OPEN_STATUSES
+
+    today = timezone.localdate()
+    per_project = (
+        Task.objects.filter(status__in=OPEN_STATUSES)
+        .order_by()
+        .values('project_id')
+        .annotate(open=Count('id'), overdue=Count('id', filter=Q(due_date__lt=today)))
+    )
+    sessions, source = _active_sessions()
+    return {
+        'projects': [(row['project_id'], row['open'], row['overdue']) for row in per_project],
+        'sessions': sessions,
+        'sessions_source': source,
+        'computed_at': time.time(),
+    }
+
+
+class DomainCollector:
+    """Показатели из БД; собираются только процессом, отдающим /metrics"""
+
+    def collect(self):
+        timeout = getattr(settings, 'TASKFLOW_METRICS_CACHE_TIMEOUT', 60)
+        values = cache.get_or_set(DOMAIN_CACHE_KEY, _domain_values, timeout)
+
+        open_tasks = GaugeMetricFamily('taskflow_open_tasks', 'Open tasks by project', labels=['project'])
+        overdue = GaugeMetricFamily('taskflow_overdue_tasks', 'Overdue open tasks by project', labels=['project'])
+        for project_id, open_count, overdue_count in values['projects']:
+            open_tasks.add_metric([str(project_id)], open_count)
+            overdue.add_metric([str(project_id)], overdue_count)
+        yield open_tasks
+        yield overdue
+
+        sessions = GaugeMetricFamily('taskflow_active_sessions', 'Active sessions', labels=['source'])
+        sessions.add_metric([values['sessions_source']], values['sessions'])
+        yield sessions
+        yield GaugeMetricFamily(
+            'taskflow_domain_metrics_age_seconds', 'Age of the cached domain metrics',
+            value=time.time() - values['computed_at'],
+        )
+
+
+class _ProcessRegistry:
+    """Метрики процесса из REGISTRY без повторной регистрации в нём DomainCollector"""
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def render_metrics():
+    """(тело, content type) для /metrics"""
+    registry = CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        MultiProcessCollector(registry)
+    else:
+        registry.register(_ProcessRegistry())
+    registry.register(DomainCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Счётчики и задержки запросов по имени вида.
+
+    Ставится сразу после WhiteNoiseMiddleware (статика не считается).
+    TASKFLOW_METRICS=False отключает её целиком.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TASKFLOW_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        status = 500
+        try:
+            with IN_PROGRESS.track_inprogress(), wrap_connections(timer):
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            # Неразрешённые пути — одна метка, иначе сканеры раздуют число серий
+            view = (match.view_name if match else None) or 'unresolved'
+            REQUESTS.labels(view, request.method if request.method in METHODS else 'other', status).inc()
+            LATENCY.labels(view).observe(time.perf_counter() - started)
+            DB_QUERIES.labels(view).observe(timer.queries)
+            DB_SECONDS.labels(view).inc(timer.sql_seconds)
+
@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.exceptions import MiddlewareNotUsed
+
+from .routers import PIN_COOKIE, replica_configured, track_writes
+
+SESSION_REFRESHED_KEY = '_taskflow_refreshed_at'
+
+
+class SlidingSessionMiddleware:
+    """Скользящий срок сессии без записи на каждый запрос.
+
+    Вместо SESSION_SAVE_EVERY_REQUEST сессия пользователя сохраняется (и её
+    срок продлевается на SESSION_COOKIE_AGE) только если с прошлого продления
+    прошло больше TASKFLOW_SESSION_REFRESH_INTERVAL секунд. Опрос живой доски
+    и прочие частые запросы сессию не пишут. Ставится после SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.interval = getattr(settings, 'TASKFLOW_SESSION_REFRESH_INTERVAL', 300)
+
+    def __call__(self, request):
+        session = request.session
+        # Анонимным сессию не создаём
+        if SESSION_KEY in session:
+            now = int(time.time())
+            refreshed_at = session.get(SESSION_REFRESHED_KEY, 0)
+            if now - refreshed_at >= self.interval:
+                session[SESSION_REFRESHED_KEY] = now
+        return self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    """Read-your-writes при чтении с реплики (tasks/routers.py).
+
+    Запрос с записью в БД или с изменяющим методом закрепляет клиента за
+    основной БД на TASKFLOW_REPLICA_PIN_SECONDS: cookie с этим сроком
+    жизни, пока она есть — read-only виды тоже читают с основной БД. Без
+    реплики отключается целиком (MiddlewareNotUsed).
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'TASKFLOW_REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        with track_writes(pinned=PIN_COOKIE in request.COOKIES) as tracker:
+            response = self.get_response(request)
+        if tracker.wrote or request.method not in self.SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.pin_seconds,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,36 @@
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Индекс на tasks_task строится без блокировки записи
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0002_task_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('project_id', models.BigIntegerField()),
+                ('assignee_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Удалённая задача',
+                'verbose_name_plural': 'Удалённые задачи',
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['updated_at'], name='task_updated_idx'),
+        ),
+    ]
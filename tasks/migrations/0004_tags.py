@@ -0,0 +1,83 @@
+from itertools import islice
+
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def parse_tags(text):
+    names = []
+    for raw in (text or '').split(','):
+        name = raw.strip().lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def tags_to_table(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    Tag = apps.get_model('tasks', 'Tag')
+    TaskTag = Task.tags.through
+
+    # Задачи читаются и связи пишутся пачками: в памяти только одна пачка
+    # и словарь тегов (их немного)
+    tag_ids = {}
+    rows = Task.objects.exclude(tags_text='').values_list('pk', 'tags_text').iterator(chunk_size=BATCH_SIZE)
+    for batch in iter(lambda: list(islice(rows, BATCH_SIZE)), []):
+        task_names = [(pk, parse_tags(text)) for pk, text in batch]
+        new_names = {name for _, names in task_names for name in names} - tag_ids.keys()
+        if new_names:
+            Tag.objects.bulk_create([Tag(name=name) for name in sorted(new_names)], ignore_conflicts=True)
+            tag_ids.update(Tag.objects.filter(name__in=new_names).values_list('name', 'pk'))
+        TaskTag.objects.bulk_create(
+            [TaskTag(task_id=pk, tag_id=tag_ids[name]) for pk, names in task_names for name in names],
+            ignore_conflicts=True,
+        )
+
+
+def tags_to_text(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskTag = Task.tags.through
+
+    names_by_task = {}
+    for task_id, name in TaskTag.objects.order_by('pk').values_list('task_id', 'tag__name').iterator():
+        names_by_task.setdefault(task_id, []).append(name)
+    for task_id, names in names_by_task.items():
+        Task.objects.filter(pk=task_id).update(tags_text=', '.join(names)[:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_live_updates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='tags',
+            new_name='tags_text',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='tasks', to='tasks.tag', verbose_name='Теги'),
+        ),
+        migrations.RunPython(tags_to_table, tags_to_text),
+        migrations.RemoveField(
+            model_name='task',
+            name='tags_text',
+        ),
+    ]
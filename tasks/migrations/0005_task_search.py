@@ -0,0 +1,101 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Вектор задачи: название (A), описание (B), комментарии (C) на русском и английском
+SEARCH_SQL = """
+CREATE OR REPLACE FUNCTION tasks_task_search_vector(p_task_id bigint, p_title text, p_description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('russian', coalesce(p_title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(p_title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(p_description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(p_description, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(c.comments, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(c.comments, '')), 'C')
+    FROM (
+        SELECT string_agg(text, ' ') AS comments
+        FROM tasks_taskcomment
+        WHERE task_id = p_task_id
+    ) c
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION tasks_task_search_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := tasks_task_search_vector(NEW.id, NEW.title, NEW.description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_task_search_insert
+    BEFORE INSERT ON tasks_task
+    FOR EACH ROW EXECUTE PROCEDURE tasks_task_search_trigger();
+
+-- save() пишет все колонки, поэтому UPDATE OF срабатывал бы на каждое
+-- сохранение задачи; вектор пересчитывается, только если текст изменился
+CREATE TRIGGER tasks_task_search_update
+    BEFORE UPDATE OF title, description ON tasks_task
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE PROCEDURE tasks_task_search_trigger();
+
+CREATE OR REPLACE FUNCTION tasks_comment_search_trigger() RETURNS trigger AS $$
+DECLARE
+    affected bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        affected := OLD.task_id;
+    ELSE
+        affected := NEW.task_id;
+    END IF;
+    UPDATE tasks_task
+    SET search_vector = tasks_task_search_vector(id, title, description)
+    WHERE id = affected;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_comment_search_update
+    AFTER INSERT OR UPDATE OF text OR DELETE ON tasks_taskcomment
+    FOR EACH ROW EXECUTE PROCEDURE tasks_comment_search_trigger();
+"""
+
+# Векторы уже существующих задач заполняет команда backfill_search_vectors
+# (пачками, не одним UPDATE всей таблицы в транзакции миграции), GIN-индексы
+# строит 0010_task_search_indexes (CREATE INDEX CONCURRENTLY)
+DROP_SEARCH_SQL = """
+DROP TRIGGER IF EXISTS tasks_comment_search_update ON tasks_taskcomment;
+DROP FUNCTION IF EXISTS tasks_comment_search_trigger();
+DROP TRIGGER IF EXISTS tasks_task_search_update ON tasks_task;
+DROP TRIGGER IF EXISTS tasks_task_search_insert ON tasks_task;
+DROP FUNCTION IF EXISTS tasks_task_search_trigger();
+DROP FUNCTION IF EXISTS tasks_task_search_vector(bigint, text, text);
+"""
+
+
+def create_search_objects(apps, schema_editor):
+    # Триггеры и GIN-индексы есть только в PostgreSQL; на SQLite поиск идёт через icontains
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_SQL)
+
+
+def drop_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_tags'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
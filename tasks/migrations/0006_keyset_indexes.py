@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations, models
+
+from tasks.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Индексы на tasks_task (миллионы строк) строятся без блокировки записи
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0005_task_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'done')), fields=['updated_at', 'id'], name='task_done_updated_idx'),
+        ),
+    ]
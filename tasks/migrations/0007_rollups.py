@@ -0,0 +1,88 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('materialized_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'День срезов',
+                'verbose_name_plural': 'Дни срезов',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('open', models.IntegerField(default=0, verbose_name='Открыто')),
+                ('status_todo', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0, verbose_name='Выполнено')),
+                ('overdue', models.IntegerField(default=0, verbose_name='Просрочено')),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('priority_urgent', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0, verbose_name='Создано за день')),
+                ('completed', models.IntegerField(default=0, verbose_name='Завершено за день')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Срез задач сотрудника',
+                'verbose_name_plural': 'Срезы задач сотрудников',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('open', models.IntegerField(default=0, verbose_name='Открыто')),
+                ('status_todo', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0, verbose_name='Выполнено')),
+                ('overdue', models.IntegerField(default=0, verbose_name='Просрочено')),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('priority_urgent', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0, verbose_name='Создано за день')),
+                ('completed', models.IntegerField(default=0, verbose_name='Завершено за день')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tasks.project')),
+            ],
+            options={
+                'verbose_name': 'Срез задач проекта',
+                'verbose_name_plural': 'Срезы задач проектов',
+                'indexes': [models.Index(fields=['day'], name='project_daily_stats_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectdailystats',
+            constraint=models.UniqueConstraint(fields=('project', 'day'), name='project_daily_stats_day_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='userdailystats',
+            index=models.Index(fields=['day', 'open'], name='user_daily_stats_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userdailystats',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='user_daily_stats_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.BigIntegerField()),
+                ('assignee_id', models.BigIntegerField(blank=True, null=True)),
+                ('from_status', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Не начата'), (2, 'В работе'), (3, 'На проверке'), (4, 'Завершена')], null=True)),
+                ('to_status', models.PositiveSmallIntegerField(choices=[(1, 'Не начата'), (2, 'В работе'), (3, 'На проверке'), (4, 'Завершена')])),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='tasks.task')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса',
+                'verbose_name_plural': 'Смены статусов',
+                'indexes': [models.Index(fields=['project_id', 'created_at'], name='task_event_project_idx'), models.Index(fields=['assignee_id', 'created_at'], name='task_event_assignee_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+from itertools import groupby
+
+from django.db import migrations, models
+
+from tasks.migration_operations import AddIndexConcurrently
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'urgent': 3}
+BATCH_SIZE = 5000
+
+
+def spread_ranks(count):
+    # Копия tasks.ranking.spread_ranks на момент миграции
+    width = 1
+    while len(DIGITS) ** width <= count:
+        width += 1
+    space = len(DIGITS) ** width
+    ranks = []
+    for position in range(1, count + 1):
+        value = position * space // (count + 1)
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, len(DIGITS))
+            digits.append(DIGITS[digit])
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
+
+
+def rank_columns(apps, schema_editor):
+    """Начальные ключи — в прежнем порядке доски: срочные выше, затем ближайший дедлайн.
+
+    Строки читаются потоком (в памяти — одна колонка и пачка записи), каждая
+    пачка bulk_update фиксируется отдельно: миграция неатомарная.
+    """
+    Task = apps.get_model('tasks', 'Task')
+    rows = Task.objects.order_by('project_id', 'status').values_list(
+        'pk', 'project_id', 'status', 'priority', 'due_date',
+    ).iterator(chunk_size=BATCH_SIZE)
+
+    batch = []
+    for _column, tasks in groupby(rows, key=lambda row: (row[1], row[2])):
+        tasks = sorted(tasks, key=lambda row: (
+            -PRIORITY_RANK.get(row[3], 0), row[4] is None, row[4] or '', row[0],
+        ))
+        batch += [Task(pk=row[0], rank=rank) for row, rank in zip(tasks, spread_ranks(len(tasks)))]
+        if len(batch) >= BATCH_SIZE:
+            Task.objects.bulk_update(batch, ['rank'], batch_size=1000)
+            batch = []
+    Task.objects.bulk_update(batch, ['rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    # Ключи пишутся пачками, индекс строится без блокировки записи в tasks_task
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0008_task_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(rank_columns, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['project', 'status', 'rank'], name='task_project_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# CONCURRENTLY не блокирует запись в tasks_task на время построения,
+# но не работает в транзакции — миграция неатомарная
+INDEXES_SQL = [
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS task_search_vector_idx ON tasks_task USING gin (search_vector)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS task_title_trgm_idx ON tasks_task USING gin (title gin_trgm_ops)',
+]
+
+DROP_INDEXES_SQL = [
+    'DROP INDEX CONCURRENTLY IF EXISTS task_title_trgm_idx',
+    'DROP INDEX CONCURRENTLY IF EXISTS task_search_vector_idx',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN-индексы поиска есть только в PostgreSQL (см. 0005_task_search)
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in INDEXES_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_INDEXES_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0009_task_rank'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,9 +1,15 @@
+from datetime import timedelta
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
 
+from .broker import project_channel, publish_on_commit
+from .caching import bump_versions_on_commit
+
 
 class Department(models.Model):
     """Отдел компании"""
@@ -46,15 +52,24 @@ class UserProfile(models.Model):
 
     @property
     def display_name(self):
-        if self.user.first_name and self.user.last_name:
-            return f'{self.user.first_name} {self.user.last_name}'
-        return self.user.username
+        return self.name_for(self.user.first_name, self.user.last_name, self.user.username)
 
     @property
     def initials(self):
-        if self.user.first_name and self.user.last_name:
-            return f'{self.user.first_name[0]}{self.user.last_name[0]}'
-        return self.user.username[:2].upper()
+        return self.initials_for(self.user.first_name, self.user.last_name, self.user.username)
+
+    # Те же правила для строк values() без объектов (tasks/cards.py)
+    @staticmethod
+    def name_for(first_name, last_name, username):
+        if first_name and last_name:
+            return f'{first_name} {last_name}'
+        return username
+
+    @staticmethod
+    def initials_for(first_name, last_name, username):
+        if first_name and last_name:
+            return f'{first_name[0]}{last_name[0]}'
+        return username[:2].upper()
 
 
 @receiver(post_save, sender=User)
@@ -71,6 +86,23 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+class ProjectQuerySet(models.QuerySet):
+    def with_progress(self):
+        """Счётчики задач одним запросом вместо COUNT на каждую карточку"""
+        return self.annotate(
+            num_tasks=models.Count('tasks', distinct=True),
+            num_completed_tasks=models.Count(
+                'tasks', filter=models.Q(tasks__status='done'), distinct=True
+            ),
+        )
+
+    def with_members(self):
+        """Участники вместе с профилями — один дополнительный запрос на весь список"""
+        return self.prefetch_related(
+            models.Prefetch('members', queryset=User.objects.select_related('profile'))
+        )
+
+
 class Project(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название проекта')
     description = models.TextField(blank=True, verbose_name='Описание')
@@ -80,6 +112,8 @@ class Project(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     color = models.CharField(max_length=7, default='#4F46E5')  # hex color
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Проект'
@@ -90,10 +124,14 @@ class Project(models.Model):
 
     @property
     def task_count(self):
+        if hasattr(self, 'num_tasks'):
+            return self.num_tasks
         return self.tasks.count()
 
     @property
     def completed_task_count(self):
+        if hasattr(self, 'num_completed_tasks'):
+            return self.num_completed_tasks
         return self.tasks.filter(status='done').count()
 
     @property
@@ -104,6 +142,67 @@ class Project(models.Model):
         return round((self.completed_task_count / total) * 100, 1)
 
 
+class Tag(models.Model):
+    """Тег задачи (хранится в нижнем регистре, имя уникально)"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def parse(text):
+        """'Frontend, api,  API' -> ['frontend', 'api']"""
+        names = []
+        for raw in (text or '').split(','):
+            name = raw.strip().lower()[:50]
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @classmethod
+    def get_or_create_many(cls, names):
+        """Теги по именам: недостающие создаются одним bulk_create"""
+        names = list(dict.fromkeys(names))
+        existing = {tag.name: tag for tag in cls.objects.filter(name__in=names)}
+        missing = [cls(name=name) for name in names if name not in existing]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            existing.update({tag.name: tag for tag in cls.objects.filter(name__in=[t.name for t in missing])})
+        return [existing[name] for name in names]
+
+
+class TaskQuerySet(models.QuerySet):
+    def tagged(self, value):
+        """Фильтр по тегу: 'api' — точное совпадение, 'api*' — по префиксу.
+
+        Подзапрос по таблице связей, чтобы не размножать строки JOIN-ом.
+        """
+        value = (value or '').strip().lower()
+        if not value:
+            return self
+        links = Task.tags.through.objects
+        if value.endswith('*'):
+            links = links.filter(tag__name__startswith=value[:-1])
+        else:
+            links = links.filter(tag__name=value)
+        return self.filter(pk__in=links.values('task_id'))
+
+
+# Поля задачи, от которых зависят ежедневные срезы
+ROLLUP_STATE_FIELDS = ('project_id', 'assignee_id', 'status', 'priority', 'due_date')
+
+
+class TaskManager(models.Manager):
+    def get_queryset(self):
+        # Поисковый вектор большой и нужен только в WHERE — не тянем его в объекты
+        return super().get_queryset().defer('search_vector')
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('todo', 'Не начата'),
@@ -119,6 +218,12 @@ class Task(models.Model):
         ('urgent', 'Срочный'),
     ]
 
+    STATUS_LABELS = dict(STATUS_CHOICES)
+    PRIORITY_LABELS = dict(PRIORITY_CHOICES)
+
+    # Настоящий порядок приоритетов (строки сортируются по алфавиту)
+    PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'urgent': 3}
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks', verbose_name='Проект')
     title = models.CharField(max_length=300, verbose_name='Название задачи')
     description = models.TextField(blank=True, verbose_name='Описание')
@@ -131,33 +236,317 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateField(null=True, blank=True, verbose_name='Дата окончания')
-    tags = models.CharField(max_length=500, blank=True, verbose_name='Теги (через запятую)')
+    tags = models.ManyToManyField(Tag, blank=True, related_name='tasks', verbose_name='Теги')
+    # Заполняется триггерами PostgreSQL: название, описание и комментарии (tasks/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Ручной порядок в колонке Kanban (tasks/ranking.py); новая задача — в конец колонки
+    rank = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    objects = TaskManager.from_queryset(TaskQuerySet)()
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
+        indexes = [
+            # Мои задачи, счётчики дашборда по статусу
+            models.Index(fields=['assignee', 'status'], name='task_assignee_status_idx'),
+            # Календарь — за месяц, вместе с выполненными задачами
+            models.Index(fields=['assignee', 'due_date'], name='task_assignee_due_idx'),
+            # Просроченные / скоро просрочатся / ближайшие дедлайны — только открытые задачи
+            models.Index(fields=['assignee', 'due_date'], name='task_open_assignee_due_idx',
+                         condition=~models.Q(status='done')),
+            # Страница проекта и Kanban
+            models.Index(fields=['project', 'status'], name='task_project_status_idx'),
+            models.Index(fields=['project', 'due_date'], name='task_open_project_due_idx',
+                         condition=~models.Q(status='done')),
+            # График активности за 7 дней, последние задачи
+            models.Index(fields=['assignee', 'created_at'], name='task_assignee_created_idx'),
+            # Дельты для живого обновления досок
+            models.Index(fields=['updated_at'], name='task_updated_idx'),
+            # Постраничный вывод по ключу: задачи проекта, колонка «Выполнено»
+            models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='task_done_updated_idx',
+                         condition=models.Q(status='done')),
+            # Ручной порядок карточек в колонке
+            models.Index(fields=['project', 'status', 'rank'], name='task_project_rank_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Проект и исполнитель на момент загрузки — чтобы сбросить кэш и у прежних
+        instance._loaded_refs = (instance.__dict__.get('project_id'), instance.__dict__.get('assignee_id'))
+        # Статус на момент загрузки — для журнала переходов TaskEvent
+        instance._loaded_status = instance.__dict__.get('status')
+        # Состояние на момент загрузки для приращений ежедневных срезов (tasks/rollups.py)
+        if all(name in instance.__dict__ for name in ROLLUP_STATE_FIELDS):
+            instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        return tuple(getattr(self, name) for name in ROLLUP_STATE_FIELDS)
+
     @property
     def is_overdue(self):
         if self.due_date and self.status != 'done':
             return self.due_date < timezone.now().date()
         return False
 
+    @property
+    def priority_rank(self):
+        return self.PRIORITY_RANK.get(self.priority, 0)
+
     @property
     def tag_list(self):
-        if self.tags:
-            return [t.strip() for t in self.tags.split(',') if t.strip()]
-        return []
+        # .all() берёт данные из prefetch_related('tags'), если он был
+        return [tag.name for tag in self.tags.all()]
+
+    def set_tags(self, names):
+        self.tags.set(Tag.get_or_create_many(names))
 
     def get_status_label(self):
-        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+        return self.STATUS_LABELS.get(self.status, self.status)
 
     def get_priority_label(self):
-        return dict(self.PRIORITY_CHOICES).get(self.priority, self.priority)
+        return self.PRIORITY_LABELS.get(self.priority, self.priority)
+
+
+class DailyStats(models.Model):
+    """Срез задач за день: остатки на конец дня (у сегодняшней строки — текущие) и потоки за день"""
+    day = models.DateField(verbose_name='День')
+    open = models.IntegerField(default=0, verbose_name='Открыто')
+    status_todo = models.IntegerField(default=0)
+    status_in_progress = models.IntegerField(default=0)
+    status_review = models.IntegerField(default=0)
+    done = models.IntegerField(default=0, verbose_name='Выполнено')
+    overdue = models.IntegerField(default=0, verbose_name='Просрочено')
+    # Открытые задачи по приоритету
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    priority_urgent = models.IntegerField(default=0)
+    created = models.IntegerField(default=0, verbose_name='Создано за день')
+    completed = models.IntegerField(default=0, verbose_name='Завершено за день')
+
+    class Meta:
+        abstract = True
+
+
+class UserDailyStats(DailyStats):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        verbose_name = 'Срез задач сотрудника'
+        verbose_name_plural = 'Срезы задач сотрудников'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='user_daily_stats_day_uniq'),
+        ]
+        indexes = [
+            # Нагрузка команды: самые загруженные за день
+            models.Index(fields=['day', 'open'], name='user_daily_stats_open_idx'),
+        ]
+
+
+class ProjectDailyStats(DailyStats):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta:
+        verbose_name = 'Срез задач проекта'
+        verbose_name_plural = 'Срезы задач проектов'
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'day'], name='project_daily_stats_day_uniq'),
+        ]
+        indexes = [
+            # Сумма по команде за период: GROUP BY day
+            models.Index(fields=['day'], name='project_daily_stats_day_idx'),
+        ]
+
+
+class RollupDay(models.Model):
+    """День, за который строки срезов созданы для всех сотрудников и проектов"""
+    day = models.DateField(unique=True)
+    materialized_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'День срезов'
+        verbose_name_plural = 'Дни срезов'
+
+    def __str__(self):
+        return f'{self.day:%d.%m.%Y}'
+
+
+class TaskEvent(models.Model):
+    """Смена статуса задачи (from_status пуст — задача создана); строки только добавляются.
+
+    Статусы хранятся кодами, проект и исполнитель на момент события — без
+    внешних ключей: строка короткая, вставка без проверок ссылок.
+    """
+    STATUS_CODES = {value: code for code, (value, _label) in enumerate(Task.STATUS_CHOICES, 1)}
+    CODE_CHOICES = [(code, label) for code, (_value, label) in enumerate(Task.STATUS_CHOICES, 1)]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='events')
+    project_id = models.BigIntegerField()
+    assignee_id = models.BigIntegerField(null=True, blank=True)
+    from_status = models.PositiveSmallIntegerField(null=True, blank=True, choices=CODE_CHOICES)
+    to_status = models.PositiveSmallIntegerField(choices=CODE_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Смена статуса'
+        verbose_name_plural = 'Смены статусов'
+        indexes = [
+            models.Index(fields=['project_id', 'created_at'], name='task_event_project_idx'),
+            models.Index(fields=['assignee_id', 'created_at'], name='task_event_assignee_idx'),
+        ]
+
+    def __str__(self):
+        return f'Задача #{self.task_id}: {self.get_to_status_display()} {self.created_at:%d.%m.%Y %H:%M}'
+
+    @classmethod
+    def for_change(cls, task_id, project_id, assignee_id, old_status, new_status, at=None):
+        """Несохранённое событие перехода old_status → new_status (None — создание)"""
+        return cls(
+            task_id=task_id,
+            project_id=project_id,
+            assignee_id=assignee_id,
+            from_status=cls.STATUS_CODES[old_status] if old_status else None,
+            to_status=cls.STATUS_CODES[new_status],
+            created_at=at or timezone.now(),
+        )
+
+
+class TaskTombstone(models.Model):
+    """След удалённой задачи, чтобы живые доски узнали об удалении"""
+    task_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    assignee_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Сколько хранить следы; клиенты с более старым курсором перезагружают доску
+    RETENTION = timedelta(days=1)
+
+    class Meta:
+        verbose_name = 'Удалённая задача'
+        verbose_name_plural = 'Удалённые задачи'
+
+    def __str__(self):
+        return f'Задача #{self.task_id} удалена {self.deleted_at:%d.%m.%Y %H:%M}'
+
+
+def _publish_task_event(task, kind, deleted=False):
+    publish_on_commit(project_channel(task.project_id), {
+        'type': kind,
+        'task_id': task.pk,
+        'project_id': task.project_id,
+        'status': task.status,
+        'deleted': deleted,
+    })
+
+
+@receiver(pre_save, sender=Task)
+def assign_task_rank(sender, instance, **kwargs):
+    """Новая задача встаёт в конец своей колонки Kanban"""
+    from .ranking import column_end_rank
+
+    if not instance.rank and instance.project_id:
+        instance.rank = column_end_rank(instance.project_id, instance.status)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, **kwargs):
+    """Событие для SSE-подписчиков проекта (в т.ч. смена статуса с доски)"""
+    _publish_task_event(instance, 'task')
+
+
+def task_cache_scopes(project_ids, assignee_ids, moved=True):
+    """Области кэша фрагментов, которые затрагивает изменение задач"""
+    scopes = [('team',)]
+    scopes += [('project', pk) for pk in project_ids if pk is not None]
+    scopes += [('user', pk) for pk in assignee_ids if pk is not None]
+    if moved:
+        # Списки проектов и исполнителей в фильтрах Kanban
+        scopes.append(('directory',))
+    return scopes
+
+
+@receiver(post_save, sender=Task)
+def invalidate_task_saved(sender, instance, created, **kwargs):
+    refs = (instance.project_id, instance.assignee_id)
+    loaded = getattr(instance, '_loaded_refs', (None, None))
+    bump_versions_on_commit(*task_cache_scopes(
+        {refs[0], loaded[0]}, {refs[1], loaded[1]}, moved=created or loaded != refs,
+    ))
+    instance._loaded_refs = refs
+
+
+@receiver(post_delete, sender=Task)
+def invalidate_task_deleted(sender, instance, **kwargs):
+    bump_versions_on_commit(*task_cache_scopes({instance.project_id}, {instance.assignee_id}))
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def touch_task_tags_changed(sender, instance, action, pk_set, **kwargs):
+    """Теги сохраняются после save() (TaskForm._save_m2m) и updated_at не меняют,
+    а по нему строится ключ карточки (tasks/templating.py) и /tasks/live/"""
+    if not action.startswith('post_') or pk_set == set():
+        return
+    if isinstance(instance, Task):
+        instance.updated_at = timezone.now()
+        Task.objects.filter(pk=instance.pk).update(updated_at=instance.updated_at)
+    else:
+        # Со стороны тега: tag.tasks.add(...); после clear() задачи уже неизвестны
+        bump_versions_on_commit(('cards',))
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, **kwargs):
+    """Оставляем след удаления и заодно чистим устаревшие"""
+    now = timezone.now()
+    TaskTombstone.objects.filter(deleted_at__lt=now - TaskTombstone.RETENTION).delete()
+    TaskTombstone.objects.create(
+        task_id=instance.pk,
+        project_id=instance.project_id,
+        assignee_id=instance.assignee_id,
+        deleted_at=now,
+    )
+    _publish_task_event(instance, 'task', deleted=True)
+
+
+@receiver(post_save, sender=Task)
+def log_task_status(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_loaded_status', None)
+    # Не созданная и загруженная без статуса задача: прежний статус неизвестен
+    if created or (old is not None and old != instance.status):
+        TaskEvent.for_change(
+            instance.pk, instance.project_id, instance.assignee_id, old, instance.status,
+        ).save(force_insert=True)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Task)
+def rollup_task_saved(sender, instance, created, **kwargs):
+    from .rollups import apply_task_changes, refresh_task_scopes
+
+    new = instance.rollup_state()
+    old = getattr(instance, '_rollup_state', None)
+    if created or old is not None:
+        apply_task_changes([(None if created else old, new)])
+    else:
+        # Прежнее состояние неизвестно (объект не из БД или с отложенными полями)
+        refresh_task_scopes([new])
+    instance._rollup_state = new
+
+
+@receiver(post_delete, sender=Task)
+def rollup_task_deleted(sender, instance, origin=None, **kwargs):
+    from .rollups import apply_task_changes
+
+    old = getattr(instance, '_rollup_state', None) or instance.rollup_state()
+    apply_task_changes([(old, None)], deleting=origin)
 
 
 class TaskComment(models.Model):
@@ -170,6 +559,49 @@ class TaskComment(models.Model):
         ordering = ['created_at']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['task', 'created_at'], name='comment_task_created_idx'),
+        ]
 
     def __str__(self):
         return f'Комментарий к "{self.task.title}"'
+
+
+@receiver(post_save, sender=TaskComment)
+def publish_comment_saved(sender, instance, created, **kwargs):
+    if created:
+        _publish_task_event(instance.task, 'comment')
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_delete, sender=TaskComment)
+def invalidate_comment_changed(sender, instance, origin=None, **kwargs):
+    # Комментарии удаляемой задачи: проект сбросит invalidate_task_deleted
+    if isinstance(origin, Task) or getattr(origin, 'model', None) is Task:
+        return
+    bump_versions_on_commit(('project', instance.task.project_id))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_changed(sender, instance, **kwargs):
+    # ('cards',) — название и цвет проекта на карточках задач (tasks/templating.py)
+    bump_versions_on_commit(('project', instance.pk), ('directory',), ('cards',))
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def invalidate_project_members(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Project):
+        bump_versions_on_commit(('project', instance.pk), ('directory',))
+    else:
+        # Изменение со стороны пользователя: user.projects.add(...)
+        bump_versions_on_commit(('directory',), *[('project', pk) for pk in pk_set or ()])
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_changed(sender, instance, **kwargs):
+    # Сохранение User сохраняет и профиль: имя и инициалы на карточках тоже здесь
+    bump_versions_on_commit(('user', instance.user_id), ('team',), ('directory',), ('cards',))
@@ -0,0 +1,177 @@
+"""Постраничный вывод по ключу (keyset) вместо OFFSET.
+
+Следующая страница выбирается условием «строки после последней показанной»
+по упорядочивающему ключу, например (created_at, id), поэтому стоимость
+страницы не зависит от глубины прокрутки, а новые строки не сдвигают
+уже выданные страницы. Курсор — подписанные значения ключа последней строки.
+"""
+import json
+from datetime import date, datetime
+
+from django.core import signing
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+
+CURSOR_SALT = 'tasks.pagination'
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorSerializer:
+    # Даты — полным isoformat: с обрезанными микросекундами ключ перестаёт быть точным
+    def dumps(self, obj):
+        values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in obj]
+        return json.dumps(values, separators=(',', ':')).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPage:
+    """Строки страницы и курсор следующей (None — это последняя страница)"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+class KeysetPaginator:
+    """Страницы QuerySet по ключу ordering, например ('-created_at', '-id').
+
+    В ключе — поля модели или аннотации QuerySet (релевантность поиска).
+    Последнее поле ключа должно быть уникальным. NULL в полях, допускающих
+    NULL, идут в конце при любом направлении сортировки.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE, build=list):
+        self.queryset = queryset
+        self.per_page = per_page
+        # Строки страницы из среза QuerySet: list — экземпляры модели,
+        # либо своя загрузка (например tasks.cards.load_cards)
+        self.build = build
+        opts = queryset.model._meta
+        self.keys = []
+        for name in ordering:
+            annotation = queryset.query.annotations.get(name.lstrip('-'))
+            if annotation is not None:
+                self.keys.append((name.lstrip('-'), name.startswith('-'), annotation.output_field))
+            else:
+                field = opts.get_field(name.lstrip('-'))
+                self.keys.append((field.attname, name.startswith('-'), field))
+
+    def page(self, cursor=None):
+        """Страница после cursor (первая, если курсора нет); InvalidCursor при подделке"""
+        queryset = self.queryset.order_by(*self._order_by())
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode(cursor)))
+
+        rows = self.build(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            del rows[self.per_page:]
+            next_cursor = self.encode(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+    def encode(self, row):
+        values = [row[name] if isinstance(row, dict) else getattr(row, name) for name, _desc, _field in self.keys]
+        return signing.dumps(values, salt=CURSOR_SALT, serializer=_CursorSerializer)
+
+    def decode(self, cursor):
+        try:
+            values = signing.loads(cursor, salt=CURSOR_SALT, serializer=_CursorSerializer)
+        except signing.BadSignature:
+            raise InvalidCursor('Bad pagination cursor')
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor('Bad pagination cursor')
+        try:
+            return [
+                None if value is None else field.to_python(value)
+                for value, (_name, _desc, field) in zip(values, self.keys)
+            ]
+        except Exception:
+            raise InvalidCursor('Bad pagination cursor')
+
+    def _order_by(self):
+        ordering = []
+        for name, descending, field in self.keys:
+            if field.null:
+                expression = F(name)
+                ordering.append(expression.desc(nulls_last=True) if descending else expression.asc(nulls_last=True))
+            else:
+                ordering.append(f'-{name}' if descending else name)
+        return ordering
+
+    def _after(self, values):
+        """(k1, k2, …) «после» values: k1 > v1 OR (k1 = v1 AND k2 > v2) OR …"""
+        condition = None
+        equal = Q()
+        for (name, descending, field), value in zip(self.keys, values):
+            if value is not None:
+                beyond = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+                if field.null:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                beyond = equal & beyond
+                condition = beyond if condition is None else condition | beyond
+                equal &= Q(**{name: value})
+            else:
+                # После NULL (они в конце) по этому полю идут только такие же NULL
+                equal &= Q(**{f'{name}__isnull': True})
+
+        if condition is None:
+            return Q(pk__in=[])
+
+        # Граница по первому полю позволяет индексу сразу отсечь пройденные строки
+        first_name, first_descending, first_field = self.keys[0]
+        if values[0] is not None and not first_field.null:
+            condition &= Q(**{f'{first_name}__{"lte" if first_descending else "gte"}': values[0]})
+        return condition
+
+
+def paginate(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE, build=list):
+    """Страница по ?cursor=…; битый курсор — первая страница"""
+    paginator = KeysetPaginator(queryset, ordering, per_page=per_page, build=build)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def next_page_url(request, page):
+    if not page.has_next:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = page.next_cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def wants_fragment(request):
+    """Запрос следующей страницы от infinite_scroll.js"""
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+def fragment_response(request, page, fragments):
+    """JSON для infinite_scroll.js: {селектор контейнера: (шаблон, контекст)} → HTML"""
+    return JsonResponse({
+        'fragments': {
+            selector: render_to_string(template_name, context, request=request)
+            for selector, (template_name, context) in fragments.items()
+        },
+        'next_url': next_page_url(request, page),
+    })
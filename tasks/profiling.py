@@ -0,0 +1,320 @@
+"""Профилирование запросов в бою (включается TASKFLOW_PROFILING).
+
+ProfilingMiddleware на каждый запрос считает число и время SQL-запросов
+(по всем подключениям), повторы одного и того же запроса — отпечаток SQL
+без литералов, признак N+1, — время рендера шаблонов и процессорное время
+потока. Итог уходит в заголовок Server-Timing и в скользящее окно по имени
+вида (profiling_summary), которое показывает страница profiling_report.
+
+Доля TASKFLOW_PROFILE_SAMPLE_RATE запросов выполняется под cProfile; если
+такой запрос дольше TASKFLOW_PROFILE_SLOW_MS, профиль сохраняется в
+TASKFLOW_PROFILE_DIR (.prof — для pstats, snakeviz и т. п.).
+
+Статистика ведётся в памяти процесса: у каждого воркера своя. Виджеты
+async-видов, выполненные в пуле потоков (tasks/concurrency.py), учитываются
+в SQL запроса, но не в профиле cProfile и не в процессорном времени.
+"""
+import cProfile
+import contextvars
+import functools
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('taskflow_request_profile', default=None)
+_connection_wrappers = contextvars.ContextVar('taskflow_connection_wrappers', default=())
+_windows = {}
+_duplicates = {}
+_totals = Counter()
+_lock = threading.Lock()
+
+_SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без литералов и длины списков IN — одинаков для повторов одного запроса"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (…)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryTimer:
+    """execute_wrapper: число и суммарное время SQL-запросов без DEBUG-лога.
+
+    Точки сохранения вложенных atomic() не считаются: вне теста на их месте
+    BEGIN/COMMIT, которые через execute() не проходят.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        # Запросы одного HTTP-запроса могут идти из нескольких потоков (виджеты)
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(_SAVEPOINT_PREFIXES):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.sql_seconds += elapsed
+                self.queries += 1
+                self.executed(sql)
+
+    def executed(self, sql):
+        pass
+
+
+@contextmanager
+def wrap_connections(wrapper):
+    """execute_wrapper на всех подключениях, а не только на default.
+
+    Подключения у каждого потока свои, поэтому обёртка ещё и запоминается в
+    контексте: inherit_connection_wrappers ставит её в потоках пула виджетов.
+    """
+    token = _connection_wrappers.set((*_connection_wrappers.get(), wrapper))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            yield
+    finally:
+        _connection_wrappers.reset(token)
+
+
+@contextmanager
+def inherit_connection_wrappers():
+    """Обёртки wrap_connections из контекста вызывающего — на подключения текущего потока"""
+    with ExitStack() as stack:
+        for wrapper in _connection_wrappers.get():
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class RequestProfile(QueryTimer):
+    """Замеры одного запроса: SQL с отпечатками повторов и время шаблонов"""
+
+    def __init__(self):
+        super().__init__()
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+
+    def executed(self, sql):
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """{отпечаток: сколько раз} для запросов, повторённых не меньше threshold раз"""
+        return {sql: count for sql, count in self.fingerprints.items() if count >= threshold}
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, context=None, request=None):
+        profile = _current.get()
+        # Вложенные render_to_string уже учтены внешним рендером
+        if profile is None or profile.template_depth:
+            return render(self, context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile.template_seconds += time.perf_counter() - started
+            profile.template_depth -= 1
+
+    wrapper.taskflow_timed = True
+    return wrapper
+
+
+def install_template_timer():
+    """Время рендера шаблонов: обёртка над render() бэкенда DjangoTemplates"""
+    if not getattr(DjangoTemplate.render, 'taskflow_timed', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def _window_size():
+    return getattr(settings, 'TASKFLOW_PROFILE_WINDOW', 1000)
+
+
+def record(view_name, total_ms, profile, cpu_ms, duplicates):
+    with _lock:
+        window = _windows.get(view_name)
+        if window is None:
+            window = _windows[view_name] = deque(maxlen=_window_size())
+        window.append((
+            total_ms, profile.queries, profile.sql_seconds * 1000, profile.template_seconds * 1000, cpu_ms,
+        ))
+        _totals[view_name] += 1
+        if duplicates:
+            counter = _duplicates.setdefault(view_name, Counter())
+            for sql, count in duplicates.items():
+                counter[sql] = max(counter[sql], count)
+
+
+def _percentile(ordered, fraction):
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def profiling_summary():
+    """Сводка по видам за окно последних запросов, самые медленные (p95) первыми"""
+    with _lock:
+        snapshot = {name: list(window) for name, window in _windows.items()}
+        totals = dict(_totals)
+        duplicates = {name: counter.most_common(1)[0] for name, counter in _duplicates.items() if counter}
+
+    rows = []
+    for name, samples in snapshot.items():
+        durations = sorted(sample[0] for sample in samples)
+        count = len(samples)
+        top_duplicate = duplicates.get(name)
+        rows.append({
+            'view': name,
+            'requests': totals[name],
+            'window': count,
+            'p50_ms': _percentile(durations, 0.5),
+            'p95_ms': _percentile(durations, 0.95),
+            'p99_ms': _percentile(durations, 0.99),
+            'max_ms': durations[-1],
+            'queries_avg': sum(sample[1] for sample in samples) / count,
+            'queries_max': max(sample[1] for sample in samples),
+            'sql_ms_avg': sum(sample[2] for sample in samples) / count,
+            'template_ms_avg': sum(sample[3] for sample in samples) / count,
+            'cpu_ms_avg': sum(sample[4] for sample in samples) / count,
+            'duplicate_sql': top_duplicate[0] if top_duplicate else '',
+            'duplicate_count': top_duplicate[1] if top_duplicate else 0,
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows
+
+
+def reset_profiling():
+    with _lock:
+        _windows.clear()
+        _duplicates.clear()
+        _totals.clear()
+
+
+def profile_dir():
+    return getattr(settings, 'TASKFLOW_PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def recent_profile_dumps(limit=20):
+    """[(имя файла, размер, время изменения)] — последние сохранённые профили"""
+    directory = profile_dir()
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.prof')]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [
+        (entry.name, entry.stat().st_size, datetime.fromtimestamp(entry.stat().st_mtime))
+        for entry in entries[:limit]
+    ]
+
+
+class ProfilingMiddleware:
+    """Замеры запроса, Server-Timing и профили медленных запросов.
+
+    Ставится сразу после WhiteNoiseMiddleware, чтобы учитывать остальные
+    middleware (сессия, пользователь) и не замерять статику. Без
+    TASKFLOW_PROFILING отключается целиком (MiddlewareNotUsed).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TASKFLOW_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'TASKFLOW_PROFILE_SAMPLE_RATE', 0.05)
+        self.slow_ms = getattr(settings, 'TASKFLOW_PROFILE_SLOW_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'TASKFLOW_PROFILE_DUPLICATE_THRESHOLD', 3)
+        self.server_timing = getattr(settings, 'TASKFLOW_PROFILE_SERVER_TIMING', True)
+        install_template_timer()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self.start_profiler()
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            with wrap_connections(profile):
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+        cpu_ms = (time.thread_time() - cpu_started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or 'unresolved'
+        duplicates = profile.duplicates(self.duplicate_threshold)
+        if duplicates:
+            sql, count = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning('%s: query repeated %d times (N+1?): %s', view_name, count, sql[:300])
+        record(view_name, total_ms, profile, cpu_ms, duplicates)
+
+        if profiler is not None and total_ms >= self.slow_ms:
+            self.dump(profiler, view_name, total_ms)
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(
+                total_ms, profile, cpu_ms, duplicates, getattr(request, 'widget_timings', None),
+            )
+        return response
+
+    def start_profiler(self):
+        if random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (например, в соседнем потоке на 3.12+)
+            return None
+        return profiler
+
+    def dump(self, profiler, view_name, total_ms):
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '_', view_name)
+        name = f'{datetime.now():%Y%m%d-%H%M%S}-{slug}-{total_ms:.0f}ms-{os.getpid()}.prof'
+        profiler.dump_stats(os.path.join(directory, name))
+
+    def server_timing_header(self, total_ms, profile, cpu_ms, duplicates, widget_timings=None):
+        # Время шаблонов включает SQL ленивых QuerySet, выполненных при рендере
+        metrics = [
+            f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.queries} queries"',
+            f'tpl;dur={profile.template_seconds * 1000:.1f}',
+            f'cpu;dur={cpu_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ]
+        if duplicates:
+            metrics.append(f'dup;desc="{len(duplicates)} repeated"')
+        # Виджеты страницы (tasks/concurrency.py): в async-виде идут параллельно
+        for name, seconds in (widget_timings or {}).items():
+            metrics.append(f'w-{name};dur={seconds * 1000:.1f}')
+        return ', '.join(metrics)
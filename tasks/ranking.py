@@ -0,0 +1,147 @@
+"""Ручной порядок карточек в колонках Kanban: дробные строковые ключи.
+
+Порядок задаёт Task.rank — строка из цифр base-36, сравниваемая
+лексикографически. Между любыми двумя ключами есть третий (rank_between),
+поэтому перенос карточки записывает одну строку — саму задачу, без
+перенумерации соседей. Ключи не заканчиваются на '0': так место есть и
+перед любым ключом.
+
+Колонка — (проект, статус), индекс task_project_rank_idx. На доске
+нескольких проектов ключи тоже сравнимы между собой, и карточка встаёт
+туда, куда её перетащили.
+
+Вставки в одно и то же место удлиняют ключ (примерно на символ за пять
+вставок). В конец колонки ключ не делит интервал, а увеличивает последний
+(rank_after): символ добавляется, только когда ключ дошёл до 'zz…z'.
+Перенос в запросе пользователя всегда пишет одну строку. Длинный ключ сам
+служит отметкой: колонки с ключами длиннее RANK_REBALANCE_LENGTH, а также
+задачи без ключа (bulk_create не шлёт сигналов) фоновая команда
+rebalance_ranks (по расписанию, раз в 10 минут) переписывает равномерно
+расставленными короткими ключами в прежнем порядке. Запаса до
+RANK_MAX_LENGTH хватает на сотни переносов в одно место между запусками.
+"""
+from django.db import transaction
+from django.db.models import Max, Q
+from django.db.models.functions import Length
+
+from .caching import bump_versions
+from .models import Task
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+RANK_REBALANCE_LENGTH = 16
+RANK_MAX_LENGTH = Task._meta.get_field('rank').max_length
+REBALANCE_BATCH_SIZE = 1000
+
+
+def _midpoint(low, high):
+    """Ключ между low и high (high=None — без верхней границы); low < high"""
+    if high is not None:
+        # Общий префикс (недостающие цифры low — нули) переносится как есть
+        common = 0
+        while common < len(high) and (low[common] if common < len(low) else '0') == high[common]:
+            common += 1
+        if common:
+            return high[:common] + _midpoint(low[common:], high[common:])
+
+    digit_low = DIGITS.index(low[0]) if low else 0
+    digit_high = DIGITS.index(high[0]) if high is not None else len(DIGITS)
+    if digit_high - digit_low > 1:
+        return DIGITS[(digit_low + digit_high + 1) // 2]
+    # Соседние цифры: у high есть продолжение — хватит его первой цифры,
+    # иначе берём цифру low и ищем место глубже
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[digit_low] + _midpoint(low[1:], None)
+
+
+def rank_after(last):
+    """Ключ после last без верхней границы: last + 1 в последней цифре, не равной 'z'.
+
+    Хвост из 'z' отбрасывается (перенос), поэтому ключ не длиннее last;
+    после 'zz…z' добавляется цифра '1' — следующие 35 ключей той же длины.
+    """
+    prefix = (last or '').rstrip(DIGITS[-1])
+    if not prefix:
+        return (last or '') + DIGITS[1]
+    return prefix[:-1] + DIGITS[DIGITS.index(prefix[-1]) + 1]
+
+
+def rank_between(before=None, after=None):
+    """Ключ между соседями: before — карточка выше, after — ниже (None — край колонки).
+
+    Если after не больше before (соседи из разных проектов с равными ключами),
+    ключ ставится сразу после before.
+    """
+    before = before or ''
+    if after and after <= before:
+        after = before + DIGITS[-1]
+    if not after:
+        return rank_after(before)
+    return _midpoint(before, after)
+
+
+def spread_ranks(count):
+    """count коротких ключей по возрастанию, равномерно по всему диапазону"""
+    width = 1
+    while len(DIGITS) ** width <= count:
+        width += 1
+    space = len(DIGITS) ** width
+    ranks = []
+    for position in range(1, count + 1):
+        value = position * space // (count + 1)
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, len(DIGITS))
+            digits.append(DIGITS[digit])
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
+
+
+def column_end_rank(project_id, status):
+    """Ключ в конце колонки — для новой задачи (один шаг по индексу)"""
+    last = Task.objects.filter(project_id=project_id, status=status).aggregate(last=Max('rank'))['last']
+    return rank_after(last)
+
+
+def columns_to_rebalance(max_length=RANK_REBALANCE_LENGTH):
+    """(проект, статус) колонок с длинными ключами или задачами без ключа"""
+    return list(
+        Task.objects.annotate(rank_length=Length('rank'))
+        .filter(Q(rank='') | Q(rank_length__gt=max_length))
+        .order_by('project_id', 'status')
+        .values_list('project_id', 'status')
+        .distinct()
+    )
+
+
+def rebalance_column(project_id, status):
+    """Новые короткие ключи колонки в прежнем порядке; задачи без ключа — в конце.
+
+    Строки колонки заблокированы на время перезаписи, переносы в ней ждут.
+    updated_at не меняется: видимое содержимое карточек то же.
+    """
+    with transaction.atomic():
+        rows = list(
+            Task.objects.select_for_update()
+            .filter(project_id=project_id, status=status)
+            .order_by('rank', 'id')
+            .values_list('pk', 'rank')
+        )
+        ordered = [pk for pk, rank in rows if rank] + [pk for pk, rank in rows if not rank]
+        tasks = [Task(pk=pk, rank=rank) for pk, rank in zip(ordered, spread_ranks(len(ordered)))]
+        Task.objects.bulk_update(tasks, ['rank'], batch_size=REBALANCE_BATCH_SIZE)
+    return len(tasks)
+
+
+def rebalance(columns, progress=None):
+    """Перебалансирует колонки [(проект, статус)]; возвращает число переписанных задач"""
+    written = 0
+    for project_id, status in columns:
+        count = rebalance_column(project_id, status)
+        written += count
+        if progress:
+            progress(project_id, status, count)
+    if columns:
+        # В кэшированных карточках (tasks/templating.py) есть data-rank
+        bump_versions(('cards',))
+    return written
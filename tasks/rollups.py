@@ -0,0 +1,363 @@
+"""Ежедневные срезы задач по сотрудникам и проектам.
+
+Строка UserDailyStats / ProjectDailyStats за день хранит остатки на конец
+дня — открытые задачи по статусам и приоритетам, выполненные, просроченные —
+и потоки за день: создано и завершено. Строки текущего дня поддерживаются
+приращениями от изменений задач (apply_task_changes — из сигналов моделей и
+массовых операций); отсутствующая строка строится из таблицы задач одним
+GROUP BY, в котором текущее изменение уже учтено.
+
+Строки дня для всех сотрудников и проектов создаёт ensure_day: команда
+rollup_tasks по расписанию или первое чтение за день. Историю до включения
+срезов восстанавливает backfill (rollup_tasks --backfill).
+
+Графики и нагрузка команды читают только эти таблицы: год истории проекта —
+365 строк, а не проход по всей таблице задач.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, QuerySet, Sum, Value, When
+from django.utils import timezone
+
+from .models import Project, ProjectDailyStats, RollupDay, Task, UserDailyStats
+
+TaskState = namedtuple('TaskState', 'project_id assignee_id status priority due_date')
+
+DONE = 'done'
+OPEN_STATUSES = [value for value, _label in Task.STATUS_CHOICES if value != DONE]
+PRIORITIES = [value for value, _label in Task.PRIORITY_CHOICES]
+STOCK_FIELDS = [
+    'open', *[f'status_{status}' for status in OPEN_STATUSES], 'done', 'overdue',
+    *[f'priority_{priority}' for priority in PRIORITIES],
+]
+FLOW_FIELDS = ['created', 'completed']
+STAT_FIELDS = STOCK_FIELDS + FLOW_FIELDS
+
+# Вид среза: (модель, столбец строки среза, столбец задачи)
+SCOPES = {
+    'user': (UserDailyStats, 'user_id', 'assignee_id'),
+    'project': (ProjectDailyStats, 'project_id', 'project_id'),
+}
+BATCH_SIZE = 5000
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def contribution(state, today):
+    """Вклад задачи в остатки: {поле: 1}"""
+    if state.status == DONE:
+        return {'done': 1}
+    fields = {'open': 1, f'status_{state.status}': 1, f'priority_{state.priority}': 1}
+    if state.due_date is not None and state.due_date < today:
+        fields['overdue'] = 1
+    return fields
+
+
+def _task_scopes(state):
+    yield 'project', state.project_id
+    if state.assignee_id is not None:
+        yield 'user', state.assignee_id
+
+
+def change_deltas(changes, today):
+    """{(вид, id): {поле: приращение}} для [(было, стало)]; None — задача создана / удалена"""
+    deltas = {}
+    # Массовые изменения дают много одинаковых пар — каждую считаем один раз
+    for (old, new), count in Counter(changes).items():
+        old = old and TaskState._make(old)
+        new = new and TaskState._make(new)
+        for state, sign in ((old, -count), (new, count)):
+            if state is None:
+                continue
+            fields = contribution(state, today)
+            for scope in _task_scopes(state):
+                counter = deltas.setdefault(scope, Counter())
+                for name, value in fields.items():
+                    counter[name] += sign * value
+        if new is None:
+            continue
+        flows = {}
+        if old is None:
+            flows['created'] = count
+        if new.status == DONE and (old is None or old.status != DONE):
+            flows['completed'] = count
+        for scope in _task_scopes(new):
+            deltas.setdefault(scope, Counter()).update(flows)
+    return {
+        scope: {name: value for name, value in counter.items() if value}
+        for scope, counter in deltas.items()
+        if any(counter.values())
+    }
+
+
+def _skipped_scopes(deleting):
+    """Срезы удаляемого каскадом проекта или пользователя не трогаем: строка,
+    вставленная посреди каскада, нарушила бы внешний ключ"""
+    if isinstance(deleting, QuerySet):
+        models = {Project: 'project', User: 'user'}
+        kind = models.get(deleting.model)
+        return (lambda scope: scope[0] == kind) if kind else (lambda scope: False)
+    if isinstance(deleting, Project):
+        return lambda scope: scope == ('project', deleting.pk)
+    if isinstance(deleting, User):
+        return lambda scope: scope == ('user', deleting.pk)
+    return lambda scope: False
+
+
+def _increments(column, deltas):
+    """F(поле) + приращение; для нескольких строк — CASE по id среза, одним UPDATE"""
+    if len(deltas) == 1:
+        (fields,) = deltas.values()
+        return {name: F(name) + value for name, value in fields.items()}
+    names = {name for fields in deltas.values() for name in fields}
+    return {
+        name: F(name) + Case(
+            *[When(**{column: pk}, then=Value(fields[name])) for pk, fields in deltas.items() if name in fields],
+            default=Value(0), output_field=IntegerField(),
+        )
+        for name in names
+    }
+
+
+def apply_task_changes(changes, today=None, deleting=None):
+    """Приращения к сегодняшним строкам срезов; changes — [(было, стало)] кортежей
+    Task.rollup_state(); deleting — origin из post_delete"""
+    today = today or timezone.localdate()
+    skipped = _skipped_scopes(deleting)
+    by_kind = {}
+    for scope, fields in change_deltas(changes, today).items():
+        if not skipped(scope):
+            by_kind.setdefault(scope[0], {})[scope[1]] = fields
+
+    for kind, deltas in by_kind.items():
+        model, column, _task_column = SCOPES[kind]
+        rows = model.objects.filter(**{f'{column}__in': list(deltas), 'day': today})
+        if rows.update(**_increments(column, deltas)) == len(deltas):
+            continue
+        # Строк за сегодня нет: строим их из таблицы задач, где изменение уже есть
+        for pk in deltas.keys() - set(rows.values_list(column, flat=True)):
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(_build_rows(kind, today, [pk]))
+            except IntegrityError:
+                # Строку успела вставить параллельная транзакция — без нашего изменения
+                model.objects.filter(**{column: pk, 'day': today}).update(**_increments(column, {pk: deltas[pk]}))
+
+
+def refresh_task_scopes(states, today=None):
+    """Пересчёт остатков сегодняшних строк из таблицы задач (потоки за день не трогаются)"""
+    today = today or timezone.localdate()
+    by_kind = {}
+    for state in states:
+        for kind, pk in _task_scopes(TaskState._make(state)):
+            by_kind.setdefault(kind, set()).add(pk)
+    for kind, ids in by_kind.items():
+        model, column, _task_column = SCOPES[kind]
+        for row in _build_rows(kind, today, ids):
+            updated = model.objects.filter(**{column: getattr(row, column), 'day': today}).update(
+                **{name: getattr(row, name) for name in STOCK_FIELDS}
+            )
+            if not updated:
+                model.objects.bulk_create([row], ignore_conflicts=True)
+
+
+def _current_aggregates(day):
+    """Count(filter=…) для строки среза текущего дня по таблице задач"""
+    day_start = _day_start(day)
+    is_open = ~Q(status=DONE)
+    aggregates = {
+        'open': Count('id', filter=is_open),
+        'done': Count('id', filter=Q(status=DONE)),
+        'overdue': Count('id', filter=is_open & Q(due_date__lt=day)),
+        'created': Count('id', filter=Q(created_at__gte=day_start)),
+        # Точного момента завершения нет — последнее изменение выполненной задачи
+        'completed': Count('id', filter=Q(status=DONE, updated_at__gte=day_start)),
+    }
+    for status in OPEN_STATUSES:
+        aggregates[f'status_{status}'] = Count('id', filter=Q(status=status))
+    for priority in PRIORITIES:
+        aggregates[f'priority_{priority}'] = Count('id', filter=is_open & Q(priority=priority))
+    return aggregates
+
+
+def _build_rows(kind, day, ids=None):
+    """Несохранённые строки среза за текущий день; для ids без задач — нулевые"""
+    model, column, task_column = SCOPES[kind]
+    tasks = Task.objects.order_by().filter(**{f'{task_column}__isnull': False})
+    if ids is not None:
+        tasks = tasks.filter(**{f'{task_column}__in': ids})
+    counts = tasks.values(task_column).annotate(**_current_aggregates(day))
+    rows = {
+        row[task_column]: model(day=day, **{column: row[task_column]}, **{name: row[name] for name in STAT_FIELDS})
+        for row in counts
+    }
+    for pk in ids or ():
+        rows.setdefault(pk, model(day=day, **{column: pk}))
+    return list(rows.values())
+
+
+def _ready_key(day):
+    return f'taskflow:rollups:ready:{day.isoformat()}'
+
+
+def ensure_day(day=None):
+    """Строки текущего дня для всех сотрудников и проектов (один раз за день).
+
+    Существующие строки не трогаются: в них уже приращения за день.
+    """
+    day = day or timezone.localdate()
+    if cache.get(_ready_key(day)):
+        return
+    if not RollupDay.objects.filter(day=day).exists():
+        for kind, (model, _column, _task_column) in SCOPES.items():
+            model.objects.bulk_create(_build_rows(kind, day), batch_size=BATCH_SIZE, ignore_conflicts=True)
+        RollupDay.objects.get_or_create(day=day)
+    cache.set(_ready_key(day), True, timeout=24 * 3600)
+
+
+def _task_history(kind):
+    """(id среза, [задачи]) по одному срезу за раз: один упорядоченный проход по таблице"""
+    _model, _column, task_column = SCOPES[kind]
+    rows = (
+        Task.objects.filter(**{f'{task_column}__isnull': False})
+        .order_by(task_column)
+        .values_list(task_column, 'status', 'priority', 'created_at', 'updated_at', 'due_date')
+    )
+    for pk, tasks in groupby(rows.iterator(chunk_size=BATCH_SIZE), key=itemgetter(0)):
+        yield pk, list(tasks)
+
+
+def _history_events(tasks):
+    """Разностные события остатков {день: Counter} и потоки {день: Counter} для задач среза.
+
+    Восстанавливается по текущим данным: момент завершения — последнее
+    изменение выполненной задачи, статус открытой в прошлом, но уже
+    выполненной задачи неизвестен и считается «в работе», приоритет — текущий.
+    """
+    stocks, flows = {}, {}
+
+    def add(target, day, fields, sign=1):
+        counter = target.setdefault(day, Counter())
+        for name in fields:
+            counter[name] += sign
+
+    for _pk, status, priority, created_at, updated_at, due_date in tasks:
+        created = timezone.localdate(created_at)
+        completed = None
+        if status == DONE:
+            completed = max(created, timezone.localdate(updated_at))
+        open_fields = ['open', f'status_{status if status != DONE else "in_progress"}', f'priority_{priority}']
+
+        add(stocks, created, open_fields)
+        add(flows, created, ['created'])
+        if completed is not None:
+            add(stocks, completed, open_fields, -1)
+            add(stocks, completed, ['done'])
+            add(flows, completed, ['completed'])
+        if due_date is not None:
+            overdue_from = max(created, due_date + timedelta(days=1))
+            if completed is None or overdue_from < completed:
+                add(stocks, overdue_from, ['overdue'])
+                if completed is not None:
+                    add(stocks, completed, ['overdue'], -1)
+    return stocks, flows
+
+
+def _history_rows(kind, pk, tasks, start, end):
+    model, column, _task_column = SCOPES[kind]
+    stocks, flows = _history_events(tasks)
+    running = Counter()
+    for day in sorted(day for day in stocks if day < start):
+        running.update(stocks[day])
+
+    day = start
+    while day <= end:
+        if day in stocks:
+            running.update(stocks[day])
+        day_flows = flows.get(day, {})
+        if any(running.values()) or day_flows:
+            values = {name: running[name] for name in STOCK_FIELDS}
+            values.update({name: day_flows.get(name, 0) for name in FLOW_FIELDS})
+            yield model(day=day, **{column: pk}, **values)
+        day += timedelta(days=1)
+
+
+def backfill(start, end, progress=None):
+    """Перестроить строки срезов за [start, end] по таблице задач; возвращает {вид: строк}"""
+    written = {}
+    for kind, (model, _column, _task_column) in SCOPES.items():
+        written[kind] = 0
+        with transaction.atomic():
+            model.objects.filter(day__range=(start, end)).delete()
+            batch = []
+            for pk, tasks in _task_history(kind):
+                batch.extend(_history_rows(kind, pk, tasks, start, end))
+                if len(batch) >= BATCH_SIZE:
+                    model.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+                    written[kind] += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+            written[kind] += len(batch)
+        if progress:
+            progress(kind, written[kind])
+    RollupDay.objects.filter(day__range=(start, end)).delete()
+    RollupDay.objects.bulk_create([
+        RollupDay(day=start + timedelta(days=offset)) for offset in range((end - start).days + 1)
+    ])
+    return written
+
+
+def daily_series(start, end, user_id=None, project_id=None):
+    """[{day, поля…}] за каждый день [start, end]: сотрудник, проект или вся команда.
+
+    Дни без строк (срезы за них не строились) продолжают остатки предыдущего
+    дня с нулевыми потоками.
+    """
+    if user_id is not None:
+        rows = UserDailyStats.objects.filter(user_id=user_id, day__range=(start, end)).values('day', *STAT_FIELDS)
+    elif project_id is not None:
+        rows = ProjectDailyStats.objects.filter(project_id=project_id, day__range=(start, end)).values(
+            'day', *STAT_FIELDS)
+    else:
+        # Каждая задача входит ровно в один проект — сумма по проектам и есть команда
+        rows = (
+            ProjectDailyStats.objects.filter(day__range=(start, end))
+            .order_by()
+            .values('day')
+            .annotate(**{name: Sum(name) for name in STAT_FIELDS})
+        )
+    by_day = {row['day']: row for row in rows}
+
+    series = []
+    previous = {name: 0 for name in STAT_FIELDS}
+    day = start
+    while day <= end:
+        row = by_day.get(day)
+        if row is None:
+            row = {**previous, **{name: 0 for name in FLOW_FIELDS}}
+        row = {'day': day, **{name: row[name] or 0 for name in STAT_FIELDS}}
+        series.append(row)
+        previous = row
+        day += timedelta(days=1)
+    return series
+
+
+def weekly(series):
+    """Недели вместо дней: потоки суммируются, остатки — на последний день недели"""
+    weeks = []
+    for _week, days in groupby(series, key=lambda row: row['day'].isocalendar()[:2]):
+        days = list(days)
+        week = dict(days[-1])
+        week['day'] = days[0]['day']
+        for name in FLOW_FIELDS:
+            week[name] = sum(row[name] for row in days)
+        weeks.append(week)
+    return weeks
@@ -0,0 +1,115 @@
+"""Чтение с реплики для read-only видов с read-your-writes.
+
+Реплика (DATABASES['replica'], задаётся DATABASE_REPLICA_URL) обслуживает
+только явно помеченные чтения: виды под read_replica и блоки
+replica_reads(). Всё остальное, включая любые записи, идёт в основную БД.
+
+Реплика отстаёт, поэтому чтения возвращаются на основную БД:
+- до конца запроса, если в нём уже была запись;
+- на TASKFLOW_REPLICA_PIN_SECONDS после запроса с записью или с
+  изменяющим методом — ReplicaPinMiddleware ставит клиенту cookie.
+"""
+import asyncio
+import contextvars
+import functools
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+PIN_COOKIE = 'taskflow_primary'
+
+_replica_reads = contextvars.ContextVar('taskflow_replica_reads', default=False)
+_writes = contextvars.ContextVar('taskflow_db_writes', default=None)
+
+
+class WriteTracker:
+    """Признаки запроса: клиент закреплён за основной БД, в запросе была запись.
+
+    Один объект на запрос: копии контекста (потоки виджетов, sync_to_async)
+    ссылаются на него же и видят записи друг друга.
+    """
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_replica():
+    """Пойдёт ли сейчас чтение на реплику"""
+    if not _replica_reads.get() or not replica_configured():
+        return False
+    tracker = _writes.get()
+    return tracker is None or not (tracker.pinned or tracker.wrote)
+
+
+@contextmanager
+def track_writes(pinned=False):
+    """Границы запроса для ReplicaPinMiddleware; отдаёт WriteTracker"""
+    tracker = WriteTracker(pinned)
+    token = _writes.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _writes.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Чтения внутри блока — с реплики (если она задана и нет закрепления)"""
+    tokens = [(_replica_reads, _replica_reads.set(True))]
+    # Вне запроса (команды) запись в блоке тоже возвращает чтения на основную БД
+    if _writes.get() is None:
+        tokens.append((_writes, _writes.set(WriteTracker())))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def read_replica(view):
+    """Декоратор read-only вида (синхронного или async): чтения — с реплики"""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Помеченные чтения — на реплику, остальное и все записи — на основную БД"""
+
+    def db_for_read(self, model, **hints):
+        # Явно, а не None: иначе связанные объекты прочитанного с реплики
+        # объекта читались бы с реплики и после записи
+        return REPLICA if reading_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        tracker = _writes.get()
+        if tracker is not None:
+            tracker.wrote = True
+        # Явно: объект, прочитанный с реплики, сохраняется в основную БД
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -0,0 +1,170 @@
+"""Поиск задач: полнотекстовый на PostgreSQL, icontains на остальных СУБД.
+
+На PostgreSQL колонку Task.search_vector поддерживают триггеры (миграция 0005):
+название (вес A), описание (B) и текст комментариев (C) в конфигурациях
+russian и english. Векторы задач, созданных до миграции, заполняет команда
+backfill_search_vectors. Если полнотекстовый поиск ничего не нашёл (опечатка),
+используется триграммное сходство по названию (pg_trgm).
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Task, TaskComment
+
+SEARCH_CONFIGS = ('russian', 'english')
+# Постраничный вывод найденного по релевантности (KeysetPaginator)
+SEARCH_ORDERING = ('-search_rank', '-id')
+BACKFILL_BATCH_SIZE = 5000
+
+# Маркеры подсветки из ts_headline: экранируем текст, потом меняем их на <mark>
+_START_SEL = '\x02'
+_STOP_SEL = '\x03'
+
+
+def is_full_text_available():
+    return connection.vendor == 'postgresql'
+
+
+def _search_query(query):
+    combined = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(query, config=config, search_type='websearch')
+        combined = part if combined is None else combined | part
+    return combined
+
+
+def search_tasks(tasks, query, match_tags=False):
+    """Фильтрует tasks по запросу; результат упорядочен по релевантности.
+
+    На PostgreSQL релевантность — аннотация search_rank (страницы — по
+    search_ordering). match_tags — находить и задачи с тегом, равным запросу
+    ('api*' — по префиксу).
+    """
+    query = (query or '').strip()
+    if not query:
+        return tasks
+
+    tagged = Q(pk__in=Task.objects.tagged(query).values('pk')) if match_tags else Q(pk__in=[])
+
+    if not is_full_text_available():
+        return tasks.filter(
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(pk__in=TaskComment.objects.filter(text__icontains=query).values('task_id'))
+            | tagged
+        )
+
+    search_query = _search_query(query)
+    matched = (
+        tasks.filter(Q(search_vector=search_query) | tagged)
+        .annotate(search_rank=SearchRank(F('search_vector'), search_query))
+        .order_by(*SEARCH_ORDERING)
+    )
+    if matched.exists():
+        return matched
+
+    # Опечатки: сходство по словам названия (оператор %> по GIN-индексу gin_trgm_ops)
+    return (
+        tasks.filter(title__trigram_word_similar=query)
+        .annotate(search_rank=TrigramWordSimilarity(query, 'title'))
+        .order_by(*SEARCH_ORDERING)
+    )
+
+
+def search_ordering(query, default):
+    """Ключ страниц: по релевантности, если search_tasks её посчитал, иначе default"""
+    if (query or '').strip() and is_full_text_available():
+        return SEARCH_ORDERING
+    return default
+
+
+def backfill_search_vectors(batch_size=BACKFILL_BATCH_SIZE, rebuild=False, progress=None):
+    """Заполняет search_vector пачками по id; возвращает число обновлённых строк.
+
+    Каждая пачка — отдельный короткий UPDATE в автокоммите: блокировки строк
+    не копятся, запись в таблицу не ждёт. rebuild — пересчитать и заполненные.
+    """
+    only_missing = '' if rebuild else ' AND search_vector IS NULL'
+    written, last_id = 0, 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                'SELECT max(id) FROM (SELECT id FROM tasks_task WHERE id > %s ORDER BY id LIMIT %s) batch',
+                [last_id, batch_size],
+            )
+            upper = cursor.fetchone()[0]
+            if upper is None:
+                return written
+            cursor.execute(
+                'UPDATE tasks_task SET search_vector = tasks_task_search_vector(id, title, description) '
+                'WHERE id > %s AND id <= %s' + only_missing,
+                [last_id, upper],
+            )
+            written += cursor.rowcount
+            last_id = upper
+            if progress:
+                progress(written, last_id)
+
+
+def with_snippets(tasks, query, max_words=20):
+    """Фрагмент описания с подсветкой от ts_headline (см. snippet_html)"""
+    query = (query or '').strip()
+    if not query:
+        return tasks
+    if is_full_text_available():
+        return tasks.annotate(raw_snippet=SearchHeadline(
+            'description',
+            _search_query(query),
+            config=SEARCH_CONFIGS[0],
+            start_sel=_START_SEL,
+            stop_sel=_STOP_SEL,
+            max_words=max_words,
+            min_words=max_words // 2,
+        ))
+    return tasks
+
+
+def snippet_fields():
+    """Поля, из которых snippet_html строит фрагмент (для values-загрузки)"""
+    return ('raw_snippet',) if is_full_text_available() else ('description',)
+
+
+def snippet_html(task, query, max_chars=160):
+    """HTML-фрагмент описания с выделенными совпадениями (безопасный)"""
+    raw = getattr(task, 'raw_snippet', None)
+    if raw is not None:
+        html = escape(raw).replace(_START_SEL, '<mark>').replace(_STOP_SEL, '</mark>')
+        return mark_safe(html)
+    return highlight(task.description, query, max_chars=max_chars)
+
+
+def highlight(text, query, max_chars=160):
+    """Подсветка слов запроса в тексте без помощи СУБД"""
+    text = text or ''
+    words = [re.escape(word) for word in query.split() if word]
+    if not words:
+        return escape(text[:max_chars])
+    pattern = re.compile('|'.join(words), re.IGNORECASE)
+
+    match = pattern.search(text)
+    start = max(0, match.start() - max_chars // 3) if match else 0
+    fragment = text[start:start + max_chars]
+
+    parts = []
+    position = 0
+    for found in pattern.finditer(fragment):
+        parts.append(escape(fragment[position:found.start()]))
+        parts.append(f'<mark>{escape(found.group())}</mark>')
+        position = found.end()
+    parts.append(escape(fragment[position:]))
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + max_chars < len(text) else ''
+    return mark_safe(prefix + ''.join(parts) + suffix)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Tag, Task, UserDailyStats
+from .rollups import ensure_day
+
+OPEN_STATUSES = ['todo', 'in_progress', 'review']
+
+
+def dashboard_aggregates(today):
+    """Выражения Count(filter=...) для всех счётчиков дашборда"""
+    soon_deadline = today + timedelta(days=2)
+    is_open = Q(status__in=OPEN_STATUSES)
+
+    aggregates = {
+        'total': Count('id'),
+        'completed': Count('id', filter=Q(status='done')),
+        'pending': Count('id', filter=~Q(status='done')),
+        'overdue': Count('id', filter=is_open & Q(due_date__lt=today)),
+        'soon_overdue': Count('id', filter=is_open & Q(due_date__gt=today, due_date__lte=soon_deadline)),
+    }
+    for value, _label in Task.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _label in Task.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+    return aggregates
+
+
+def activity_queryset(user, today):
+    """Количество созданных задач по дням за последнюю неделю — из ежедневных срезов"""
+    week_start = today - timedelta(days=6)
+    return UserDailyStats.objects.filter(user=user, day__range=(week_start, today), created__gt=0)
+
+
+def get_dashboard_stats(user, today=None):
+    """Счётчики дашборда одним агрегирующим запросом + гистограмма за 7 дней.
+
+    Возвращает словарь с теми же ключами контекста, что использует
+    шаблон dashboard.html.
+    """
+    if today is None:
+        today = timezone.now().date()
+
+    counts = Task.objects.filter(assignee=user).order_by().aggregate(**dashboard_aggregates(today))
+
+    per_day = dict(activity_queryset(user, today).values_list('day', 'created'))
+    days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+
+    return {
+        'total_tasks': counts['total'],
+        'completed_tasks': counts['completed'],
+        'pending_tasks': counts['pending'],
+        'overdue_tasks': counts['overdue'],
+        'soon_overdue_count': counts['soon_overdue'],
+        'tasks_by_status': {value: counts[f'status_{value}'] for value, _label in Task.STATUS_CHOICES},
+        'tasks_by_priority': {value: counts[f'priority_{value}'] for value, _label in Task.PRIORITY_CHOICES},
+        'last_7_days': [day.strftime('%d.%m') for day in days],
+        'tasks_last_7_days': [per_day.get(day, 0) for day in days],
+    }
+
+
+def project_tag_counts(project):
+    """Теги проекта с числом задач — один GROUP BY по таблице связей"""
+    return (
+        Tag.objects.filter(tasks__project=project)
+        .annotate(num_tasks=Count('tasks'))
+        .order_by('-num_tasks', 'name')
+    )
+
+
+def get_team_workload(limit=5):
+    """Самые загруженные сотрудники: открытые задачи на каждого (для admin/manager).
+
+    Читает сегодняшние строки UserDailyStats по индексу (day, open) вместо
+    GROUP BY по всем задачам.
+    """
+    today = timezone.localdate()
+    ensure_day(today)
+    rows = (
+        UserDailyStats.objects.filter(day=today)
+        .select_related('user__profile')
+        .order_by('-open', 'user_id')[:limit]
+    )
+    return [
+        {
+            'id': row.user_id,
+            'name': row.user.profile.display_name,
+            'initials': row.user.profile.initials,
+            'avatar_color': row.user.profile.avatar_color,
+            'active_tasks': row.open,
+        }
+        for row in rows
+    ]
@@ -4,6 +4,7 @@ register = template.Library()
 
 @register.filter
 def get_item(dictionary, key):
+    """Список из словаря-индекса (например, задачи на дату) за O(1)"""
     if dictionary is None:
         return []
-    return dictionary.get(key, [])
\ No newline at end of file
+    return dictionary.get(key, [])
@@ -0,0 +1,11 @@
+from django import template
+
+from tasks.templating import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def task_cards(context, cards, style):
+    """Список карточек задач одного вида (см. tasks/templating.py)"""
+    return render_cards(context, cards, style)
@@ -0,0 +1,77 @@
+"""Карточки задач в шаблонах и прогрев скомпилированных шаблонов.
+
+Разметка карточки каждого вида — один шаблон в partials/cards/, его
+выводит тег {% task_cards cards 'вид' %} (templatetags/task_cards.py).
+Тег рендерит весь список сразу: шаблон карточки компилируется один раз
+(кэширующий загрузчик), контекст создаётся один на список, а готовый HTML
+карточек берётся из кэша фрагментов пачкой (get_many) по ключу
+(id, updated_at) — {% cache %} на каждую карточку ходил бы в кэш
+тысячи раз за доску. Смена тегов тоже сдвигает updated_at
+(touch_task_tags_changed в models.py).
+
+Помимо самой задачи карточку меняют название и цвет проекта, имя и
+цвет исполнителя — их сигналы увеличивают версию области ('cards',).
+Виды с отметкой «Просрочена» дополнительно зависят от даты.
+"""
+import os
+
+from django.template import engines
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .caching import cached_fragments
+
+# вид: (шаблон, зависит ли от даты)
+CARD_TEMPLATES = {
+    'kanban': ('tasks/partials/cards/kanban.html', False),
+    'project': ('tasks/partials/cards/project.html', True),
+    'row': ('tasks/partials/cards/row.html', True),
+    'recent': ('tasks/partials/cards/recent.html', True),
+}
+CARD_SCOPES = [('cards',)]
+
+
+def _card_key(card):
+    return f'{card.id}.{card.updated_at.timestamp():.6f}'
+
+
+def render_cards(context, cards, style):
+    """HTML карточек (tasks.cards.TaskCard) вида style в контексте шаблона"""
+    template_name, dated = CARD_TEMPLATES[style]
+    template = context.template.engine.get_template(template_name)
+    card_context = context.new()
+
+    def render(batch):
+        html = []
+        for card in batch:
+            with card_context.push(task=card):
+                html.append(template.render(card_context))
+        return html
+
+    if not cards:
+        return ''
+    # Фрагмент из поиска (my_tasks) у каждой выдачи свой — такие списки не кэшируются
+    if any(card.snippet is not None for card in cards):
+        return mark_safe(''.join(render(cards)))
+
+    by_key = {_card_key(card): card for card in cards}
+    html = cached_fragments(
+        'task_card',
+        {key: CARD_SCOPES for key in by_key},
+        lambda keys: dict(zip(keys, render([by_key[key] for key in keys]))),
+        variant=f'{style}:{timezone.now().date()}' if dated else style,
+    )
+    return mark_safe(''.join(html[_card_key(card)] for card in cards))
+
+
+def warm_templates():
+    """Компилирует шаблоны проекта заранее (старт воркера), а не на первых запросах"""
+    count = 0
+    for engine in engines.all():
+        for directory in getattr(engine, 'dirs', ()):
+            for root, _dirs, files in os.walk(directory):
+                for filename in files:
+                    if filename.endswith('.html'):
+                        engine.get_template(os.path.relpath(os.path.join(root, filename), directory))
+                        count += 1
+    return count
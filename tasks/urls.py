@@ -1,17 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Под ASGI (taskmanager/asgi.py) — async-версии: виджеты страниц загружаются одновременно
+if settings.TASKFLOW_ASYNC_VIEWS:
+    dashboard, calendar_view, kanban_view = views.dashboard_async, views.calendar_async, views.kanban_async
+else:
+    dashboard, calendar_view, kanban_view = views.dashboard, views.calendar_view, views.kanban_view
+
 urlpatterns = [
     # Auth
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
 
     # Dashboard
-    path('dashboard/', views.dashboard, name='dashboard'),
-    path('', views.dashboard, name='home'),
-    path('calendar/', views.calendar_view, name='calendar'),
-    path('kanban/', views.kanban_view, name='kanban'),
+    path('dashboard/', dashboard, name='dashboard'),
+    path('', dashboard, name='home'),
+    path('calendar/', calendar_view, name='calendar'),
+    path('kanban/', kanban_view, name='kanban'),
     path('kanban/update-status/', views.kanban_update_status, name='kanban_update_status'),
+    path('analytics/', views.analytics, name='analytics'),
+    path('tasks/live/', views.live_updates, name='live_updates'),
+    path('tasks/stream/', views.task_stream, name='task_stream'),
 
     # Projects
     path('projects/', views.project_list, name='project_list'),
@@ -27,6 +37,8 @@ urlpatterns = [
     path('tasks/<int:pk>/edit/', views.task_edit, name='task_edit'),
     path('tasks/<int:pk>/delete/', views.task_delete, name='task_delete'),
     path('tasks/<int:pk>/update-status/', views.task_update_status, name='task_update_status'),
+    path('tasks/bulk-update/', views.task_bulk_update, name='task_bulk_update'),
+    path('tasks/export/', views.task_export, name='task_export'),
 
     # Comments
     path('tasks/<int:task_pk>/comment/', views.add_comment, name='add_comment'),
@@ -34,10 +46,17 @@ urlpatterns = [
     # My tasks
     path('my-tasks/', views.my_tasks, name='my_tasks'),
 
+    # Search
+    path('search/', views.task_search, name='task_search'),
+
     # User Management (Admin only)
     path('users/', views.user_list, name='user_list'),
     path('users/create/', views.user_create, name='user_create'),
     path('users/<int:pk>/edit/', views.user_edit, name='user_edit'),
     path('users/<int:pk>/delete/', views.user_delete, name='user_delete'),
     path('departments/', views.department_list, name='department_list'),
+    path('profiling/', views.profiling_report, name='profiling_report'),
+
+    # Prometheus
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,20 +1,58 @@
 from datetime import datetime, timedelta
 from django.utils import timezone
 import calendar
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
 from django.db.models import Count, Q
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST, condition
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
 from django.db.models import Q, Count
 from django.contrib.auth.models import User
-from .models import Project, Task, TaskComment, Department, UserProfile
+from django.core.exceptions import PermissionDenied
+from .models import (
+    ROLLUP_STATE_FIELDS, Project, Tag, Task, TaskComment, TaskEvent, TaskTombstone, Department, UserProfile,
+    task_cache_scopes,
+)
 from .forms import ProjectForm, TaskForm, CommentForm, UserCreateForm, UserEditForm
+from .board import (
+    DONE_COLUMN_LIMIT, board_filters, board_version, card_payload, filter_board, filter_options, is_board_admin,
+    partition_board, project_access, task_access, visible_tasks, visible_tombstones,
+)
+from .broker import get_broker, project_channel, publish_on_commit
+from .caching import bump_versions_on_commit, cached_fragment, cached_fragments
+from .cards import load_cards
+from .concurrency import async_login_required, gather_widgets, is_asgi, run_widgets, stream_body
+from .export import FORMATS as EXPORT_FORMATS, export_chunks, export_filename
+from .flow import flow_metrics
+from .pagination import fragment_response, next_page_url, paginate, wants_fragment
+from .ranking import RANK_MAX_LENGTH, rank_between
+from .metrics import render_metrics
+from .profiling import profiling_summary, recent_profile_dumps
+from .rollups import TaskState, apply_task_changes, daily_series, ensure_day, weekly
+from .routers import read_replica
+from .search import (
+    SEARCH_ORDERING, is_full_text_available, search_ordering, search_tasks, snippet_fields, snippet_html,
+    with_snippets,
+)
+from .stats import get_dashboard_stats, project_tag_counts, get_team_workload
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+import asyncio
+import hashlib
 import json
+import threading
+import time
 
 # ─── HELPERS ─────────────────────────────────────────────
 
@@ -23,6 +61,11 @@ def is_admin(user):
     return user.is_authenticated and (user.is_superuser or user.profile.role == 'admin')
 
 
+def is_manager(user):
+    """Администратор или руководитель"""
+    return user.is_authenticated and (user.is_superuser or user.profile.role in ['admin', 'manager'])
+
+
 # ─── AUTH ────────────────────────────────────────────────
 
 def login_view(request):
@@ -46,109 +89,108 @@ def logout_view(request):
 
 # ─── DASHBOARD ───────────────────────────────────────────
 
-@login_required
-def dashboard(request):
-    # Проекты пользователя
-    user_projects = Project.objects.filter(members=request.user)
-
-    # Задачи пользователя
-    user_tasks = Task.objects.filter(assignee=request.user).select_related('project')
-
-    # Базовая статистика
-    total_tasks = user_tasks.count()
-    completed_tasks = user_tasks.filter(status='done').count()
-    pending_tasks = user_tasks.exclude(status='done').count()
-    overdue_tasks = user_tasks.filter(
-        due_date__lt=timezone.now().date(),
-        status__in=['todo', 'in_progress', 'review']
-    ).count()
-
-    # Статистика по статусам для графика
-    tasks_by_status = {
-        'todo': user_tasks.filter(status='todo').count(),
-        'in_progress': user_tasks.filter(status='in_progress').count(),
-        'review': user_tasks.filter(status='review').count(),
-        'done': user_tasks.filter(status='done').count(),
+def _dashboard_widgets(user, today):
+    """Независимые части дашборда: {имя: функция → готовые данные}"""
+    # Задачи пользователя (карточки: days_until_due и is_overdue уже посчитаны)
+    user_tasks = Task.objects.filter(assignee=user)
+    open_statuses = ['todo', 'in_progress', 'review']
+
+    def soon_overdue_tasks():
+        # НОВОЕ: Задачи которые скоро просрочатся (через 1-2 дня)
+        soon_deadline = today + timedelta(days=2)  # Через 2 дня
+        return load_cards(user_tasks.filter(
+            due_date__gt=today,
+            due_date__lte=soon_deadline,
+            status__in=open_statuses
+        ).order_by('due_date'), today=today)
+
+    widgets = {
+        # Вся статистика (карточки, графики, активность за 7 дней) — одним проходом,
+        # из кэша, пока задачи пользователя не менялись
+        'stats': lambda: cached_fragment(
+            'dashboard_stats', [('user', user.pk)],
+            lambda: get_dashboard_stats(user, today=today), variant=today.isoformat(),
+        ),
+        # Ближайшие дедлайны (для AI ассистента)
+        'upcoming_deadlines': lambda: load_cards(user_tasks.filter(
+            due_date__gte=today,
+            status__in=open_statuses
+        ).order_by('due_date')[:3], today=today),
+        'soon_overdue_tasks': soon_overdue_tasks,
+        # Последние активности
+        'recent_tasks': lambda: load_cards(user_tasks.order_by('-created_at')[:5], today=today),
     }
+    # Нагрузка команды (для admin/managers)
+    if is_manager(user):
+        widgets['team_workload'] = lambda: cached_fragment('team_workload', [('team',)], get_team_workload)
+    return widgets
+
 
-    # Статистика по приоритетам
-    tasks_by_priority = {
-        'low': user_tasks.filter(priority='low').count(),
-        'medium': user_tasks.filter(priority='medium').count(),
-        'high': user_tasks.filter(priority='high').count(),
-        'urgent': user_tasks.filter(priority='urgent').count(),
+def _render_dashboard(request, widgets):
+    stats = widgets.pop('stats')
+    context = {
+        'team_workload': None,
+        **widgets,
+        **stats,
     }
+    return render(request, 'tasks/dashboard.html', context)
 
-    # Задачи за последние 7 дней (для графика активности)
-    last_7_days = []
-    tasks_last_7_days = []
-    for i in range(6, -1, -1):
-        day = timezone.now().date() - timedelta(days=i)
-        last_7_days.append(day.strftime('%d.%m'))
-        count = user_tasks.filter(created_at__date=day).count()
-        tasks_last_7_days.append(count)
-
-    # Ближайшие дедлайны (для AI ассистента)
-    upcoming_deadlines = user_tasks.filter(
-        due_date__gte=timezone.now().date(),
-        status__in=['todo', 'in_progress', 'review']
-    ).order_by('due_date')[:3]
-
-    # НОВОЕ: Задачи которые скоро просрочатся (через 1-2 дня)
-    today = timezone.now().date()
-    soon_deadline = today + timedelta(days=2)  # Через 2 дня
-
-    soon_overdue_tasks = user_tasks.filter(
-        due_date__gt=today,
-        due_date__lte=soon_deadline,
-        status__in=['todo', 'in_progress', 'review']
-    ).order_by('due_date')
-
-    # Добавляем количество дней до дедлайна для каждой задачи
-    for task in soon_overdue_tasks:
-        task.days_until_due = (task.due_date - today).days
-
-    # Последние активности
-    recent_tasks = user_tasks.order_by('-created_at')[:5]
 
-    # Нагрузка команды (для admin/managers)
-    team_workload = None
-    if request.user.is_superuser or request.user.profile.role in ['admin', 'manager']:
-        from django.contrib.auth.models import User
-        team_workload = User.objects.filter(
-            assigned_tasks__isnull=False
-        ).annotate(
-            active_tasks=Count('assigned_tasks', filter=Q(assigned_tasks__status__in=['todo', 'in_progress', 'review']))
-        ).order_by('-active_tasks')[:5]
+@login_required
+@read_replica
+def dashboard(request):
+    widgets, request.widget_timings = run_widgets(_dashboard_widgets(request.user, timezone.now().date()))
+    return _render_dashboard(request, widgets)
 
-    context = {
-        'user_projects': user_projects[:5],
-        'recent_tasks': recent_tasks,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
-        'tasks_by_status': tasks_by_status,
-        'tasks_by_priority': tasks_by_priority,
-        'last_7_days': last_7_days,
-        'tasks_last_7_days': tasks_last_7_days,
-        'upcoming_deadlines': upcoming_deadlines,
-        'soon_overdue_tasks': soon_overdue_tasks,  # НОВОЕ
-        'soon_overdue_count': soon_overdue_tasks.count(),  # НОВОЕ - для бейджа
-        'team_workload': team_workload,
-    }
 
-    return render(request, 'tasks/dashboard.html', context)
+@async_login_required
+@read_replica
+async def dashboard_async(request):
+    """Дашборд для ASGI: виджеты загружаются одновременно (tasks/concurrency.py)"""
+    widgets, request.widget_timings = await gather_widgets(
+        _dashboard_widgets(request.user, timezone.now().date()),
+    )
+    return await sync_to_async(_render_dashboard)(request, widgets)
 
 
 # ─── PROJECTS ────────────────────────────────────────────
 
+PROJECTS_PAGE_SIZE = 24
+
+
 @login_required
 def project_list(request):
+    # Подзапрос по участникам вместо JOIN + distinct(): счётчики задач не размножаются
     projects = Project.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user)
-    ).distinct()
-    return render(request, 'tasks/project_list.html', {'projects': projects})
+        Q(created_by=request.user) | Q(pk__in=request.user.projects.values('pk'))
+    ).only('pk', 'created_at')
+    page = paginate(request, projects, ('-created_at', '-id'), per_page=PROJECTS_PAGE_SIZE)
+    cards = _project_cards([project.pk for project in page])
+
+    if wants_fragment(request):
+        return fragment_response(request, page, {
+            '#projectCards': ('tasks/partials/project_cards.html', {'cards': cards}),
+        })
+    return render(request, 'tasks/project_list.html', {
+        'projects': page,
+        'cards': cards,
+        'next_url': next_page_url(request, page),
+    })
+
+
+def _project_cards(project_ids):
+    """HTML карточек проектов: из кэша по версии проекта, промахи — одним запросом"""
+    def render_cards(missing):
+        projects = Project.objects.filter(pk__in=missing).with_progress().with_members()
+        return {
+            project.pk: render_to_string('tasks/partials/project_card.html', {'project': project})
+            for project in projects
+        }
+
+    cards = cached_fragments(
+        'project_card', {pk: [('project', pk), ('directory',)] for pk in project_ids}, render_cards,
+    )
+    return [mark_safe(cards[pk]) for pk in project_ids if pk in cards]
 
 
 @login_required
@@ -167,51 +209,6 @@ def project_create(request):
     return render(request, 'tasks/project_form.html', {'form': form, 'title': 'Новый проект'})
 
 
-@login_required
-def project_detail(request, pk):
-    project = get_object_or_404(Project, pk=pk)
-    tasks = project.tasks.all()
-
-    # Filter by status
-    status_filter = request.GET.get('status')
-    if status_filter:
-        tasks = tasks.filter(status=status_filter)
-
-    # Search
-    search = request.GET.get('search', '').strip()
-    if search:
-        tasks = tasks.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search) |
-            Q(tags__icontains=search)
-        )
-
-    # Group tasks by status for Kanban
-    kanban = {
-        'todo': tasks.filter(status='todo'),
-        'in_progress': tasks.filter(status='in_progress'),
-        'review': tasks.filter(status='review'),
-        'done': tasks.filter(status='done'),
-    }
-
-    kanban_columns = [
-        ('todo', 'Не начата'),
-        ('in_progress', 'В работе'),
-        ('review', 'На проверке'),
-        ('done', 'Завершена'),
-    ]
-
-    context = {
-        'project': project,
-        'tasks': tasks,
-        'kanban_dict': kanban,
-        'kanban_columns': kanban_columns,
-        'status_filter': status_filter,
-        'search': search,
-    }
-    return render(request, 'tasks/project_detail.html', context)
-
-
 @login_required
 def project_edit(request, pk):
     project = get_object_or_404(Project, pk=pk)
@@ -248,6 +245,7 @@ def task_create(request, project_pk=None):
             task = form.save(commit=False)
             task.created_by = request.user
             task.save()
+            form.save_m2m()
             messages.success(request, f'Задача "{task.title}" создана.')
             return redirect('project_detail', pk=task.project.pk)
     else:
@@ -338,23 +336,99 @@ def task_update_status(request, pk):
 
 # ─── ALL TASKS (my tasks view) ───────────────────────────
 
+MY_TASKS_PAGE_SIZE = 50
+MY_TASKS_ORDERINGS = {
+    'created': ('-created_at', '-id'),
+    'due': ('due_date', 'id'),
+}
+
+
 @login_required
 def my_tasks(request):
     tasks = Task.objects.filter(assignee=request.user)
     status_filter = request.GET.get('status')
     if status_filter:
         tasks = tasks.filter(status=status_filter)
+    # Тег: 'api' — точно, 'api*' — по префиксу
+    tag_filter = request.GET.get('tag', '').strip()
+    tasks = tasks.tagged(tag_filter)
     search = request.GET.get('search', '').strip()
     if search:
-        tasks = tasks.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search)
-        )
-    return render(request, 'tasks/my_tasks.html', {'tasks': tasks, 'status_filter': status_filter, 'search': search})
+        tasks = with_snippets(search_tasks(tasks, search), search)
+
+    # «По релевантности» (PostgreSQL) без поиска — как «сначала новые»
+    sort = request.GET.get('sort', '')
+    if sort not in MY_TASKS_ORDERINGS and not (sort == 'relevance' and is_full_text_available()):
+        sort = 'relevance' if is_full_text_available() else 'created'
+    if sort == 'relevance':
+        ordering = search_ordering(search, MY_TASKS_ORDERINGS['created'])
+    else:
+        ordering = MY_TASKS_ORDERINGS[sort]
+    extra = snippet_fields() if search else ()
+    if ordering == SEARCH_ORDERING:
+        extra += ('search_rank',)
+    page = paginate(
+        request, tasks, ordering, per_page=MY_TASKS_PAGE_SIZE,
+        build=lambda rows: load_cards(rows, tags=True, extra=extra),
+    )
+    if search:
+        for task in page:
+            task.snippet = snippet_html(task, search)
 
+    if wants_fragment(request):
+        return fragment_response(request, page, {
+            '#myTaskRows': ('tasks/partials/my_task_rows.html', {'tasks': page}),
+        })
+    return render(request, 'tasks/my_tasks.html', {
+        'tasks': page,
+        'next_url': next_page_url(request, page),
+        'status_filter': status_filter,
+        'search': search,
+        'tag_filter': tag_filter,
+        'sort': sort,
+        'relevance_sort': is_full_text_available(),
+    })
+
+
+SEARCH_RESULTS_LIMIT = 20
+
+
+@login_required
+def task_search(request):
+    """Поиск задач (JSON): ?q=…[&project=id][&mine=1]"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'query': query, 'results': []})
+
+    tasks = visible_tasks(request.user)
+    project = request.GET.get('project', '')
+    if project.isdigit():
+        tasks = tasks.filter(project_id=project)
+    if request.GET.get('mine'):
+        tasks = tasks.filter(assignee=request.user)
+
+    found = (
+        with_snippets(search_tasks(tasks, query), query)
+        .select_related('project')[:SEARCH_RESULTS_LIMIT]
+    )
+    return JsonResponse({
+        'query': query,
+        'results': [{
+            'id': task.pk,
+            'title': task.title,
+            'status': task.status,
+            'project_id': task.project_id,
+            'project_name': task.project.name,
+            'url': reverse('task_detail', args=[task.pk]),
+            'snippet_html': snippet_html(task, query),
+        } for task in found],
+    })
 
 # ─── USER MANAGEMENT (ADMIN ONLY) ───────────────────────
 
+USERS_PAGE_SIZE = 50
+
+
 @login_required
 @user_passes_test(is_admin)
 def user_list(request):
@@ -377,9 +451,16 @@ def user_list(request):
             Q(email__icontains=search) |
             Q(profile__position__icontains=search)
         )
-    
+
+    page = paginate(request, users, ('first_name', 'last_name', 'id'), per_page=USERS_PAGE_SIZE)
+    if wants_fragment(request):
+        return fragment_response(request, page, {
+            '#userRows': ('tasks/partials/user_rows.html', {'users': page}),
+        })
+
     context = {
-        'users': users,
+        'users': page,
+        'next_url': next_page_url(request, page),
         'departments': departments,
         'dept_filter': dept_filter,
         'search': search,
@@ -446,22 +527,175 @@ def department_list(request):
 
 
 @login_required
-def calendar_view(request):
+@user_passes_test(is_admin)
+def profiling_report(request):
+    """Самые медленные страницы по данным ProfilingMiddleware (только админ)"""
+    return render(request, 'tasks/profiling.html', {
+        'enabled': getattr(settings, 'TASKFLOW_PROFILING', False),
+        'rows': profiling_summary(),
+        'dumps': recent_profile_dumps(),
+    })
+
+
+def metrics(request):
+    """Метрики Prometheus: с Bearer-токеном TASKFLOW_METRICS_TOKEN, без него — только админу"""
+    token = getattr(settings, 'TASKFLOW_METRICS_TOKEN', '')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not is_admin(request.user):
+        return HttpResponse(status=403)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+# ─── ANALYTICS ───────────────────────────────────────────
+
+ANALYTICS_PERIODS = (30, 90, 180, 365)
+# Длинные периоды — по неделям: 365 точек на графике не читаются
+ANALYTICS_WEEKLY_FROM = 180
+
+
+def _analytics_filters():
+    return {
+        'projects': list(Project.objects.order_by('name').values_list('pk', 'name')),
+        'users': [
+            (user.pk, user.profile.display_name)
+            for user in User.objects.filter(is_active=True).select_related('profile')
+            .order_by('first_name', 'last_name', 'username')
+        ],
+    }
+
+
+def _analytics_chart(start, end, user_id, project_id):
+    series = daily_series(start, end, user_id=user_id, project_id=project_id)
+    weekly_buckets = (end - start).days + 1 >= ANALYTICS_WEEKLY_FROM
+    if weekly_buckets:
+        series = weekly(series)
+    chart = {
+        'labels': [row['day'].strftime('%d.%m') for row in series],
+        'weekly': weekly_buckets,
+        # Карточки: остатки на сегодня, потоки за весь период
+        'summary': {
+            'open': series[-1]['open'],
+            'overdue': series[-1]['overdue'],
+            'created': sum(row['created'] for row in series),
+            'completed': sum(row['completed'] for row in series),
+        },
+    }
+    for name in ('open', 'overdue', 'done', 'created', 'completed',
+                 'status_todo', 'status_in_progress', 'status_review'):
+        chart[name] = [row[name] for row in series]
+    return chart
+
+
+def _days(duration):
+    return duration.total_seconds() / 86400 if duration is not None else None
+
+
+def _analytics_flow(start, end, user_id, project_id):
+    """Метрики потока: по проектам для команды, по исполнителям внутри проекта или для сотрудника"""
+    since = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    until = since + timedelta(days=(end - start).days + 1)
+    if user_id is not None:
+        rows = flow_metrics('assignee', since, until, assignee_id=user_id)
+    elif project_id is not None:
+        rows = flow_metrics('assignee', since, until, project_id=project_id)
+    else:
+        rows = flow_metrics('project', since, until)
+    return [
+        {
+            'id': row['id'],
+            'throughput': row['throughput'],
+            'wip': row['wip'],
+            'cycle_days': _days(row['cycle_avg']),
+            'lead_days': _days(row['lead_avg']),
+        }
+        for row in rows
+    ]
+
+
+@login_required
+@user_passes_test(is_manager)
+@read_replica
+def analytics(request):
+    """Динамика задач команды, проекта или сотрудника по ежедневным срезам (admin/manager)"""
+    try:
+        days = int(request.GET.get('days', ANALYTICS_PERIODS[0]))
+    except ValueError:
+        days = ANALYTICS_PERIODS[0]
+    if days not in ANALYTICS_PERIODS:
+        days = ANALYTICS_PERIODS[0]
+    try:
+        project_id = int(request.GET['project']) if request.GET.get('project') else None
+        user_id = int(request.GET['user']) if request.GET.get('user') else None
+    except ValueError:
+        project_id = user_id = None
+    # Один срез за раз: сотрудник важнее проекта
+    if user_id is not None:
+        project_id = None
+
+    today = timezone.localdate()
+    ensure_day(today)
+    start = today - timedelta(days=days - 1)
+    if user_id is not None:
+        scopes = [('user', user_id)]
+    elif project_id is not None:
+        scopes = [('project', project_id)]
+    else:
+        scopes = [('team',)]
+    chart = cached_fragment(
+        'analytics', scopes, lambda: _analytics_chart(start, today, user_id, project_id),
+        variant=f'{today.isoformat()}:{days}',
+    )
+    flow = cached_fragment(
+        'analytics_flow', scopes, lambda: _analytics_flow(start, today, user_id, project_id),
+        variant=f'{today.isoformat()}:{days}',
+    )
+    filters = cached_fragment('analytics_filters', [('directory',)], _analytics_filters)
+    names = dict(filters['users'] if user_id is not None or project_id is not None else filters['projects'])
+    for row in flow:
+        row['name'] = names.get(row['id'], f'#{row["id"]}')
+
+    return render(request, 'tasks/analytics.html', {
+        'chart': chart,
+        'flow': flow,
+        'flow_by_project': user_id is None and project_id is None,
+        'days': days,
+        'periods': ANALYTICS_PERIODS,
+        'project_id': project_id,
+        'user_id': user_id,
+        'projects': filters['projects'],
+        'users': filters['users'],
+    })
+
+
+def _calendar_month(request):
     # Получаем текущую дату или дату из параметра
     year = int(request.GET.get('year', timezone.now().year))
     month = int(request.GET.get('month', timezone.now().month))
+    # Создаём календарь: недели из дат, включая хвосты соседних месяцев
+    return year, month, calendar.Calendar().monthdatescalendar(year, month)
+
+
+def _calendar_widgets(user, cal):
+    def tasks_by_date():
+        # Берём только задачи видимого диапазона и раскладываем их по датам,
+        # чтобы шаблон получал список дня одним обращением к словарю
+        user_tasks = Task.objects.filter(
+            assignee=user,
+            due_date__range=(cal[0][0], cal[-1][-1])
+        ).select_related('project')
 
-    # Создаём календарь
-    cal = calendar.monthcalendar(year, month)
-    month_name = calendar.month_name[month]
+        by_date = {}
+        for task in user_tasks:
+            by_date.setdefault(task.due_date, []).append(task)
+        return by_date
 
-    # Получаем ВСЕ задачи пользователя с дедлайнами
-    # Не группируем - просто передаём список
-    user_tasks = Task.objects.filter(
-        assignee=request.user,
-        due_date__isnull=False
-    ).select_related('project')
+    return {'tasks_by_date': tasks_by_date}
 
+
+def _render_calendar(request, year, month, cal, widgets):
     # Предыдущий и следующий месяц
     prev_month = month - 1 if month > 1 else 12
     prev_year = year if month > 1 else year - 1
@@ -472,93 +706,101 @@ def calendar_view(request):
         'calendar': cal,
         'year': year,
         'month': month,
-        'month_name': month_name,
-        'user_tasks': user_tasks,  # Просто список задач
+        'month_name': calendar.month_name[month],
         'prev_month': prev_month,
         'prev_year': prev_year,
         'next_month': next_month,
         'next_year': next_year,
         'today': timezone.now().date(),
+        **widgets,
     }
 
     return render(request, 'tasks/calendar.html', context)
 
 
-# ДОБАВЬТЕ/ЗАМЕНИТЕ в tasks/views.py
-
 @login_required
-def kanban_view(request):
-    """Kanban доска с фильтрами"""
+@read_replica
+def calendar_view(request):
+    year, month, cal = _calendar_month(request)
+    widgets, request.widget_timings = run_widgets(_calendar_widgets(request.user, cal))
+    return _render_calendar(request, year, month, cal, widgets)
 
-    # ИСПРАВЛЕНИЕ: Admin видит ВСЕ задачи
-    if request.user.is_superuser or request.user.profile.role == 'admin':
-        base_tasks = Task.objects.all()
-    else:
-        # Обычные пользователи видят свои задачи
-        base_tasks = Task.objects.filter(
-            Q(assignee=request.user) | Q(project__members=request.user)
-        ).distinct()
-
-    # Применяем фильтры
-    selected_project = request.GET.get('project', '')
-    selected_assignee = request.GET.get('assignee', '')
-    selected_priority = request.GET.get('priority', '')
-    search_query = request.GET.get('search', '')
-
-    filtered_tasks = base_tasks.select_related('project', 'assignee')
-
-    # Фильтр по проекту
-    if selected_project:
-        filtered_tasks = filtered_tasks.filter(project_id=selected_project)
-
-    # Фильтр по исполнителю
-    if selected_assignee:
-        filtered_tasks = filtered_tasks.filter(assignee_id=selected_assignee)
-
-    # Фильтр по приоритету
-    if selected_priority:
-        filtered_tasks = filtered_tasks.filter(priority=selected_priority)
-
-    # Поиск по названию
-    if search_query:
-        filtered_tasks = filtered_tasks.filter(title__icontains=search_query)
-
-    # Группируем задачи по статусам
-    tasks_by_status = {
-        'todo': filtered_tasks.filter(status='todo').order_by('-priority', 'due_date'),
-        'in_progress': filtered_tasks.filter(status='in_progress').order_by('-priority', 'due_date'),
-        'review': filtered_tasks.filter(status='review').order_by('-priority', 'due_date'),
-        'done': filtered_tasks.filter(status='done').order_by('-updated_at')[:20],
+
+@async_login_required
+@read_replica
+async def calendar_async(request):
+    """Календарь для ASGI: запрос задач — в пуле виджетов, не в потоке запроса"""
+    year, month, cal = _calendar_month(request)
+    widgets, request.widget_timings = await gather_widgets(_calendar_widgets(request.user, cal))
+    return await sync_to_async(_render_calendar)(request, year, month, cal, widgets)
+
+
+# ДОБАВЬТЕ/ЗАМЕНИТЕ в tasks/views.py
+
+def _kanban_tasks(user, filters):
+    """Видимые задачи с фильтрами Kanban (полнотекстовый поиск может сходить в БД)"""
+    # Admin видит ВСЕ задачи, остальные — свои и задачи своих проектов
+    return filter_board(visible_tasks(user), **filters)
+
+
+def _kanban_done_page(request, filtered_tasks):
+    # «Выполнено» растёт бесконечно — отдаём его страницами по (updated_at, id)
+    return paginate(
+        request, filtered_tasks.filter(status='done'), ('-updated_at', '-id'), per_page=DONE_COLUMN_LIMIT,
+        build=load_cards,
+    )
+
+
+def _kanban_fragment(request, filtered_tasks):
+    done_page = _kanban_done_page(request, filtered_tasks)
+    return fragment_response(request, done_page, {
+        '#doneCards': ('tasks/partials/kanban_done_cards.html', {'tasks': done_page}),
+    })
+
+
+def _kanban_options(user):
+    # Данные для фильтров — из кэша, пока не менялись проекты, участники и исполнители
+    if is_board_admin(user):
+        return cached_fragment('kanban_filters:admin', [('directory',)], lambda: filter_options(user))
+    return cached_fragment(
+        'kanban_filters', [('user', user.pk), ('directory',)],
+        lambda: filter_options(user),
+    )
+
+
+def _kanban_widgets(request, filtered_tasks):
+    return {
+        'done_page': lambda: _kanban_done_page(request, filtered_tasks),
+        # Один запрос на открытые колонки, в ручном порядке карточек
+        'open_columns': lambda: partition_board(
+            load_cards(filtered_tasks.exclude(status='done').order_by('rank', 'id'))
+        ),
+        'done_count': filtered_tasks.filter(status='done').count,
+        'options': lambda: _kanban_options(request.user),
     }
 
-    # Данные для фильтров
-    if request.user.is_superuser or request.user.profile.role == 'admin':
-        available_projects = Project.objects.all()
-        available_assignees = User.objects.filter(is_active=True)
-    else:
-        # Проекты где пользователь участник
-        available_projects = Project.objects.filter(
-            Q(members=request.user) | Q(tasks__assignee=request.user)
-        ).distinct()
-        # Коллеги из тех же проектов
-        user_projects = Project.objects.filter(
-            Q(members=request.user) | Q(tasks__assignee=request.user)
-        ).distinct()
-
-        available_assignees = User.objects.filter(
-            Q(projects__in=user_projects) | Q(assigned_tasks__project__in=user_projects)
-        ).distinct()
+
+def _render_kanban(request, filters, live_cursor, widgets):
+    done_page, options = widgets['done_page'], widgets['options']
+    tasks_by_status, total_tasks = widgets['open_columns']
+    tasks_by_status['done'] = done_page.items
+    total_tasks += widgets['done_count']
 
     context = {
         'tasks_by_status': tasks_by_status,
-        'total_tasks': filtered_tasks.count(),
+        'total_tasks': total_tasks,
+        'next_url': next_page_url(request, done_page),
+        'live_cursor': live_cursor.isoformat(),
+        'live_push': settings.TASKFLOW_LIVE_PUSH,
         # Для фильтров
-        'available_projects': available_projects,
-        'available_assignees': available_assignees,
-        'selected_project': selected_project,
-        'selected_assignee': selected_assignee,
-        'selected_priority': selected_priority,
-        'search_query': search_query,
+        'available_projects': options['projects'],
+        'available_assignees': options['assignees'],
+        'selected_project': filters['project'],
+        'selected_assignee': filters['assignee'],
+        'selected_priority': filters['priority'],
+        'search_query': filters['search'],
+        'selected_tag': filters['tag'],
+        'export_query': urlencode({name: value for name, value in filters.items() if value}),
         'priorities': [
             ('low', 'Низкий'),
             ('medium', 'Средний'),
@@ -569,27 +811,293 @@ def kanban_view(request):
 
     return render(request, 'tasks/kanban.html', context)
 
+
+@login_required
+def kanban_view(request):
+    """Kanban доска с фильтрами"""
+    filters = board_filters(request.GET)
+    filtered_tasks = _kanban_tasks(request.user, filters)
+    if wants_fragment(request):
+        return _kanban_fragment(request, filtered_tasks)
+
+    # Курсор для live_updates.js: всё, что изменится после этого момента
+    live_cursor = timezone.now()
+    widgets, request.widget_timings = run_widgets(_kanban_widgets(request, filtered_tasks))
+    return _render_kanban(request, filters, live_cursor, widgets)
+
+
+@async_login_required
+async def kanban_async(request):
+    """Kanban для ASGI: колонки, счётчик и фильтры загружаются одновременно"""
+    filters = board_filters(request.GET)
+    filtered_tasks = await sync_to_async(_kanban_tasks)(request.user, filters)
+    if wants_fragment(request):
+        return await sync_to_async(_kanban_fragment)(request, filtered_tasks)
+
+    live_cursor = timezone.now()
+    widgets, request.widget_timings = await gather_widgets(_kanban_widgets(request, filtered_tasks))
+    return await sync_to_async(_render_kanban)(request, filters, live_cursor, widgets)
+
+@login_required
+@read_replica
+def task_export(request):
+    """Потоковая выгрузка задач Kanban с теми же фильтрами: ?format=csv|ndjson&gzip=1"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true')
+
+    tasks = filter_board(visible_tasks(request.user), **board_filters(request.GET))
+    response = StreamingHttpResponse(
+        stream_body(request, export_chunks(tasks, fmt, compress)),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[fmt][0],
+    )
+    filename = export_filename(fmt, compress, timezone.localdate())
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ─── AJAX: Live board updates ────────────────────────────
+
+# Больше изменений за один опрос — дешевле перезагрузить доску целиком
+LIVE_DELTA_LIMIT = 500
+# updated_at ставится при save(), а видна строка после фиксации: транзакция,
+# зафиксированная позже опроса, оставила бы изменение позади курсора. Поэтому
+# каждый опрос перечитывает окно перед курсором; повторы клиент отбрасывает
+# по updated_at (live_updates.js)
+LIVE_OVERLAP = timedelta(seconds=5)
+
+
+def _live_since(request):
+    since = parse_datetime(request.GET.get('since', ''))
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def _live_etag(request):
+    # Версия того же окна, что читает live_updates (с перекрытием), и фильтры
+    # доски: иначе 304 скрыл бы строку, зафиксированную позже со старым updated_at
+    since = _live_since(request)
+    if since is None:
+        return None
+    version = board_version(request.user, since - LIVE_OVERLAP)
+    if version is None:
+        return None
+    return hashlib.md5(f'{version}/{request.GET.urlencode()}'.encode()).hexdigest()
+
+
+@login_required
+@condition(etag_func=_live_etag)
+def live_updates(request):
+    """Изменения задач после курсора since (для live_updates.js)"""
+    since = _live_since(request)
+    if since is None:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    # Следы удалений старше этого уже вычищены — клиенту нужна полная перезагрузка
+    if since < timezone.now() - TaskTombstone.RETENTION:
+        return JsonResponse({'reset': True})
+
+    changed = load_cards(
+        visible_tasks(request.user)
+        .filter(updated_at__gt=since - LIVE_OVERLAP)
+        .order_by('updated_at')[:LIVE_DELTA_LIMIT + 1]
+    )
+    if len(changed) > LIVE_DELTA_LIMIT:
+        return JsonResponse({'reset': True})
+
+    # Какие из изменённых задач подходят под фильтры открытой доски
+    matching = set()
+    if changed:
+        matching = set(filter_board(
+            Task.objects.filter(pk__in=[task.pk for task in changed]),
+            project=request.GET.get('project', ''),
+            assignee=request.GET.get('assignee', ''),
+            priority=request.GET.get('priority', ''),
+            search=request.GET.get('search', ''),
+            tag=request.GET.get('tag', ''),
+        ).values_list('pk', flat=True))
+
+    deleted = list(
+        visible_tombstones(request.user)
+        .filter(deleted_at__gt=since - LIVE_OVERLAP)
+        .values_list('task_id', 'deleted_at')
+    )
+
+    cursor = max([since] + [task.updated_at for task in changed] + [moment for _, moment in deleted])
+    return JsonResponse({
+        'cursor': cursor.isoformat(),
+        'tasks': [card_payload(task, matches=task.pk in matching) for task in changed],
+        'deleted': [task_id for task_id, _ in deleted],
+    })
+
+
+# ─── SSE: Push channel for live boards ──────────────────
+
+# Пульс держит соединение живым через прокси; по истечении срока клиент
+# переподключается сам (EventSource), освобождая поток воркера
+STREAM_HEARTBEAT = 15
+STREAM_MAX_LIFETIME = 300
+# Под ASGI стрим проверяет брокер с этим интервалом, не занимая поток ожиданием
+STREAM_POLL_INTERVAL = 0.5
+# Свободные места для стримов в этом воркере (TASKFLOW_STREAMS_PER_WORKER)
+_stream_slots = threading.BoundedSemaphore(settings.TASKFLOW_STREAMS_PER_WORKER)
+
+
+def _event_stream(broker, channels, after):
+    yield 'retry: 5000\n\n'
+    # Во время стрима БД не нужна — не держим соединение из пула
+    connection.close()
+    deadline = time.monotonic() + STREAM_MAX_LIFETIME
+    while time.monotonic() < deadline:
+        events, after = broker.wait(after, channels, timeout=STREAM_HEARTBEAT)
+        if not events:
+            yield ': keep-alive\n\n'
+            continue
+        for seq, _channel, payload in events:
+            yield f'id: {seq}\nevent: {payload["type"]}\ndata: {json.dumps(payload)}\n\n'
+
+
+async def _async_event_stream(broker, channels, after):
+    """_event_stream для ASGI: ждёт событий в цикле событий, а не в потоке"""
+    yield 'retry: 5000\n\n'
+    # Подключения потока запроса (в нём выполнялся вид)
+    await sync_to_async(connections.close_all)()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_LIFETIME
+    heartbeat = loop.time() + STREAM_HEARTBEAT
+    while loop.time() < deadline:
+        if broker.last_seq > after:
+            events, after = broker.wait(after, channels, timeout=0)
+            for seq, _channel, payload in events:
+                yield f'id: {seq}\nevent: {payload["type"]}\ndata: {json.dumps(payload)}\n\n'
+            if events:
+                heartbeat = loop.time() + STREAM_HEARTBEAT
+        if loop.time() >= heartbeat:
+            yield ': keep-alive\n\n'
+            heartbeat = loop.time() + STREAM_HEARTBEAT
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+
+class _StreamSlot:
+    """Содержимое ответа-стрима: место в _stream_slots освобождается в close().
+
+    Django вызывает close() у содержимого, когда закрывает ответ, — даже если
+    клиент ушёл до первого события и генератор так и не запустился.
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._released = False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        # У async-генератора (ASGI) нечего освобождать — его завершит цикл событий
+        if hasattr(self._events, 'close'):
+            self._events.close()
+        if not self._released:
+            self._released = True
+            _stream_slots.release()
+
+
+class _AsyncStreamSlot(_StreamSlot):
+    def __aiter__(self):
+        return self._events
+
+
+@login_required
+def task_stream(request):
+    """Server-Sent Events: изменения задач в проектах пользователя"""
+    requested = {int(pk) for pk in request.GET.getlist('project') if pk.isdigit()}
+
+    if is_board_admin(request.user):
+        project_ids = requested or None
+    else:
+        project_ids = set(request.user.projects.values_list('pk', flat=True))
+        project_ids |= set(
+            Task.objects.filter(assignee=request.user).order_by()
+            .values_list('project_id', flat=True).distinct()
+        )
+        if requested:
+            project_ids &= requested
+
+    channels = None if project_ids is None else {project_channel(pk) for pk in project_ids}
+    if not _stream_slots.acquire(blocking=False):
+        # Все места заняты: 204 закрывает EventSource без переподключения,
+        # клиент остаётся на опросе /tasks/live/
+        return HttpResponse(status=204)
+    broker = get_broker()
+
+    if is_asgi(request):
+        content = _AsyncStreamSlot(_async_event_stream(broker, channels, broker.last_seq))
+    else:
+        content = _StreamSlot(_event_stream(broker, channels, broker.last_seq))
+
+    response = StreamingHttpResponse(
+        content,
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+PROJECT_TASKS_PAGE_SIZE = 60
+
+
+@login_required
 def project_detail(request, pk):
-    project = get_object_or_404(Project, pk=pk)
+    project = get_object_or_404(Project.objects.with_progress(), pk=pk)
+    if not project_access(request.user, project):
+        raise PermissionDenied
 
-    # Группируем задачи по статусам
-    tasks_by_status = {
-        'todo': project.tasks.filter(status='todo').count(),
-        'in_progress': project.tasks.filter(status='in_progress').count(),
-        'review': project.tasks.filter(status='review').count(),
-        'done': project.tasks.filter(status='done').count(),
-    }
+    # Тег: 'api' — точно, 'api*' — по префиксу
+    tag_filter = request.GET.get('tag', '').strip()
+    search = request.GET.get('search', '').strip()
+    # Строка поиска находит и задачи с таким тегом
+    tasks = search_tasks(project.tasks.tagged(tag_filter), search, match_tags=True)
+
+    ordering = search_ordering(search, ('-created_at', '-id'))
+    page = paginate(
+        request, tasks, ordering, per_page=PROJECT_TASKS_PAGE_SIZE,
+        build=lambda rows: load_cards(rows, extra=('search_rank',) if ordering == SEARCH_ORDERING else ()),
+    )
+    columns = {status: [] for status, _label in Task.STATUS_CHOICES}
+    for task in page:
+        columns.setdefault(task.status, []).append(task)
+
+    if wants_fragment(request):
+        return fragment_response(request, page, {
+            f'#projectColumn-{status}': ('tasks/partials/project_task_cards.html', {'tasks': cards})
+            for status, cards in columns.items()
+        })
+
+    # Счётчики колонок — по всем задачам, а не по загруженной странице
+    tasks_by_status = {status: 0 for status, _label in Task.STATUS_CHOICES}
+    tasks_by_status.update(tasks.order_by().values_list('status').annotate(count=Count('id')))
 
     context = {
         'project': project,
+        'columns': columns,
+        'next_url': next_page_url(request, page),
         'tasks_by_status': tasks_by_status,
+        'tag_counts': project_tag_counts(project),
+        'tag_filter': tag_filter,
+        'search': search,
     }
     return render(request, 'tasks/project_detail.html', context)
 
 @login_required
 @require_POST
 def kanban_update_status(request):
-    """AJAX endpoint для обновления статуса задачи"""
+    """AJAX endpoint для переноса карточки: статус и место в колонке.
+
+    before_id / after_id — соседние карточки выше и ниже места переноса
+    (без них карточка остаётся на своём месте в порядке колонки).
+    Записывается одна строка — сама задача (tasks/ranking.py).
+    """
     try:
         data = json.loads(request.body)
         task_id = data.get('task_id')
@@ -603,10 +1111,25 @@ def kanban_update_status(request):
         # Получаем задачу
         task = get_object_or_404(Task, pk=task_id)
 
-        # Проверяем права доступа
-        if task.assignee != request.user and request.user not in task.project.members.all():
-            if not (request.user.is_superuser or request.user.profile.role == 'admin'):
-                return JsonResponse({'error': 'Permission denied'}, status=403)
+        # Проверяем права доступа (один EXISTS вместо загрузки всех участников)
+        if not visible_tasks(request.user).filter(pk=task.pk).exists():
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+
+        # Место в колонке — ключ между соседями; «Выполнено» упорядочена по времени
+        try:
+            neighbours = [int(pk) if pk else None for pk in (data.get('before_id'), data.get('after_id'))]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'before_id and after_id must be integers'}, status=400)
+        if new_status != 'done' and any(neighbours):
+            ranks = dict(
+                visible_tasks(request.user)
+                .filter(pk__in=[pk for pk in neighbours if pk])
+                .values_list('pk', 'rank')
+            )
+            task.rank = rank_between(*(ranks.get(pk) for pk in neighbours))
+            # Колонку ещё не перебалансировала rebalance_ranks — клиент перезагрузит доску
+            if len(task.rank) > RANK_MAX_LENGTH:
+                return JsonResponse({'error': 'Column order is being rebuilt, try again later'}, status=409)
 
         # Обновляем статус
         task.status = new_status
@@ -616,8 +1139,161 @@ def kanban_update_status(request):
             'success': True,
             'task_id': task.id,
             'new_status': new_status,
-            'status_display': task.get_status_display()
+            'status_display': task.get_status_display(),
+            'rank': task.rank,
         })
 
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+# ─── AJAX: Bulk task operations ──────────────────────────
+
+BULK_MAX_TASKS = 1000
+BULK_FIELDS = ('status', 'priority', 'assignee', 'due_date', 'tags')
+
+
+def _clean_bulk_patch(patch):
+    """Проверяет изменения для массовой операции; возвращает (поля, ошибка)"""
+    if not isinstance(patch, dict) or not patch:
+        return None, 'Empty patch'
+    unknown = set(patch) - set(BULK_FIELDS)
+    if unknown:
+        return None, f'Unknown fields: {", ".join(sorted(unknown))}'
+
+    fields = {}
+    if 'status' in patch:
+        if patch['status'] not in dict(Task.STATUS_CHOICES):
+            return None, 'Invalid status'
+        fields['status'] = patch['status']
+    if 'priority' in patch:
+        if patch['priority'] not in dict(Task.PRIORITY_CHOICES):
+            return None, 'Invalid priority'
+        fields['priority'] = patch['priority']
+    if 'assignee' in patch:
+        assignee_id = patch['assignee']
+        if assignee_id in (None, ''):
+            fields['assignee'] = None
+        else:
+            try:
+                assignee_id = int(assignee_id)
+            except (TypeError, ValueError):
+                return None, 'Invalid assignee'
+            assignee = User.objects.filter(pk=assignee_id, is_active=True).first()
+            if assignee is None:
+                return None, 'Invalid assignee'
+            fields['assignee'] = assignee
+    if 'due_date' in patch:
+        if patch['due_date'] in (None, ''):
+            fields['due_date'] = None
+        else:
+            due_date = parse_date(str(patch['due_date']))
+            if due_date is None:
+                return None, 'Invalid due_date'
+            fields['due_date'] = due_date
+    if 'tags' in patch:
+        tags = patch['tags'] or []
+        if isinstance(tags, str):
+            tags = Tag.parse(tags)
+        elif isinstance(tags, list) and all(isinstance(name, str) for name in tags):
+            tags = Tag.parse(','.join(tags))
+        else:
+            return None, 'Invalid tags'
+        fields['tags'] = tags
+    return fields, None
+
+
+@login_required
+@require_POST
+def task_bulk_update(request):
+    """Массовое изменение задач: {"task_ids": [...], "patch": {"status": ..., ...}}"""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    task_ids = data.get('task_ids') if isinstance(data, dict) else None
+    if not isinstance(task_ids, list) or not task_ids:
+        return JsonResponse({'error': 'task_ids must be a non-empty list'}, status=400)
+    if len(task_ids) > BULK_MAX_TASKS:
+        return JsonResponse({'error': f'At most {BULK_MAX_TASKS} tasks per request'}, status=400)
+    try:
+        task_ids = list(dict.fromkeys(int(pk) for pk in task_ids))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'task_ids must be integers'}, status=400)
+
+    fields, error = _clean_bulk_patch(data.get('patch'))
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    # Права на весь набор — одним запросом
+    access = task_access(request.user, task_ids)
+    allowed = [pk for pk in task_ids if pk in access and access[pk][2]]
+
+    tag_names = fields.pop('tags', None)
+
+    with transaction.atomic():
+        # Состояния до изменения — для приращений ежедневных срезов и журнала статусов
+        old_states = {
+            row[0]: TaskState._make(row[1:])
+            for row in Task.objects.filter(pk__in=allowed).select_for_update().order_by('pk')
+            .values_list('pk', *ROLLUP_STATE_FIELDS)
+        }
+        # update() не трогает auto_now — ставим updated_at сами для /tasks/live/
+        now = timezone.now()
+        updated = Task.objects.filter(pk__in=allowed).update(updated_at=now, **fields)
+        patched = {name: value for name, value in fields.items() if name != 'assignee'}
+        if 'assignee' in fields:
+            patched['assignee_id'] = fields['assignee'] and fields['assignee'].pk
+        new_states = {pk: old._replace(**patched) for pk, old in old_states.items()}
+        apply_task_changes([(old_states[pk], new) for pk, new in new_states.items()])
+        # update() не шлёт сигналы — переходы статусов пишем одной вставкой
+        TaskEvent.objects.bulk_create([
+            TaskEvent.for_change(pk, new.project_id, new.assignee_id, old_states[pk].status, new.status, at=now)
+            for pk, new in new_states.items()
+            if new.status != old_states[pk].status
+        ])
+
+        # Теги заменяются целиком: удалить связи и вставить новые пачкой
+        if tag_names is not None:
+            TaskTag = Task.tags.through
+            tags = Tag.get_or_create_many(tag_names)
+            TaskTag.objects.filter(task_id__in=allowed).delete()
+            TaskTag.objects.bulk_create(
+                [TaskTag(task_id=pk, tag_id=tag.pk) for pk in allowed for tag in tags],
+                batch_size=5000,
+            )
+            fields['tags'] = tag_names
+
+        # Одно событие на проект для SSE-подписчиков. Без списка id: тысяча id
+        # не поместилась бы в pg_notify (8000 байт), а клиент по событию и так
+        # забирает изменения опросом
+        by_project = {}
+        for pk in allowed:
+            by_project.setdefault(access[pk][0], []).append(pk)
+        for project_id, project_task_ids in by_project.items():
+            publish_on_commit(project_channel(project_id), {
+                'type': 'bulk',
+                'project_id': project_id,
+                'count': len(project_task_ids),
+                'fields': sorted(fields),
+            })
+
+        # update() не шлёт сигналы — сбрасываем кэш фрагментов сами
+        assignee_ids = {access[pk][1] for pk in allowed}
+        if fields.get('assignee') is not None:
+            assignee_ids.add(fields['assignee'].pk)
+        bump_versions_on_commit(
+            *task_cache_scopes(by_project, assignee_ids, moved='assignee' in fields)
+        )
+
+    results = {}
+    for pk in task_ids:
+        if pk not in access:
+            results[pk] = 'not_found'
+        elif not access[pk][2]:
+            results[pk] = 'forbidden'
+        else:
+            results[pk] = 'updated'
+
+    return JsonResponse({'success': True, 'updated': updated, 'results': results})